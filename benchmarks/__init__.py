@@ -0,0 +1 @@
+"""Headless benchmarks of the app, driven by a fake model."""
@@ -0,0 +1,213 @@
+"""Scripted, deterministic stand-in for the LLM backend."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import json
+import random
+from typing import TYPE_CHECKING, Any
+
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import (
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from pydantic_ai.messages import ModelMessage
+    from pydantic_ai.models.function import AgentInfo, DeltaToolCalls
+    from pydantic_ai.tools import ToolDefinition
+    from tokonomics.model_discovery import ModelInfo
+
+
+PROVIDER = "fake"
+MODEL_ID = "benchmark"
+MODEL_NAME = f"{PROVIDER}:{MODEL_ID}"
+
+_WORDS = (
+    *("der", "die", "das", "und", "oder", "nicht", "ein", "eine", "ist", "wird"),
+    *("System", "Risiko", "Anbieter", "Betreiber", "Pflicht", "Daten", "Modell"),
+    *("Transparenz", "Konformität", "Bewertung", "Dokumentation", "Aufsicht"),
+    *("hoch", "gering", "verboten", "zulässig", "gemäß", "Artikel", "Anhang"),
+)
+
+
+@dataclass(frozen=True)
+class FakeLLMConfig:
+    """Timing and behavior of the fake model."""
+
+    latency: float = 0.3
+    """Seconds until the first token (or tool call) is sent."""
+
+    latency_jitter: float = 0.0
+    """Relative spread of the latency (exponentially distributed on top)."""
+
+    slow_requests: float = 0.0
+    """Share of requests answered only after `slow_latency` (a latency tail)."""
+
+    slow_latency: float = 5.0
+    """Seconds until the first token of slow requests."""
+
+    tokens_per_second: float = 80.0
+    """Generation speed after the first token."""
+
+    response_tokens: int = 60
+    """Tokens per text response (one word counts as one token)."""
+
+    tool_calls: int = 0
+    """Tool calls made per turn before answering, if the agent has tools."""
+
+    rate_limit_errors: float = 0.0
+    """Share of requests rejected with a rate limit error (HTTP 429)."""
+
+    seed: int = 0
+    """Seed for the generated words, responses are a function of the prompt."""
+
+
+def _latest_prompt(messages: list[ModelMessage]) -> str:
+    for message in reversed(messages):
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                return str(part.content)
+    return ""
+
+
+def _tool_calls_this_turn(messages: list[ModelMessage]) -> int:
+    """Count tool results since the latest user prompt."""
+    count = 0
+    for message in reversed(messages):
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                return count
+            if isinstance(part, ToolReturnPart):
+                count += 1
+    return count
+
+
+def _fake_value(schema: dict[str, Any], rng: random.Random) -> Any:
+    if enum := schema.get("enum"):
+        return enum[0]
+    match schema.get("type"):
+        case "integer" | "number":
+            return 1
+        case "boolean":
+            return True
+        case "array":
+            return []
+        case "object":
+            return {}
+        case _:
+            return " ".join(rng.choices(_WORDS, k=8))
+
+
+def fake_arguments(tool: ToolDefinition, rng: random.Random) -> dict[str, Any]:
+    """Create plausible arguments for all properties of a tool schema."""
+    properties = tool.parameters_json_schema.get("properties", {})
+    return {name: _fake_value(schema, rng) for name, schema in properties.items()}
+
+
+class FakeLLM:
+    """Scripted model answering with generated words at a fixed token rate.
+
+    While fewer than `tool_calls` tools were called in the current turn, the
+    model calls the agent's tools in turn. Structured output requests are
+    answered by filling every field of the output schema.
+    """
+
+    def __init__(self, config: FakeLLMConfig | None = None) -> None:
+        self.config = config or FakeLLMConfig()
+        # Separate from the seeded word generator, so that retries and duplicate
+        # requests draw new errors and latencies
+        self._chance = random.Random(self.config.seed)
+
+    async def _admit(self) -> None:
+        """Reject the request like a provider at its rate limit, sometimes."""
+        if self._chance.random() < self.config.rate_limit_errors:
+            await asyncio.sleep(self.config.latency / 10)
+            body = {"error": {"message": "Rate limit exceeded"}}
+            raise ModelHTTPError(429, MODEL_ID, body)
+
+    def latency(self) -> float:
+        """Draw the seconds until the first token of a request."""
+        config = self.config
+        if self._chance.random() < config.slow_requests:
+            return config.slow_latency
+        jitter = self._chance.expovariate(1) * config.latency_jitter
+        return config.latency * (1 + jitter)
+
+    def _rng(self, messages: list[ModelMessage]) -> random.Random:
+        digest = hashlib.sha256(_latest_prompt(messages).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8]) + self.config.seed)
+
+    def _next_tool(
+        self,
+        messages: list[ModelMessage],
+        info: AgentInfo,
+    ) -> ToolDefinition | None:
+        done = _tool_calls_this_turn(messages)
+        if not info.function_tools or done >= self.config.tool_calls:
+            return None
+        return info.function_tools[done % len(info.function_tools)]
+
+    async def stream(
+        self,
+        messages: list[ModelMessage],
+        info: AgentInfo,
+    ) -> AsyncIterator[str | DeltaToolCalls]:
+        """Stream function of the model."""
+        await self._admit()
+        rng = self._rng(messages)
+        await asyncio.sleep(self.latency())
+        if tool := self._next_tool(messages, info):
+            args = json.dumps(fake_arguments(tool, rng))
+            call = DeltaToolCall(tool.name, args, f"call_{len(messages)}")
+            yield {0: call}
+            return
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i in range(self.config.response_tokens):
+            delay = start + i / self.config.tokens_per_second - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield f"{rng.choice(_WORDS)} "
+
+    async def respond(
+        self, messages: list[ModelMessage], info: AgentInfo
+    ) -> ModelResponse:
+        """Request function of the model (used for structured output)."""
+        await self._admit()
+        rng = self._rng(messages)
+        generation = self.config.response_tokens / self.config.tokens_per_second
+        await asyncio.sleep(self.latency() + generation)
+        call_id = f"call_{len(messages)}"
+        if tool := self._next_tool(messages, info):
+            args = fake_arguments(tool, rng)
+            return ModelResponse(parts=[ToolCallPart(tool.name, args, call_id)])
+        if info.output_tools:
+            tool = info.output_tools[0]
+            args = fake_arguments(tool, rng)
+            return ModelResponse(parts=[ToolCallPart(tool.name, args, call_id)])
+        words = rng.choices(_WORDS, k=self.config.response_tokens)
+        return ModelResponse(parts=[TextPart(" ".join(words))])
+
+    def model(self) -> FunctionModel:
+        """Get a pydantic-ai model driven by this script."""
+        return FunctionModel(
+            self.respond, stream_function=self.stream, model_name=MODEL_ID
+        )
+
+
+def fake_model_info() -> ModelInfo:
+    """Model catalog entry of the fake model."""
+    from tokonomics.model_discovery import ModelInfo
+
+    return ModelInfo(id=MODEL_ID, name="Benchmark (fake)", provider=PROVIDER)
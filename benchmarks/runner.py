@@ -0,0 +1,398 @@
+"""Headless load test of the Streamlit pages with a fake model.
+
+Every simulated session runs in its own worker process, since `AppTest`
+uses one fixed session id and patches process-wide Streamlit state while a
+script runs. A session opens the welcome page, chats for a number of turns
+on step 1 (with an idle rerun after every turn) and extracts a ticket on
+step 2 (waiting for the background job, then once more from the ticket
+cache).
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+import json
+import math
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.fake_llm import MODEL_NAME, FakeLLMConfig
+
+
+ROOT = Path(__file__).parent.parent
+BASELINE_DIR = Path(__file__).parent / "baselines"
+# Allowed relative regression before a comparison fails
+DEFAULT_TOLERANCE = 0.25
+# Latencies below this many seconds are too noisy to compare
+MIN_COMPARED_SECONDS = 0.005
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Load profile of a benchmark run."""
+
+    sessions: int = 4
+    """Number of concurrent sessions."""
+
+    turns: int = 3
+    """Chat turns per session."""
+
+    tools: tuple[str, ...] = ()
+    """Keys of the tools selected in the chat sidebar (see config.AVAILABLE_TOOLS)."""
+
+    llm: FakeLLMConfig = field(default_factory=FakeLLMConfig)
+    """Behavior of the fake model."""
+
+    hedge: bool = False
+    """Whether slow chat requests are hedged (with a second fake model request)."""
+
+    timeout: float = 60.0
+    """Maximum seconds per script run."""
+
+
+SCENARIOS = {
+    "smoke": Scenario(sessions=2, turns=2),
+    "chat": Scenario(sessions=8, turns=5),
+    "tools": Scenario(
+        sessions=4,
+        turns=3,
+        tools=("docs_search",),
+        llm=FakeLLMConfig(tool_calls=1),
+    ),
+    "ratelimit": Scenario(
+        sessions=8,
+        turns=3,
+        llm=FakeLLMConfig(rate_limit_errors=0.2),
+    ),
+    "hedge": Scenario(
+        sessions=4,
+        turns=5,
+        llm=FakeLLMConfig(latency_jitter=0.5, slow_requests=0.1, slow_latency=4.0),
+        hedge=True,
+    ),
+}
+
+
+def _rss_bytes() -> int:
+    """Resident memory of this process (peak memory where RSS is unavailable)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _timed_run(app: Any, timings: list[float], timeout: float) -> None:
+    start = time.perf_counter()
+    app.run(timeout=timeout)
+    timings.append(time.perf_counter() - start)
+    # Pages show failed model runs as error messages instead of raising
+    if failures := [*app.exception, *app.error]:
+        msg = "; ".join(str(e.value) for e in failures)
+        raise RuntimeError(msg)
+
+
+def _wait_for_ticket(app: Any, timings: list[float], timeout: float) -> None:
+    """Rerun the ticket page until the background extraction finished.
+
+    `AppTest` does not run fragments on their own, so the polling of the
+    page is replaced by full reruns.
+    """
+    from config import JOB_POLL_INTERVAL
+
+    start = time.perf_counter()
+    _timed_run(app, [], timeout)
+    while any(button.label == "Abbrechen" for button in app.button):
+        if time.perf_counter() - start > timeout:
+            msg = "Ticket extraction timed out"
+            raise RuntimeError(msg)
+        time.sleep(JOB_POLL_INTERVAL / 10)
+        _timed_run(app, [], timeout)
+    timings.append(time.perf_counter() - start)
+
+
+def _select_tools(app: Any, keys: tuple[str, ...]) -> None:
+    """Select tools in the sidebar the way a user would."""
+    from streambricks import MultiSelectItem
+
+    from config import AVAILABLE_TOOLS
+
+    widget = next((w for w in app.multiselect if w.label == "Available Tools"), None)
+    if widget is None:
+        msg = "Tool selector not found on the chat page"
+        raise RuntimeError(msg)
+    items = [
+        MultiSelectItem(label=spec.label, value=spec, description=spec.description)
+        for spec in AVAILABLE_TOOLS
+        if spec.key in keys
+    ]
+    widget.set_value(items)
+
+
+def _telemetry_values(directory: Path) -> dict[str, list[float]]:
+    """Read the raw observations / increments exported by the app."""
+    values: dict[str, list[float]] = {}
+    path = directory / "events.jsonl"
+    if not path.exists():
+        return values
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            event = json.loads(line)
+            name = event["metric"]
+            if kind := event["labels"].get("kind"):
+                name = f"{name}:{kind}"
+            values.setdefault(name, []).append(event.get("value", event.get("inc", 0)))
+    return values
+
+
+def run_session(scenario: Scenario, index: int, run_dir: Path) -> dict[str, Any]:
+    """Drive one browser session through all pages (in a worker process).
+
+    Sessions of a run share the response cache and conversation store in
+    `run_dir`, like the workers of one deployment, but no earlier run's.
+    """
+    telemetry_dir = Path(tempfile.mkdtemp(prefix="session-", dir=run_dir))
+    os.environ["TELEMETRY_DIR"] = str(telemetry_dir)
+    os.environ["CHAT_CACHE_PATH"] = str(run_dir / "responses.sqlite3")
+    os.environ["CONVERSATION_DB_PATH"] = str(run_dir / "conversations.sqlite3")
+    # Agents log to a SQLite file in the user data dir, which concurrent first
+    # runs would all try to create
+    os.environ["XDG_DATA_HOME"] = str(telemetry_dir / "data")
+    os.environ["CHATBOT_MODEL"] = MODEL_NAME
+    # Only the fake model may answer, also for escalated ticket extractions
+    os.environ["TICKET_ESCALATION_MODELS"] = MODEL_NAME
+    if scenario.hedge:
+        os.environ["CHAT_HEDGE_MODEL"] = MODEL_NAME
+
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.fake_llm import FakeLLM, fake_model_info
+    from components import chat, sidebar, state  # noqa: F401
+    from components.agent_pool import register_model
+    from components.model_catalog import model_catalog
+    from components.telemetry import metrics
+
+    register_model(MODEL_NAME, FakeLLM(replace(scenario.llm, seed=index)).model())
+    model_catalog().seed([fake_model_info()])
+
+    timings: dict[str, list[float]] = {
+        "home": [],
+        "chat_turn": [],
+        "chat_rerun": [],
+        "ticket": [],
+        "ticket_cached": [],
+    }
+    memory_before = _rss_bytes()
+    app = AppTest.from_file(str(ROOT / "streamlit_app.py"))
+    _timed_run(app, timings["home"], scenario.timeout)
+    app.switch_page("pages/step1.py")
+    _timed_run(app, timings["chat_rerun"], scenario.timeout)
+    if scenario.tools:
+        _select_tools(app, scenario.tools)
+        _timed_run(app, timings["chat_rerun"], scenario.timeout)
+
+    started = time.time()
+    for turn in range(scenario.turns):
+        prompt = f"Sitzung {index}, Frage {turn}: Welche Pflichten gelten für Anbieter?"
+        app.chat_input[0].set_value(prompt)
+        _timed_run(app, timings["chat_turn"], scenario.timeout)
+        _timed_run(app, timings["chat_rerun"], scenario.timeout)
+    finished = time.time()
+
+    app.switch_page("pages/step2.py")
+    _wait_for_ticket(app, timings["ticket"], scenario.timeout)
+    _timed_run(app, timings["ticket_cached"], scenario.timeout)
+
+    memory_after = _rss_bytes()
+    metrics.flush()
+    return {
+        "index": index,
+        "started": started,
+        "finished": finished,
+        "memory_bytes": memory_after - memory_before,
+        "timings": timings,
+        "telemetry": _telemetry_values(telemetry_dir),
+    }
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def rank(q: float) -> float:
+        return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+    return {"p50": rank(0.5), "p95": rank(0.95), "max": values[-1]}
+
+
+def summarize(sessions: list[dict[str, Any]]) -> dict[str, float]:
+    """Aggregate session results into flat, comparable metrics."""
+    metrics: dict[str, float] = {}
+    for name in sessions[0]["timings"]:
+        values = [value for session in sessions for value in session["timings"][name]]
+        for stat, value in _percentiles(values).items():
+            metrics[f"{name}_seconds_{stat}"] = value
+
+    def telemetry(name: str) -> list[float]:
+        return [
+            value for session in sessions for value in session["telemetry"].get(name, [])
+        ]
+
+    for name in ("ttft", "queue_wait", "generation"):
+        for stat, value in _percentiles(telemetry(f"chatbot_{name}_seconds")).items():
+            metrics[f"{name}_seconds_{stat}"] = value
+
+    memory = [session["memory_bytes"] / 2**20 for session in sessions]
+    metrics["memory_per_session_mb_mean"] = sum(memory) / len(memory)
+    metrics["memory_per_session_mb_max"] = max(memory)
+
+    span = max(s["finished"] for s in sessions) - min(s["started"] for s in sessions)
+    turns = sum(len(session["timings"]["chat_turn"]) for session in sessions)
+    tokens = sum(telemetry("chatbot_llm_tokens_total:completion"))
+    metrics["throughput_turns_per_second"] = turns / span if span else 0.0
+    metrics["throughput_tokens_per_second"] = tokens / span if span else 0.0
+    return metrics
+
+
+def run_scenario(name: str, scenario: Scenario) -> dict[str, Any]:
+    """Run all sessions of a scenario concurrently and aggregate the results."""
+    with (
+        tempfile.TemporaryDirectory(prefix="chatbot-bench-") as run_dir,
+        # Fresh interpreters, the configuration is read from the environment
+        # on import
+        ProcessPoolExecutor(
+            max_workers=scenario.sessions,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor,
+    ):
+        futures = [
+            executor.submit(run_session, scenario, index, Path(run_dir))
+            for index in range(scenario.sessions)
+        ]
+        sessions = [future.result() for future in futures]
+    return {
+        "scenario": name,
+        "config": json.loads(json.dumps(asdict(scenario))),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "metrics": summarize(sessions),
+    }
+
+
+def compare(
+    result: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> list[str]:
+    """List metrics which regressed by more than `tolerance` against a baseline.
+
+    Throughput metrics must not drop, all others (latencies, memory) must not
+    grow beyond the tolerance.
+    """
+    regressions = []
+    for name, old in baseline["metrics"].items():
+        new = result["metrics"].get(name)
+        if new is None or not old:
+            continue
+        if "_seconds_" in name and max(old, new) < MIN_COMPARED_SECONDS:
+            continue
+        if name.startswith("throughput_"):
+            change = (old - new) / old
+        else:
+            change = (new - old) / abs(old)
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def _print_metrics(result: dict[str, Any]) -> None:
+    print(f"Scenario {result['scenario']}:")
+    for name, value in result["metrics"].items():
+        print(f"  {name:<36} {value:10.4f}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run benchmark scenarios and compare them against the stored baselines."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"Scenarios to run ({', '.join(SCENARIOS)})"
+    )
+    parser.add_argument("--sessions", type=int, help="Override the session count")
+    parser.add_argument("--turns", type=int, help="Override the chat turns per session")
+    parser.add_argument("--latency", type=float, help="Fake model latency (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, help="Fake generation speed")
+    parser.add_argument("--tool-calls", type=int, help="Fake tool calls per turn")
+    parser.add_argument("--output", type=Path, help="Write all results to this file")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help=f"Store the results as new baselines in {BASELINE_DIR.name}/",
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+    if unknown := set(args.scenarios) - SCENARIOS.keys():
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    failed = False
+    results = []
+    for name in args.scenarios or ["smoke"]:
+        scenario = SCENARIOS[name]
+        llm_overrides = {
+            key: value
+            for key, value in (
+                ("latency", args.latency),
+                ("tokens_per_second", args.tokens_per_second),
+                ("tool_calls", args.tool_calls),
+            )
+            if value is not None
+        }
+        scenario = replace(
+            scenario,
+            sessions=args.sessions or scenario.sessions,
+            turns=args.turns or scenario.turns,
+            llm=replace(scenario.llm, **llm_overrides),
+        )
+        result = run_scenario(name, scenario)
+        results.append(result)
+        _print_metrics(result)
+
+        baseline_path = BASELINE_DIR / f"{name}.json"
+        if args.save_baseline:
+            BASELINE_DIR.mkdir(exist_ok=True)
+            baseline_path.write_text(
+                json.dumps(result, indent=2) + "\n", encoding="utf-8"
+            )
+            print(f"  saved baseline {baseline_path.relative_to(ROOT)}")
+        elif baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+            if baseline["config"] != result["config"]:
+                print("  baseline was recorded with a different config, not comparing")
+            elif regressions := compare(result, baseline, args.tolerance):
+                failed = True
+                print("  regressions against baseline:")
+                for line in regressions:
+                    print(f"    {line}")
+            else:
+                print("  no regressions against baseline")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return int(failed)
@@ -0,0 +1,181 @@
+"""App-level pool of agent runtimes shared by all browser sessions."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import functools
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from llmling_agent import AnyAgent
+    from pydantic_ai.models import Model
+
+
+logger = logging.getLogger(__name__)
+
+MAX_IDLE_SECONDS = 30 * 60
+MAX_SESSIONS = 500
+
+_registered_models: dict[str, Model] = {}
+
+
+def register_model(name: str, model: Model) -> None:
+    """Make a model instance resolvable by name (e.g. a local fake model)."""
+    _registered_models[name] = model
+    shared_model.cache_clear()
+
+
+@functools.cache
+def shared_model(name: str) -> Model:
+    """Resolve a model name to a process-wide model instance.
+
+    Model instances only wrap the provider client, so sharing them lets all
+    sessions reuse one client (and its HTTP connection pool) per model.
+    Requests are admitted by the process-wide LLM scheduler.
+    """
+    from components.llm_scheduler import ScheduledModel
+
+    if (model := _registered_models.get(name)) is None:
+        from llmling_models import infer_model
+
+        model = infer_model(name)
+    return ScheduledModel(model, name)
+
+
+@dataclass
+class AgentRuntime:
+    """The agents owned by one browser session."""
+
+    agents: dict[str, AnyAgent[Any, Any]]
+    """Entered agents, keyed by agent name."""
+
+    last_used: float = field(default_factory=time.monotonic)
+    """Monotonic timestamp of the last acquire."""
+
+    loop: asyncio.AbstractEventLoop | None = None
+    """The event loop the agents were entered on."""
+
+    async def close(self) -> None:
+        """Exit all agents, logging (not raising) cleanup failures."""
+        for agent in self.agents.values():
+            try:
+                await agent.__aexit__(None, None, None)
+            except Exception:
+                logger.exception("Failed to close agent %s", agent.name)
+
+
+class AgentPool:
+    """Registry of per-session agent runtimes with idle eviction.
+
+    Sessions only keep lightweight overlays (messages, model and prompt
+    choices) in their session state; the heavy agent runtimes live here and
+    are closed once a session has been idle for too long.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[AgentRuntime]],
+        *,
+        max_idle: float = MAX_IDLE_SECONDS,
+        max_sessions: int = MAX_SESSIONS,
+        on_evict: Callable[[str], None] | None = None,
+    ) -> None:
+        self._factory = factory
+        self._on_evict = on_evict
+        self.max_idle = max_idle
+        self.max_sessions = max_sessions
+        self._runtimes: dict[str, AgentRuntime] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._runtimes)
+
+    def get(self, session_id: str) -> AgentRuntime | None:
+        """Get the runtime of a session without creating one."""
+        return self._runtimes.get(session_id)
+
+    async def acquire(self, session_id: str) -> tuple[AgentRuntime, bool]:
+        """Get or create the runtime for a session.
+
+        Idle sessions are evicted on the way.
+
+        Args:
+            session_id: Streamlit session id
+
+        Returns:
+            The runtime and whether it was newly created
+        """
+        await self.evict_idle(keep=session_id)
+        if runtime := self._runtimes.get(session_id):
+            runtime.last_used = time.monotonic()
+            return runtime, False
+        runtime = await self._factory()
+        runtime.loop = asyncio.get_running_loop()
+        with self._lock:
+            self._runtimes[session_id] = runtime
+        return runtime, True
+
+    async def release(self, session_id: str) -> None:
+        """Close and drop the runtime of a session."""
+        with self._lock:
+            runtime = self._runtimes.pop(session_id, None)
+        if runtime:
+            await self._close(session_id, runtime)
+
+    async def evict_idle(self, *, keep: str | None = None) -> int:
+        """Close runtimes idle for longer than `max_idle`.
+
+        If the pool is over capacity, the least recently used runtimes are
+        evicted as well.
+
+        Args:
+            keep: Session id which must not be evicted
+
+        Returns:
+            Number of evicted runtimes
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [item for item in self._runtimes.items() if item[0] != keep]
+            by_age = sorted(candidates, key=lambda item: item[1].last_used)
+            overflow = max(0, len(self._runtimes) - self.max_sessions + 1)
+            evicted = [
+                session_id
+                for i, (session_id, runtime) in enumerate(by_age)
+                if i < overflow or now - runtime.last_used > self.max_idle
+            ]
+            runtimes = {
+                session_id: self._runtimes.pop(session_id) for session_id in evicted
+            }
+        if runtimes:
+            logger.info("Evicting %d idle agent runtimes", len(runtimes))
+            await asyncio.gather(*(self._close(*item) for item in runtimes.items()))
+        return len(runtimes)
+
+    async def _close(self, session_id: str, runtime: AgentRuntime) -> None:
+        """Close a runtime on the loop its agents are bound to, then evict it.
+
+        A runtime whose loop stopped can't be closed anymore and is dropped.
+        """
+        loop = runtime.loop
+        try:
+            if loop is None or loop is asyncio.get_running_loop():
+                await runtime.close()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(runtime.close(), loop)
+                await asyncio.wrap_future(future)
+            else:
+                logger.warning(
+                    "Dropping the agent runtime of session %s, its loop stopped",
+                    session_id,
+                )
+        finally:
+            if self._on_evict:
+                self._on_evict(session_id)
@@ -0,0 +1,76 @@
+"""In-memory result caching helpers."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+from typing import Any
+
+
+def hash_key(*parts: Any) -> str:
+    """Build a stable content hash from JSON-serializable parts.
+
+    Args:
+        parts: Values identifying the cached result (unknown types use str())
+
+    Returns:
+        Hex digest usable as a cache key
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TTLCache[T]:
+    """Thread-safe LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, maxsize: int = 128, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: T | None = None) -> T | None:
+        """Get a cached value, refreshing its LRU position.
+
+        Args:
+            key: Cache key
+            default: Value to return on a miss or for expired entries
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: T) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> T | None:
+        """Remove an entry and return its value if present."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -2,43 +2,169 @@
 
 from __future__ import annotations
 
+import time
 from typing import TYPE_CHECKING
 
 from llmling_agent.messaging.messages import ChatMessage
 import streamlit as st
 
-from components.state import state
+from components.chat_view import render_history
+from components.hedging import hedged_model
+from components.llm_scheduler import llm_context
+from components.response_cache import cache_scope
+from components.state import MODEL_NAME, state
+from components.telemetry import metrics, record_usage
+from components.tool_registry import has_side_effects
+from config import CHAT_HEDGE_MODEL
+from utils import session_id
 
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
     from llmling_agent import Agent
+    from llmling_agent.tools.tool_call_info import ToolCallInfo
     from streamlit.delta_generator import DeltaGenerator
 
+    from components.context import ContextBuilder
+    from components.response_cache import CachedResponse, ResponseCache
+
 
 async def stream_response(
     agent: Agent[None],
     prompt: str,
     placeholder: DeltaGenerator,
-) -> None:
-    """Stream response and collect messages directly to state."""
+    *,
+    on_tool_call: Callable[[ToolCallInfo], None] | None = None,
+    context: ContextBuilder | None = None,
+    cache: ResponseCache | None = None,
+    retrieve: Callable[[str], str | None] | None = None,
+) -> ChatMessage[str] | None:
+    """Stream response and collect messages directly to state.
+
+    Slow first tokens are hedged with a second request if CHAT_HEDGE_MODEL
+    is configured.
+
+    Args:
+        agent: The agent to run
+        prompt: The user prompt
+        placeholder: Container the growing response is rendered into
+        on_tool_call: Optional callback invoked for each tool call as it is reported
+        context: Optional builder compacting the agent's history to a token budget
+        cache: Optional response cache, bypassed while tools with side effects
+               are enabled
+        retrieve: Optional lookup of reference passages for the prompt, which
+                  are passed to the model without being stored in the history
+
+    Returns:
+        The final response message (with its tool calls attached)
+    """
+    turn_start = time.perf_counter()
+    labels = {"agent": agent.name, "model": agent.model_name or "unknown"}
+    scope = None
+    stored = state.messages[agent.name]
+    if cache is not None and not has_side_effects(agent.tools.values()):
+        scope = cache_scope(agent, stored.tail(stored.hot_window))
+        hit = cache.get(prompt, scope)
+        metrics.inc("chatbot_response_cache_total", result=hit.tier if hit else "miss")
+        if hit:
+            return replay_response(agent, prompt, placeholder, hit)
+    response: ChatMessage[str] | None = None
+    tool_calls: list[ToolCallInfo] = []
 
     # Function to collect messages directly to state
-    async def collect_message(msg: ChatMessage) -> None:
-        messages = state.messages[agent.name]
-        if msg not in messages:
-            messages.append(msg)
+    def collect_message(msg: ChatMessage) -> None:
+        nonlocal response
+        state.messages[agent.name].append(msg)
+        if msg.role == "assistant":
+            response = msg
+
+    def collect_tool_call(call: ToolCallInfo) -> None:
+        tool_calls.append(call)
+        if call.timing is not None:
+            metrics.observe(
+                "chatbot_tool_call_seconds",
+                call.timing,
+                agent=agent.name,
+                tool=call.tool_name,
+            )
+        if on_tool_call:
+            on_tool_call(call)
 
     # Connect to agent events
     agent.message_sent.connect(collect_message)
     agent.message_received.connect(collect_message)
+    agent.tool_used.connect(collect_tool_call)
 
     try:
-        async with agent.run_stream(prompt) as stream:
-            async for chunk in stream.stream():
-                placeholder.markdown(chunk)
+        # The store is the history, the agent doesn't keep a copy of its own
+        if context:
+            history = await context.compact(stored)
+        else:
+            history = stored.tail(stored.hot_window)
+        if retrieve and (passages := retrieve(prompt)):
+            excerpt = ChatMessage[str](content=passages, role="user", name="documents")
+            history = [*history, excerpt]
+        # Everything before the model request counts as queue wait
+        request_start = time.perf_counter()
+        metrics.observe(
+            "chatbot_queue_wait_seconds", request_start - turn_start, **labels
+        )
+        first_token = True
+        model = None
+        if CHAT_HEDGE_MODEL:
+            model = hedged_model(state.agent_config[agent.name].get("model", MODEL_NAME))
+        with llm_context(session=session_id()):
+            async with agent.run_stream(
+                prompt, messages=history, model=model, store_history=False
+            ) as stream:
+                async for chunk in stream.stream():
+                    if first_token:
+                        first_token = False
+                        ttft = time.perf_counter() - request_start
+                        metrics.observe("chatbot_ttft_seconds", ttft, **labels)
+                    placeholder.markdown(chunk)
+        generation = time.perf_counter() - request_start
+        metrics.observe("chatbot_generation_seconds", generation, **labels)
     finally:
         agent.message_sent.disconnect(collect_message)
         agent.message_received.disconnect(collect_message)
+        agent.tool_used.disconnect(collect_tool_call)
+
+    # Streamed responses don't carry their tool calls, so attach the reported ones
+    if response is not None and not response.tool_calls and tool_calls:
+        response.tool_calls.extend(tool_calls)
+        state.messages[agent.name].update(response)
+    if response is not None:
+        record_usage(agent.name, agent.model_name, response)
+    if cache is not None and scope is not None and response is not None:
+        cache.set(prompt, scope, str(response.content), response.model)
+    return response
+
+
+def replay_response(
+    agent: Agent[None],
+    prompt: str,
+    placeholder: DeltaGenerator,
+    hit: CachedResponse,
+) -> ChatMessage[str]:
+    """Show a cached answer at once and record the exchange like a model run."""
+    user_msg = ChatMessage[str](content=prompt, role="user", name="user")
+    response = ChatMessage[str](
+        content=hit.content,
+        role="assistant",
+        name=agent.name,
+        model=hit.model,
+        metadata={"cache": hit.tier, "cache_score": round(hit.score, 3)},
+    )
+    placeholder.markdown(hit.content)
+    record_messages(agent, [user_msg, response])
+    return response
+
+
+def record_messages(agent: Agent[None], messages: Sequence[ChatMessage[str]]) -> None:
+    """Add messages to the agent's history without a model run."""
+    state.messages[agent.name].extend(messages)
 
 
 async def return_response(
@@ -48,17 +174,19 @@ async def return_response(
     """Get response with messages collected directly to state."""
 
     # Function to collect messages directly to state
-    async def collect_message(msg: ChatMessage) -> None:
-        messages = state.messages[agent.name]
-        if msg not in messages:
-            messages.append(msg)
+    def collect_message(msg: ChatMessage) -> None:
+        state.messages[agent.name].append(msg)
 
     # Connect to agent events
     agent.message_sent.connect(collect_message)
     agent.message_received.connect(collect_message)
 
+    history = state.messages[agent.name]
     try:
-        await agent.run(prompt)  # We collect messages via events
+        # We collect messages via events
+        await agent.run(
+            prompt, messages=history.tail(history.hot_window), store_history=False
+        )
     finally:
         agent.message_sent.disconnect(collect_message)
         agent.message_received.disconnect(collect_message)
@@ -66,7 +194,7 @@ async def return_response(
 
 def clear_chat_history(agent: Agent[None]) -> None:
     """Clear the chat history for a specific agent."""
-    state.messages[agent.name] = []
+    state.clear_agent_messages(agent.name)
 
 
 async def create_chat_ui(
@@ -80,9 +208,8 @@ async def create_chat_ui(
     messages = state.messages[agent.name]
 
     # Display chat history
-    for message in messages:
-        with st.chat_message(message.role):
-            st.markdown(message.content)
+    with metrics.timer("chatbot_render_seconds", view=agent.name):
+        render_history(messages, key=agent.name)
 
     # Chat input
     if prompt := st.chat_input(placeholder_text):
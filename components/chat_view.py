@@ -9,36 +9,57 @@ import streamlit as st
 
 
 if TYPE_CHECKING:
+    from collections.abc import Sequence
     import types
 
+    from llmling_agent.tools.tool_call_info import ToolCallInfo
     from streamlit.delta_generator import DeltaGenerator
 
 
-def render_tool_call(container: DeltaGenerator | types.ModuleType, tool_call):
-    """Render a tool call in an expander."""
-    with container.expander(f"🛠️ Tool: {tool_call.tool_name}", expanded=False):
-        st.markdown("**Arguments:**")
-        for name, value in tool_call.args.items():
-            st.markdown(f"- `{name}`: {value}")
-        if tool_call.result:
-            st.markdown("**Result:**")
-            st.markdown(f"\n{tool_call.result}\n")
-        if tool_call.error:
-            st.error(f"Error: {tool_call.error}")
-        if tool_call.timing:
-            st.markdown(f"*Execution time: {tool_call.timing:.2f}s*")
+# Number of messages shown initially and added per "load earlier" click
+HISTORY_WINDOW = 20
+HISTORY_PAGE_SIZE = 20
 
 
-def render_message_content(msg: ChatMessage[Any], container: DeltaGenerator):
-    """Render a message's content with optional metadata."""
-    # Main content
-    container.markdown(str(msg.content))
+def render_tool_call_details(tool_call: ToolCallInfo):
+    """Render arguments, result, error and timing of a tool call."""
+    st.markdown("**Arguments:**")
+    for name, value in tool_call.args.items():
+        st.markdown(f"- `{name}`: {value}")
+    if tool_call.result:
+        st.markdown("**Result:**")
+        st.markdown(f"\n{tool_call.result}\n")
+    if tool_call.error:
+        st.error(f"Error: {tool_call.error}")
+    if tool_call.timing:
+        st.markdown(f"*Execution time: {tool_call.timing:.2f}s*")
 
-    # Show tool calls in expanders
-    for tool_call in msg.tool_calls:
-        render_tool_call(container, tool_call)
 
-    # Optional metadata footer
+def render_tool_call(
+    container: DeltaGenerator | types.ModuleType,
+    tool_call: ToolCallInfo,
+    *,
+    lazy: bool = False,
+):
+    """Render a tool call in an expander.
+
+    Args:
+        container: Container to render in
+        tool_call: The tool call to show
+        lazy: Render a toggle instead, so details (which may contain large
+              tool results) are only rendered while it is switched on
+    """
+    label = f"🛠️ Tool: {tool_call.tool_name}"
+    if not lazy:
+        with container.expander(label, expanded=False):
+            render_tool_call_details(tool_call)
+    elif container.toggle(label, key=f"tool_call_{tool_call.tool_call_id}"):
+        with container.container(border=True):
+            render_tool_call_details(tool_call)
+
+
+def format_message(msg: ChatMessage[Any]) -> tuple[str, str]:
+    """Format a message's content and metadata footer as markdown."""
     metadata = []
     if msg.model:
         metadata.append(f"Model: {msg.model}")
@@ -47,10 +68,30 @@ def render_message_content(msg: ChatMessage[Any], container: DeltaGenerator):
         metadata.append(f"Tokens: {msg.cost_info.token_usage['total']:,}")
     if msg.response_time:
         metadata.append(f"Time: {msg.response_time:.2f}s")
+    if tier := (msg.metadata or {}).get("cache"):
+        metadata.append(f"Cache: {tier}")
+    return str(msg.content), " | ".join(metadata)
+
+
+def render_message_content(
+    msg: ChatMessage[Any],
+    container: DeltaGenerator,
+    *,
+    lazy_tools: bool = False,
+):
+    """Render a message's content with optional metadata."""
+    content, footer = format_message(msg)
+    # Main content
+    container.markdown(content)
 
-    if metadata:
+    # Show tool calls in expanders
+    for tool_call in msg.tool_calls:
+        render_tool_call(container, tool_call, lazy=lazy_tools)
+
+    # Optional metadata footer
+    if footer:
         container.markdown("---")
-        container.markdown(" | ".join(metadata))
+        container.markdown(footer)
 
 
 def chatmessage_view(
@@ -70,6 +111,39 @@ def chatmessage_view(
             render_message_content(msg, st_container)  # type: ignore
 
 
+def render_history(
+    messages: Sequence[ChatMessage[Any]],
+    *,
+    key: str,
+    window: int = HISTORY_WINDOW,
+    page_size: int = HISTORY_PAGE_SIZE,
+):
+    """Display the newest messages of a history with a pager for earlier ones.
+
+    Only the visible window is rendered, and tool call details are rendered
+    lazily, so repaint cost doesn't grow with the length of the conversation.
+
+    Args:
+        messages: Full message history
+        key: Unique key for the pager state (e.g. the agent name)
+        window: Number of messages shown initially
+        page_size: Number of earlier messages added per click
+    """
+    state_key = f"history_window_{key}"
+    visible = st.session_state.setdefault(state_key, window)
+    if (hidden := len(messages) - visible) > 0 and st.button(
+        f"Frühere Nachrichten laden ({hidden})",
+        key=f"{state_key}_more",
+        use_container_width=True,
+    ):
+        visible = st.session_state[state_key] = visible + page_size
+
+    for msg in messages[-visible:] if visible else []:
+        role = "user" if msg.role == "user" else "assistant"
+        with st.chat_message(role):
+            render_message_content(msg, st, lazy_tools=True)  # type: ignore
+
+
 if __name__ == "__main__":
     from llmling_agent import ToolCallInfo
 
@@ -0,0 +1,237 @@
+"""Token-budgeted context building for agent prompts."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from llmling_agent import ChatMessage
+from tokonomics import count_tokens
+
+from components.cache import TTLCache
+from config import CONTEXT_BUDGETS, DEFAULT_CONTEXT_BUDGET
+
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Sequence
+
+    from llmling_agent import AnyAgent
+
+    Summarizer = Callable[[str, Sequence[ChatMessage[Any]]], Awaitable[str]]
+
+
+# Rough characters-per-token ratio used when cutting text to a token budget
+CHARS_PER_TOKEN = 4
+SUMMARY_LINE_CHARS = 200
+# Share of the budget available to verbatim turns once a summary is needed
+RECENT_SHARE = 0.75
+
+# Token counts per message id, and rolling summaries per last summarized message id
+_token_counts = TTLCache[int](maxsize=16384)
+_summaries = TTLCache[str](maxsize=4096)
+
+
+def budget_for_model(model: str | None) -> int:
+    """Get the context token budget configured for a model.
+
+    Args:
+        model: Model name, with or without provider prefix
+    """
+    model_id = (model or "").split(":", 1)[-1]
+    return CONTEXT_BUDGETS.get(model_id, DEFAULT_CONTEXT_BUDGET)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly `max_tokens` tokens, marking the cut."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]} […]"
+
+
+async def extractive_summary(previous: str, messages: Sequence[ChatMessage[Any]]) -> str:
+    """Summarize messages by their leading line, without calling a model.
+
+    Args:
+        previous: Summary of the messages before the given ones
+        messages: Messages to add to the summary
+    """
+    lines = [previous] if previous else []
+    for msg in messages:
+        first_line = str(msg.content).strip().split("\n", 1)[0]
+        lines.append(f"- {msg.role.upper()}: {first_line[:SUMMARY_LINE_CHARS]}")
+    return "\n".join(lines)
+
+
+def agent_summarizer(agent: AnyAgent[Any, Any]) -> Summarizer:
+    """Create a summarizer which lets an agent condense older turns.
+
+    The agent runs without storing the exchange in its own history. The
+    summarizer is identified by agent name and model, so summarizers
+    created per turn share their cached summaries.
+    """
+
+    async def summarize(previous: str, messages: Sequence[ChatMessage[Any]]) -> str:
+        turns = "\n\n".join(f"{msg.role.upper()}: {msg.content}" for msg in messages)
+        prompt = (
+            "Fasse den folgenden Gesprächsverlauf knapp zusammen. Behalte Fakten, "
+            "Entscheidungen und offene Punkte bei.\n\n"
+            f"BISHERIGE ZUSAMMENFASSUNG:\n{previous or '-'}\n\n"
+            f"NEUE NACHRICHTEN:\n{turns}"
+        )
+        result = await agent.run(prompt, store_history=False)
+        return str(result.content)
+
+    summarize.cache_key = f"agent:{agent.name}:{agent.model_name}"  # type: ignore[attr-defined]
+    return summarize
+
+
+def _summarizer_key(summarizer: Summarizer) -> str:
+    """Identify a summarizer in the summary cache (by identity by default)."""
+    return getattr(summarizer, "cache_key", None) or f"id:{id(summarizer)}"
+
+
+@dataclass
+class ContextBuilder:
+    """Fits a chat history into a token budget.
+
+    Recent turns are kept verbatim, older turns are replaced by a rolling
+    summary (cached per summarized message range) and tool results are cut
+    to a per-result limit.
+    """
+
+    max_tokens: int = DEFAULT_CONTEXT_BUDGET
+    """Token budget for the whole history."""
+
+    keep_recent: int = 6
+    """Number of newest messages kept verbatim whenever they fit."""
+
+    max_tool_result_tokens: int = 300
+    """Tokens kept per tool result (0 drops tool results)."""
+
+    summarizer: Summarizer = extractive_summary
+    """Coroutine function condensing older messages."""
+
+    model: str | None = None
+    """Model name used for token counting."""
+
+    @classmethod
+    def for_model(cls, model: str | None, **kwargs: Any) -> ContextBuilder:
+        """Create a builder using the configured budget of a model."""
+        return cls(max_tokens=budget_for_model(model), model=model, **kwargs)
+
+    def format_message(self, msg: ChatMessage[Any]) -> str:
+        """Format a message (and its size-limited tool results) as prompt text."""
+        text = f"{msg.role.upper()}: {msg.content}"
+        if not self.max_tool_result_tokens:
+            return text
+        results = [
+            f"TOOL {call.tool_name}: "
+            f"{truncate_tokens(str(call.result), self.max_tool_result_tokens)}"
+            for call in msg.tool_calls
+            if call.result
+        ]
+        return "\n".join([text, *results])
+
+    def count(self, msg: ChatMessage[Any]) -> int:
+        """Count the tokens of a formatted message (cached by message id)."""
+        key = f"{msg.message_id}:{self.max_tool_result_tokens}"
+        if (tokens := _token_counts.get(key)) is None:
+            tokens = count_tokens(self.format_message(msg), self.model)
+            _token_counts.set(key, tokens)
+        return tokens
+
+    def keep_from(self, messages: Sequence[ChatMessage[Any]]) -> int:
+        """Get the position of the first message to keep verbatim.
+
+        It is 0 if the whole history fits into the budget. Otherwise the
+        newest messages are kept while they fit into `RECENT_SHARE` of the
+        budget (the full budget for the first `keep_recent` messages). The
+        last message is always kept. Messages are only counted back until
+        the budget is exceeded, so long stored histories are not loaded.
+        """
+        recent_budget = int(self.max_tokens * RECENT_SHARE)
+        used = 0
+        start = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            tokens = self.count(messages[i])
+            kept = len(messages) - start
+            limit = self.max_tokens if kept < self.keep_recent else recent_budget
+            if kept and used + tokens > limit:
+                break
+            used += tokens
+            start = i
+        for i in range(start - 1, -1, -1):
+            used += self.count(messages[i])
+            if used > self.max_tokens:
+                return start
+        return 0
+
+    def _summary_key(self, msg: ChatMessage[Any]) -> str:
+        return f"{msg.message_id}:{_summarizer_key(self.summarizer)}"
+
+    async def summarize(
+        self, messages: Sequence[ChatMessage[Any]], stop: int | None = None
+    ) -> str:
+        """Get the rolling summary of a message prefix.
+
+        Summaries are cached by the id of the last summarized message, so
+        each new turn only summarizes (and loads) the messages that aged
+        out since.
+
+        Args:
+            messages: The history
+            stop: End of the prefix to summarize (default: the whole history)
+        """
+        stop = len(messages) if stop is None else stop
+        if not stop:
+            return ""
+        if (summary := _summaries.get(self._summary_key(messages[stop - 1]))) is not None:
+            return summary
+        previous, start = "", 0
+        for i in range(stop - 2, -1, -1):
+            if (cached := _summaries.get(self._summary_key(messages[i]))) is not None:
+                previous, start = cached, i + 1
+                break
+        summary = await self.summarizer(previous, messages[start:stop])
+        _summaries.set(self._summary_key(messages[stop - 1]), summary)
+        return summary
+
+    async def _fitted_summary(
+        self,
+        messages: Sequence[ChatMessage[Any]],
+        stop: int,
+        recent: Sequence[ChatMessage[Any]],
+    ) -> str:
+        summary = await self.summarize(messages, stop)
+        used = sum(self.count(msg) for msg in recent)
+        return truncate_tokens(summary, max(self.max_tokens - used, 0))
+
+    async def build(self, messages: Sequence[ChatMessage[Any]]) -> str:
+        """Build a prompt-ready history text within the token budget."""
+        start = self.keep_from(messages)
+        recent = messages[start:]
+        parts = [self.format_message(msg) for msg in recent]
+        if start:
+            summary = await self._fitted_summary(messages, start, recent)
+            parts.insert(0, f"ZUSAMMENFASSUNG FRÜHERER NACHRICHTEN:\n{summary}")
+        return "\n\n".join(parts)
+
+    async def compact(
+        self, messages: Sequence[ChatMessage[Any]]
+    ) -> list[ChatMessage[Any]]:
+        """Compact a history into a summary message followed by recent turns.
+
+        Meant as `messages=` history override for agent runs. The history
+        may be a `PersistentHistory`, only the messages needed get loaded.
+        """
+        start = self.keep_from(messages)
+        recent = list(messages[start:])
+        if not start:
+            return recent
+        summary = await self._fitted_summary(messages, start, recent)
+        summary_msg = ChatMessage[str](
+            content=f"Zusammenfassung des bisherigen Gesprächs:\n{summary}",
+            role="system",
+        )
+        return [summary_msg, *recent]
@@ -0,0 +1,834 @@
+"""Durable conversation store with a bounded in-memory window per conversation."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from datetime import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, overload
+import zlib
+
+from llmling_agent import ChatMessage, ToolCallInfo
+from llmling_agent.messaging.messages import TokenCost
+from pydantic_core import to_jsonable_python
+
+from components.cache import TTLCache
+from config import (
+    CONVERSATION_HOT_WINDOW,
+    CONVERSATION_PAGE_SIZE,
+    CONVERSATION_PAYLOAD_THRESHOLD,
+    CONVERSATION_RETENTION,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from pathlib import Path
+
+
+# Pages of older messages cached per conversation
+CACHED_PAGES = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    conversation TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (conversation, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_id ON messages (conversation, message_id);
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS payload_refs (
+    conversation TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (conversation, seq, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS payload_refs_hash ON payload_refs (hash);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+type Payload = tuple[str, bytes]
+"""Content hash and compressed data of an out of line tool result."""
+
+
+def _jsonable(value: Any) -> Any:
+    return to_jsonable_python(value, fallback=str)
+
+
+def dump_message(
+    msg: ChatMessage[Any],
+    store_payload: Callable[[bytes], str],
+    threshold: int = CONVERSATION_PAYLOAD_THRESHOLD,
+) -> str:
+    """Serialize a message to compact JSON, leaving out defaults.
+
+    Tool results larger than `threshold` bytes are handed to `store_payload`
+    and replaced by the returned reference.
+    """
+    data: dict[str, Any] = {
+        "i": msg.message_id,
+        "r": msg.role,
+        "t": msg.timestamp.isoformat(),
+    }
+    if isinstance(msg.content, str):
+        data["c"] = msg.content
+    else:
+        data["cj"] = _jsonable(msg.content)
+    if msg.name:
+        data["n"] = msg.name
+    if msg.model:
+        data["m"] = msg.model
+    if msg.metadata:
+        data["md"] = _jsonable(msg.metadata)
+    if msg.response_time is not None:
+        data["rt"] = msg.response_time
+    if msg.cost_info:
+        usage = msg.cost_info.token_usage
+        data["$"] = [
+            msg.cost_info.total_cost,
+            usage["total"],
+            usage["prompt"],
+            usage["completion"],
+        ]
+    calls = []
+    for call in msg.tool_calls:
+        entry: dict[str, Any] = {
+            "n": call.tool_name,
+            "a": _jsonable(call.args),
+            "g": call.agent_name,
+            "i": call.tool_call_id,
+        }
+        if call.timing is not None:
+            entry["t"] = call.timing
+        if call.error:
+            entry["e"] = call.error
+        if call.result is not None:
+            result = _jsonable(call.result)
+            raw = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode()
+            if len(raw) > threshold:
+                entry["rr"] = store_payload(raw)
+            else:
+                entry["r"] = result
+        calls.append(entry)
+    if calls:
+        data["tc"] = calls
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_message(raw: str, load_payload: Callable[[str], bytes]) -> ChatMessage[Any]:
+    """Restore a message serialized by `dump_message`."""
+    data = json.loads(raw)
+    cost_info = None
+    if cost := data.get("$"):
+        total_cost, total, prompt, completion = cost
+        usage = {"total": total, "prompt": prompt, "completion": completion}
+        cost_info = TokenCost(token_usage=usage, total_cost=total_cost)  # type: ignore[arg-type]
+    tool_calls = [
+        ToolCallInfo(
+            tool_name=entry["n"],
+            args=entry["a"],
+            result=json.loads(load_payload(entry["rr"]))
+            if "rr" in entry
+            else entry.get("r"),
+            agent_name=entry["g"],
+            tool_call_id=entry["i"],
+            message_id=data["i"],
+            error=entry.get("e"),
+            timing=entry.get("t"),
+        )
+        for entry in data.get("tc", [])
+    ]
+    return ChatMessage(
+        content=data["c"] if "c" in data else data["cj"],
+        role=data["r"],
+        name=data.get("n"),
+        model=data.get("m"),
+        metadata=data.get("md", {}),
+        timestamp=datetime.fromisoformat(data["t"]),
+        cost_info=cost_info,
+        message_id=data["i"],
+        response_time=data.get("rt"),
+        tool_calls=tool_calls,
+    )
+
+
+def _payload_digests(data: str) -> set[str]:
+    """Get the payloads a serialized message references."""
+    return {entry["rr"] for entry in json.loads(data).get("tc", []) if "rr" in entry}
+
+
+class ConversationStore(ABC):
+    """Serialized messages, one sequence per conversation.
+
+    Large tool results are stored once per content hash, zlib-compressed,
+    and dropped once no stored message references them anymore.
+    """
+
+    def __init__(
+        self,
+        *,
+        payload_threshold: int = CONVERSATION_PAYLOAD_THRESHOLD,
+        retention: float = CONVERSATION_RETENTION,
+    ) -> None:
+        self.payload_threshold = payload_threshold
+        self.retention = retention
+        """Seconds a conversation is kept without new messages."""
+
+    def _serialize(self, msg: ChatMessage[Any]) -> tuple[str, list[Payload]]:
+        payloads: list[Payload] = []
+
+        def store_payload(raw: bytes) -> str:
+            digest = hashlib.sha256(raw).hexdigest()
+            payloads.append((digest, zlib.compress(raw)))
+            return digest
+
+        return dump_message(msg, store_payload, self.payload_threshold), payloads
+
+    def _load_payload(self, digest: str) -> bytes:
+        blob = self._payload(digest)
+        return zlib.decompress(blob) if blob is not None else b"null"
+
+    def append(self, conversation: str, msg: ChatMessage[Any]) -> int:
+        """Store a message at the end of a conversation.
+
+        Returns:
+            Position of the message (other workers may have appended meanwhile)
+        """
+        data, payloads = self._serialize(msg)
+        return self._append(conversation, msg.message_id, data, payloads)
+
+    def update(self, conversation: str, msg: ChatMessage[Any]) -> bool:
+        """Rewrite a stored message (e.g. after tool calls were attached).
+
+        Returns:
+            Whether the message was found
+        """
+        if (seq := self.position(conversation, msg.message_id)) is None:
+            return False
+        data, payloads = self._serialize(msg)
+        self._replace(conversation, seq, msg.message_id, data, payloads)
+        return True
+
+    def load(self, conversation: str, start: int, stop: int) -> list[ChatMessage[Any]]:
+        """Load the messages at positions `start` to `stop` (exclusive)."""
+        rows = self._read(conversation, start, stop)
+        return [load_message(data, self._load_payload) for data in rows]
+
+    def clear(self, conversation: str) -> None:
+        """Delete a conversation."""
+        self.truncate(conversation, 0)
+
+    @abstractmethod
+    def _append(
+        self, conversation: str, message_id: str, data: str, payloads: list[Payload]
+    ) -> int: ...
+
+    @abstractmethod
+    def _replace(
+        self,
+        conversation: str,
+        seq: int,
+        message_id: str,
+        data: str,
+        payloads: list[Payload],
+    ) -> None: ...
+
+    @abstractmethod
+    def _read(self, conversation: str, start: int, stop: int) -> list[str]: ...
+
+    @abstractmethod
+    def _payload(self, digest: str) -> bytes | None: ...
+
+    @abstractmethod
+    def count(self, conversation: str) -> int:
+        """Number of messages of a conversation."""
+
+    @abstractmethod
+    def position(self, conversation: str, message_id: str) -> int | None:
+        """Position of a message within its conversation."""
+
+    @abstractmethod
+    def truncate(self, conversation: str, length: int) -> None:
+        """Delete all messages of a conversation after the first `length` ones."""
+
+
+class MemoryConversationStore(ConversationStore):
+    """Conversations held in this process (single worker setups and tests)."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._messages: dict[str, list[tuple[str, str, list[str]]]] = {}
+        self._payloads: dict[str, bytes] = {}
+        self._refs: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _link(self, payloads: list[Payload]) -> list[str]:
+        for digest, blob in payloads:
+            self._payloads.setdefault(digest, blob)
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+        return [digest for digest, _ in payloads]
+
+    def _unlink(self, digests: list[str]) -> None:
+        for digest in digests:
+            self._refs[digest] -= 1
+            if not self._refs[digest]:
+                del self._refs[digest], self._payloads[digest]
+
+    def _append(
+        self, conversation: str, message_id: str, data: str, payloads: list[Payload]
+    ) -> int:
+        with self._lock:
+            messages = self._messages.setdefault(conversation, [])
+            messages.append((message_id, data, self._link(payloads)))
+            return len(messages) - 1
+
+    def _replace(
+        self,
+        conversation: str,
+        seq: int,
+        message_id: str,
+        data: str,
+        payloads: list[Payload],
+    ) -> None:
+        with self._lock:
+            messages = self._messages[conversation]
+            digests = self._link(payloads)
+            self._unlink(messages[seq][2])
+            messages[seq] = (message_id, data, digests)
+
+    def _read(self, conversation: str, start: int, stop: int) -> list[str]:
+        with self._lock:
+            messages = self._messages.get(conversation, [])
+            return [data for _, data, _ in messages[start:stop]]
+
+    def _payload(self, digest: str) -> bytes | None:
+        return self._payloads.get(digest)
+
+    def count(self, conversation: str) -> int:
+        return len(self._messages.get(conversation, []))
+
+    def position(self, conversation: str, message_id: str) -> int | None:
+        with self._lock:
+            messages = self._messages.get(conversation, [])
+            return next(
+                (i for i, entry in enumerate(messages) if entry[0] == message_id),
+                None,
+            )
+
+    def truncate(self, conversation: str, length: int) -> None:
+        with self._lock:
+            messages = self._messages.get(conversation, [])
+            for _, _, digests in messages[length:]:
+                self._unlink(digests)
+            del messages[length:]
+            if not messages:
+                self._messages.pop(conversation, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversations in a SQLite file, shared by the workers of one machine."""
+
+    def __init__(self, path: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The SQLite connection, opened on first use."""
+        with self._lock:
+            if self._db is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.executescript(_SCHEMA)
+                self._prune(db)
+                self._db = db
+            return self._db
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        """Delete conversations which were not continued within the retention."""
+        stale = "SELECT id FROM conversations WHERE updated < ?"
+        params = (time.time() - self.retention,)
+        db.execute(f"DELETE FROM messages WHERE conversation IN ({stale})", params)
+        db.execute(f"DELETE FROM payload_refs WHERE conversation IN ({stale})", params)
+        db.execute("DELETE FROM conversations WHERE updated < ?", params)
+        db.execute(
+            "DELETE FROM payloads WHERE hash NOT IN (SELECT hash FROM payload_refs)"
+        )
+        db.commit()
+
+    def _write(
+        self,
+        db: sqlite3.Connection,
+        conversation: str,
+        seq: int,
+        *,
+        message_id: str,
+        data: str,
+        payloads: list[Payload],
+    ) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)",
+            (conversation, seq, message_id, data),
+        )
+        db.execute(
+            "DELETE FROM payload_refs WHERE conversation = ? AND seq = ?",
+            (conversation, seq),
+        )
+        for digest, blob in payloads:
+            db.execute("INSERT OR IGNORE INTO payloads VALUES (?, ?)", (digest, blob))
+            db.execute(
+                "INSERT OR IGNORE INTO payload_refs VALUES (?, ?, ?)",
+                (conversation, seq, digest),
+            )
+        db.execute(
+            "INSERT OR REPLACE INTO conversations VALUES (?, ?)",
+            (conversation, time.time()),
+        )
+
+    def _append(
+        self, conversation: str, message_id: str, data: str, payloads: list[Payload]
+    ) -> int:
+        db = self.db
+        with self._lock:
+            # Immediate, so concurrent writers (other workers) get distinct positions
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = db.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages"
+                    " WHERE conversation = ?",
+                    (conversation,),
+                ).fetchone()
+                self._write(
+                    db,
+                    conversation,
+                    seq,
+                    message_id=message_id,
+                    data=data,
+                    payloads=payloads,
+                )
+            except BaseException:
+                db.rollback()
+                raise
+            db.commit()
+        return seq
+
+    def _replace(
+        self,
+        conversation: str,
+        seq: int,
+        message_id: str,
+        data: str,
+        payloads: list[Payload],
+    ) -> None:
+        db = self.db
+        with self._lock:
+            self._write(
+                db, conversation, seq, message_id=message_id, data=data, payloads=payloads
+            )
+            db.execute(
+                "DELETE FROM payloads WHERE hash NOT IN (SELECT hash FROM payload_refs)"
+            )
+            db.commit()
+
+    def _read(self, conversation: str, start: int, stop: int) -> list[str]:
+        db = self.db
+        with self._lock:
+            rows = db.execute(
+                "SELECT data FROM messages WHERE conversation = ? AND seq >= ?"
+                " AND seq < ? ORDER BY seq",
+                (conversation, start, stop),
+            ).fetchall()
+        return [data for (data,) in rows]
+
+    def _payload(self, digest: str) -> bytes | None:
+        db = self.db
+        with self._lock:
+            row = db.execute(
+                "SELECT data FROM payloads WHERE hash = ?", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def count(self, conversation: str) -> int:
+        db = self.db
+        with self._lock:
+            row = db.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation = ?",
+                (conversation,),
+            ).fetchone()
+        return row[0]
+
+    def position(self, conversation: str, message_id: str) -> int | None:
+        db = self.db
+        with self._lock:
+            row = db.execute(
+                "SELECT seq FROM messages WHERE conversation = ? AND message_id = ?",
+                (conversation, message_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def truncate(self, conversation: str, length: int) -> None:
+        db = self.db
+        with self._lock:
+            params = (conversation, length)
+            db.execute("DELETE FROM messages WHERE conversation = ? AND seq >= ?", params)
+            db.execute(
+                "DELETE FROM payload_refs WHERE conversation = ? AND seq >= ?", params
+            )
+            db.execute(
+                "DELETE FROM payloads WHERE hash NOT IN (SELECT hash FROM payload_refs)"
+            )
+            if not length:
+                db.execute("DELETE FROM conversations WHERE id = ?", (conversation,))
+            db.commit()
+
+
+class RedisConversationStore(ConversationStore):
+    """Conversations in Redis (or a compatible server), shared by all workers.
+
+    Messages of a conversation are a list plus a hash from message id to
+    position. Keys expire after the retention, which every write renews
+    for the conversation and all payloads it references.
+
+    Args:
+        client: A `redis.Redis` compatible client
+        prefix: Prefix of all keys
+    """
+
+    def __init__(self, client: Any, *, prefix: str = "chatbot", **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, conversation: str, kind: str) -> str:
+        return f"{self.prefix}:conversation:{conversation}:{kind}"
+
+    def _payload_key(self, digest: str) -> str:
+        return f"{self.prefix}:payload:{digest}"
+
+    def _store_payloads(
+        self, pipe: Any, conversation: str, payloads: list[Payload]
+    ) -> None:
+        ttl = int(self.retention)
+        refs = self._key(conversation, "payloads")
+        for digest, blob in payloads:
+            pipe.set(self._payload_key(digest), blob, ex=ttl, nx=True)
+            pipe.sadd(refs, digest)
+        for kind in ("messages", "ids", "payloads"):
+            pipe.expire(self._key(conversation, kind), ttl)
+
+    def _touch_payloads(self, conversation: str) -> None:
+        """Renew the expiry of all payloads a conversation references."""
+        digests = self.client.smembers(self._key(conversation, "payloads"))
+        if not digests:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for digest in digests:
+            key = digest.decode() if isinstance(digest, bytes) else digest
+            pipe.expire(self._payload_key(key), int(self.retention))
+        pipe.execute()
+
+    def _unreference(self, conversation: str, digests: set[str]) -> None:
+        """Drop payloads no stored message references anymore from the set.
+
+        The payloads themselves may be shared with other conversations, they
+        expire once no conversation renews them.
+        """
+        if not digests:
+            return
+        for data in self._read(conversation, 0, self.count(conversation)):
+            digests -= _payload_digests(data)
+        if digests:
+            self.client.srem(self._key(conversation, "payloads"), *digests)
+
+    def _append(
+        self, conversation: str, message_id: str, data: str, payloads: list[Payload]
+    ) -> int:
+        length = self.client.rpush(self._key(conversation, "messages"), data)
+        seq = length - 1
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(conversation, "ids"), message_id, seq)
+        self._store_payloads(pipe, conversation, payloads)
+        pipe.execute()
+        if payloads:
+            self._touch_payloads(conversation)
+        return seq
+
+    def _replace(
+        self,
+        conversation: str,
+        seq: int,
+        message_id: str,
+        data: str,
+        payloads: list[Payload],
+    ) -> None:
+        messages_key = self._key(conversation, "messages")
+        previous = self.client.lindex(messages_key, seq)
+        pipe = self.client.pipeline()
+        pipe.lset(messages_key, seq, data)
+        pipe.hset(self._key(conversation, "ids"), message_id, seq)
+        self._store_payloads(pipe, conversation, payloads)
+        pipe.execute()
+        if previous is not None:
+            previous = previous.decode() if isinstance(previous, bytes) else previous
+            replaced = _payload_digests(previous) - {digest for digest, _ in payloads}
+            self._unreference(conversation, replaced)
+
+    def _read(self, conversation: str, start: int, stop: int) -> list[str]:
+        if stop <= start:
+            return []
+        rows = self.client.lrange(self._key(conversation, "messages"), start, stop - 1)
+        return [row.decode() if isinstance(row, bytes) else row for row in rows]
+
+    def _payload(self, digest: str) -> bytes | None:
+        return self.client.get(self._payload_key(digest))
+
+    def count(self, conversation: str) -> int:
+        return self.client.llen(self._key(conversation, "messages"))
+
+    def position(self, conversation: str, message_id: str) -> int | None:
+        seq = self.client.hget(self._key(conversation, "ids"), message_id)
+        return None if seq is None else int(seq)
+
+    def truncate(self, conversation: str, length: int) -> None:
+        if not length:
+            self.client.delete(
+                *(
+                    self._key(conversation, kind)
+                    for kind in ("messages", "ids", "payloads")
+                )
+            )
+            return
+        dropped = set[str]()
+        for data in self._read(conversation, length, self.count(conversation)):
+            dropped |= _payload_digests(data)
+        ids_key = self._key(conversation, "ids")
+        removed = [
+            message_id
+            for message_id, seq in self.client.hgetall(ids_key).items()
+            if int(seq) >= length
+        ]
+        pipe = self.client.pipeline()
+        pipe.ltrim(self._key(conversation, "messages"), 0, length - 1)
+        if removed:
+            pipe.hdel(ids_key, *removed)
+        pipe.execute()
+        self._unreference(conversation, dropped)
+
+
+class PersistentHistory(Sequence[ChatMessage[Any]]):
+    """Message history of one conversation, stored in a `ConversationStore`.
+
+    Drop-in replacement for `MessageHistory` which only keeps the newest
+    `hot_window` messages in memory. Older messages are loaded page by page
+    on access and only a few pages stay cached.
+    """
+
+    def __init__(
+        self,
+        store: ConversationStore,
+        conversation: str,
+        *,
+        hot_window: int = CONVERSATION_HOT_WINDOW,
+        page_size: int = CONVERSATION_PAGE_SIZE,
+    ) -> None:
+        self.store = store
+        self.conversation = conversation
+        self.hot_window = hot_window
+        self.page_size = page_size
+        self._pages = TTLCache[list[ChatMessage[Any]]](maxsize=CACHED_PAGES)
+        self.reload()
+
+    def __repr__(self) -> str:
+        return f"PersistentHistory({self.conversation!r}, {len(self)} messages)"
+
+    def reload(self) -> None:
+        """Load the newest messages from the store (e.g. written by another worker)."""
+        self._length = self.store.count(self.conversation)
+        start = max(self._length - self.hot_window, 0)
+        self._hot = self.store.load(self.conversation, start, self._length)
+        self._hot_ids = {msg.message_id: start + i for i, msg in enumerate(self._hot)}
+        self._pages.clear()
+
+    @property
+    def _hot_start(self) -> int:
+        return self._length - len(self._hot)
+
+    def _page(self, number: int) -> list[ChatMessage[Any]]:
+        if (page := self._pages.get(str(number))) is None:
+            start = number * self.page_size
+            page = self.store.load(self.conversation, start, start + self.page_size)
+            self._pages.set(str(number), page)
+        return page
+
+    def _load(self, start: int, stop: int) -> list[ChatMessage[Any]]:
+        """Get the messages in a position range, from memory where possible."""
+        hot_start = self._hot_start
+        cold: list[ChatMessage[Any]] = []
+        if start < hot_start:
+            cold_stop = min(stop, hot_start)
+            if cold_stop - start <= self.page_size:
+                first, last = start // self.page_size, (cold_stop - 1) // self.page_size
+                pages = [self._page(n) for n in range(first, last + 1)]
+                offset = start - first * self.page_size
+                cold = [msg for page in pages for msg in page][
+                    offset : offset + cold_stop - start
+                ]
+            else:
+                cold = self.store.load(self.conversation, start, cold_stop)
+        hot = self._hot[max(start - hot_start, 0) : max(stop - hot_start, 0)]
+        return cold + hot
+
+    @overload
+    def __getitem__(self, index: int) -> ChatMessage[Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ChatMessage[Any]]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> ChatMessage[Any] | list[ChatMessage[Any]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return list(self)[index]
+            return self._load(start, stop) if start < stop else []
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            msg = "history index out of range"
+            raise IndexError(msg)
+        return self._load(index, index + 1)[0]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[ChatMessage[Any]]:
+        """Iterate page by page, without caching older pages."""
+        hot_start = self._hot_start
+        for start in range(0, hot_start, self.page_size):
+            stop = min(start + self.page_size, hot_start)
+            yield from self.store.load(self.conversation, start, stop)
+        yield from self._hot
+
+    def __contains__(self, item: object) -> bool:
+        """Check membership by message id (accepts messages or ids)."""
+        match item:
+            case ChatMessage():
+                message_id = item.message_id
+            case str():
+                message_id = item
+            case _:
+                return False
+        return self._find(message_id) is not None
+
+    def _find(self, message_id: str) -> int | None:
+        if (position := self._hot_ids.get(message_id)) is not None:
+            return position
+        if len(self._hot) == self._length:
+            return None
+        return self.store.position(self.conversation, message_id)
+
+    def append(self, message: ChatMessage[Any]) -> bool:
+        """Append and store a message unless a message with the same id is stored.
+
+        Returns:
+            Whether the message was added
+        """
+        if message.message_id in self:
+            return False
+        if self.store.append(self.conversation, message) != self._length:
+            self.reload()  # others appended to the conversation meanwhile
+            return True
+        self._hot_ids[message.message_id] = self._length
+        self._hot.append(message)
+        self._length += 1
+        if len(self._hot) > self.hot_window:
+            evicted = self._hot.pop(0)
+            del self._hot_ids[evicted.message_id]
+        return True
+
+    def extend(self, messages: Iterable[ChatMessage[Any]]) -> int:
+        """Append several messages, skipping known ids.
+
+        Returns:
+            Number of added messages
+        """
+        return sum(self.append(message) for message in messages)
+
+    def update(self, message: ChatMessage[Any]) -> None:
+        """Store the changes of a message which was already appended."""
+        if self.store.update(self.conversation, message):
+            self._pages.clear()
+
+    def get(self, message_id: str) -> ChatMessage[Any] | None:
+        """Get a message by its id."""
+        position = self._find(message_id)
+        return None if position is None else self[position]
+
+    def position(self, message_id: str) -> int:
+        """Get the position of a message in the history.
+
+        Raises:
+            KeyError: If no message with given id is stored
+        """
+        if (position := self._find(message_id)) is None:
+            raise KeyError(message_id)
+        return position
+
+    def range(
+        self, start: str | None = None, end: str | None = None
+    ) -> list[ChatMessage[Any]]:
+        """Get the messages between two message ids (both inclusive).
+
+        Args:
+            start: Id of the first message (defaults to the oldest message)
+            end: Id of the last message (defaults to the newest message)
+        """
+        first = self.position(start) if start else 0
+        last = self.position(end) + 1 if end else self._length
+        return self._load(first, last)
+
+    def tail(self, count: int) -> list[ChatMessage[Any]]:
+        """Get the newest `count` messages."""
+        return self[-count:] if count > 0 else []
+
+    def truncate(self, length: int) -> list[ChatMessage[Any]]:
+        """Drop all messages after the first `length` ones.
+
+        Returns:
+            The removed messages
+        """
+        removed = self[length:]
+        self.store.truncate(self.conversation, length)
+        self._length = min(self._length, length)
+        for message in removed:
+            self._hot_ids.pop(message.message_id, None)
+        self._hot = [msg for msg in self._hot if msg.message_id in self._hot_ids]
+        self._pages.clear()
+        return removed
+
+    def clear(self) -> None:
+        """Remove all messages (from the store as well)."""
+        self.store.clear(self.conversation)
+        self._length = 0
+        self._hot.clear()
+        self._hot_ids.clear()
+        self._pages.clear()
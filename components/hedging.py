@@ -0,0 +1,186 @@
+"""Hedged streaming requests, cutting the latency tail of slow first tokens."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import functools
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from pydantic_ai.models.wrapper import WrapperModel
+
+from components.agent_pool import shared_model
+from components.llm_scheduler import TokenBucket, llm_context, llm_scheduler
+from components.telemetry import metrics, quantile
+from config import (
+    CHAT_HEDGE_BUDGET,
+    CHAT_HEDGE_DELAY,
+    CHAT_HEDGE_MAX_DELAY,
+    CHAT_HEDGE_MIN_DELAY,
+    CHAT_HEDGE_MIN_SAMPLES,
+    CHAT_HEDGE_MODEL,
+    CHAT_HEDGE_QUANTILE,
+    CHAT_HEDGE_WINDOW,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from pydantic_ai.messages import ModelMessage
+    from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+    from pydantic_ai.settings import ModelSettings
+
+
+class _Attempt:
+    """One streamed request, held open in its own task until released.
+
+    Streams are opened and closed by the same task, which HTTP clients
+    require, while the winning stream is consumed by the caller.
+    """
+
+    def __init__(self, model: Model, *args: Any) -> None:
+        loop = asyncio.get_running_loop()
+        self.admitted: asyncio.Future[float] = loop.create_future()
+        self.opened: asyncio.Future[StreamedResponse] = loop.create_future()
+        self._release = asyncio.Event()
+        self.task = asyncio.create_task(self._run(model, *args))
+
+    def _on_admit(self) -> None:
+        if not self.admitted.done():
+            self.admitted.set_result(time.monotonic())
+
+    async def _run(self, model: Model, *args: Any) -> None:
+        try:
+            with llm_context(on_admit=self._on_admit):
+                async with model.request_stream(*args) as response:
+                    self.opened.set_result(response)
+                    await self._release.wait()
+        except BaseException as e:
+            if not self.opened.done():
+                self.opened.set_exception(e)
+            raise
+
+    async def close(self) -> None:
+        """Close the stream after it was consumed."""
+        self._release.set()
+        await self.task
+
+    async def cancel(self) -> None:
+        """Abandon the request, whatever state it is in."""
+        self.task.cancel()
+        await asyncio.wait([self.task])
+        # Mark errors as retrieved, the abandoned request doesn't matter
+        for future in (self.task, self.opened):
+            if future.done() and not future.cancelled():
+                future.exception()
+
+
+async def _first(attempts: list[_Attempt]) -> _Attempt:
+    """Wait for the first attempt which starts streaming.
+
+    Raises:
+        The error of the first failed attempt, if all of them fail
+    """
+    pending = {attempt.opened: attempt for attempt in attempts}
+    error: BaseException | None = None
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            attempt = pending.pop(future)
+            if not future.cancelled() and future.exception() is None:
+                return attempt
+            if error is None and not future.cancelled():
+                error = future.exception()
+    raise error or asyncio.CancelledError
+
+
+class HedgedModel(WrapperModel):
+    """Model sending a second streamed request if the first one is slow.
+
+    Once a request took longer than the recent p95 time to its first token
+    since its admission by the LLM scheduler, a duplicate goes to the hedge
+    model (limited to `budget` hedges per minute, none while requests are
+    queued anyway). Whichever stream starts first is used, the other
+    request is cancelled. Non-streamed requests are passed through.
+    """
+
+    def __init__(
+        self,
+        wrapped: Model,
+        hedge: Model,
+        name: str,
+        *,
+        budget: float = CHAT_HEDGE_BUDGET,
+    ) -> None:
+        super().__init__(wrapped)
+        self.hedge = hedge
+        self.name = name
+        self.budget = TokenBucket(budget / 60, budget)
+        self._ttft: deque[float] = deque(maxlen=CHAT_HEDGE_WINDOW)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Seconds to wait for the first token before hedging."""
+        with self._lock:
+            values = sorted(self._ttft)
+        if len(values) < CHAT_HEDGE_MIN_SAMPLES:
+            return CHAT_HEDGE_DELAY
+        threshold = quantile(values, CHAT_HEDGE_QUANTILE)
+        return min(max(threshold, CHAT_HEDGE_MIN_DELAY), CHAT_HEDGE_MAX_DELAY)
+
+    def _observe(self, ttft: float) -> None:
+        with self._lock:
+            self._ttft.append(ttft)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        args = (messages, model_settings, model_request_parameters)
+        primary = _Attempt(self.wrapped, *args)
+        attempts = [primary]
+        winner: _Attempt | None = None
+        try:
+            # Waiting for admission is no sign of a slow model, don't count it
+            started: list[asyncio.Future[Any]] = [primary.admitted, primary.opened]
+            await asyncio.wait(started, return_when=asyncio.FIRST_COMPLETED)
+            done, _ = await asyncio.wait([primary.opened], timeout=self.delay())
+            if not done:
+                if llm_scheduler().queued:
+                    outcome = "queued"  # a hedge would only queue up as well
+                else:
+                    outcome = "sent" if self.budget.try_take() else "over_budget"
+                metrics.inc("chatbot_hedge_total", model=self.name, outcome=outcome)
+                if outcome == "sent":
+                    attempts.append(_Attempt(self.hedge, *args))
+            winner = await _first(attempts)
+            # The primary's time to first token, no shorter than this if the
+            # hedge won (so slow primaries still raise the threshold)
+            if primary.admitted.done():
+                self._observe(time.monotonic() - primary.admitted.result())
+        finally:
+            for attempt in attempts:
+                if attempt is not winner:
+                    await attempt.cancel()
+        assert winner is not None  # _first returned, or raised past this
+        if len(attempts) > 1:
+            outcome = "primary_won" if winner is attempts[0] else "hedge_won"
+            metrics.inc("chatbot_hedge_total", model=self.name, outcome=outcome)
+        try:
+            yield winner.opened.result()
+        finally:
+            await winner.close()
+
+
+@functools.cache
+def hedged_model(name: str) -> Model:
+    """Get the process-wide hedged variant of a model (see CHAT_HEDGE_MODEL)."""
+    assert CHAT_HEDGE_MODEL is not None
+    return HedgedModel(shared_model(name), shared_model(CHAT_HEDGE_MODEL), name)
@@ -0,0 +1,122 @@
+"""Ordered chat message store with an id index."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, overload
+
+from llmling_agent import ChatMessage
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+class MessageHistory(Sequence[ChatMessage[Any]]):
+    """Append-only ordered message list indexed by message id.
+
+    Membership checks, de-duplicated appends and lookups by id are O(1),
+    instead of scanning (and comparing) the whole history.
+    """
+
+    def __init__(self, messages: Iterable[ChatMessage[Any]] = ()) -> None:
+        self._messages: list[ChatMessage[Any]] = []
+        self._positions: dict[str, int] = {}
+        self.extend(messages)
+
+    def __repr__(self) -> str:
+        return f"MessageHistory({len(self)} messages)"
+
+    @overload
+    def __getitem__(self, index: int) -> ChatMessage[Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ChatMessage[Any]]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> ChatMessage[Any] | list[ChatMessage[Any]]:
+        return self._messages[index]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[ChatMessage[Any]]:
+        return iter(self._messages)
+
+    def __contains__(self, item: object) -> bool:
+        """Check membership by message id (accepts messages or ids)."""
+        match item:
+            case ChatMessage():
+                return item.message_id in self._positions
+            case str():
+                return item in self._positions
+            case _:
+                return False
+
+    def append(self, message: ChatMessage[Any]) -> bool:
+        """Append a message unless a message with the same id is stored.
+
+        Returns:
+            Whether the message was added
+        """
+        if message.message_id in self._positions:
+            return False
+        self._positions[message.message_id] = len(self._messages)
+        self._messages.append(message)
+        return True
+
+    def extend(self, messages: Iterable[ChatMessage[Any]]) -> int:
+        """Append several messages, skipping known ids.
+
+        Returns:
+            Number of added messages
+        """
+        return sum(self.append(message) for message in messages)
+
+    def get(self, message_id: str) -> ChatMessage[Any] | None:
+        """Get a message by its id."""
+        position = self._positions.get(message_id)
+        return None if position is None else self._messages[position]
+
+    def position(self, message_id: str) -> int:
+        """Get the position of a message in the history.
+
+        Raises:
+            KeyError: If no message with given id is stored
+        """
+        return self._positions[message_id]
+
+    def range(
+        self, start: str | None = None, end: str | None = None
+    ) -> list[ChatMessage[Any]]:
+        """Get the messages between two message ids (both inclusive).
+
+        Args:
+            start: Id of the first message (defaults to the oldest message)
+            end: Id of the last message (defaults to the newest message)
+        """
+        first = self.position(start) if start else 0
+        last = self.position(end) + 1 if end else len(self._messages)
+        return self._messages[first:last]
+
+    def tail(self, count: int) -> list[ChatMessage[Any]]:
+        """Get the newest `count` messages."""
+        return self._messages[-count:] if count > 0 else []
+
+    def truncate(self, length: int) -> list[ChatMessage[Any]]:
+        """Drop all messages after the first `length` ones.
+
+        Returns:
+            The removed messages
+        """
+        removed = self._messages[length:]
+        del self._messages[length:]
+        for message in removed:
+            del self._positions[message.message_id]
+        return removed
+
+    def clear(self) -> None:
+        """Remove all messages."""
+        self._messages.clear()
+        self._positions.clear()
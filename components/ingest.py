@@ -0,0 +1,216 @@
+"""Streaming ingestion of uploaded documents into retrieval chunks."""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import functools
+import multiprocessing
+from pathlib import Path
+import shutil
+import tempfile
+from typing import IO, TYPE_CHECKING
+
+from components.retrieval import CHUNK_CHARS, Chunk, chunk_document
+from config import INGEST_MAX_CHUNKS, INGEST_WORKERS
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+READ_BLOCK = 64 * 1024
+# Bytes used to detect the encoding of text uploads
+SNIFF_BYTES = 64 * 1024
+# Used if neither a BOM nor UTF-8 fit and no better guess is available
+FALLBACK_ENCODING = "cp1252"
+# Decoded text is handed to the chunker in blocks of about this size
+BLOCK_CHARS = 4 * CHUNK_CHARS
+OUTLINE_ITEMS = 25
+
+TEXT_SUFFIXES = {".txt", ".md", ".markdown", ".csv", ".json", ".xml", ".yaml", ".yml"}
+CONVERTED_SUFFIXES = {".pdf", ".docx", ".pptx", ".xlsx", ".xls", ".html", ".htm", ".epub"}
+UPLOAD_TYPES = sorted(suffix.lstrip(".") for suffix in TEXT_SUFFIXES | CONVERTED_SUFFIXES)
+
+# UTF-32 first, its little endian BOM starts with the UTF-16 one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Guess the encoding of a text from its first bytes."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Not final, the sample may end within a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        pass
+    else:
+        return "utf-8"
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:  # only installed as a dependency of requests
+        return FALLBACK_ENCODING
+    # Prefer the usual legacy encoding of (western) European documents, if it fits
+    match = from_bytes(sample, cp_isolation=[FALLBACK_ENCODING]).best()
+    match = match or from_bytes(sample).best()
+    return match.encoding if match else FALLBACK_ENCODING
+
+
+def decode_stream(file: IO[bytes], block_size: int = READ_BLOCK) -> Iterator[str]:
+    """Decode a binary stream block by block.
+
+    The encoding is detected from the first block; undecodable bytes later
+    in the stream are replaced instead of failing the whole file.
+    """
+    block = file.read(SNIFF_BYTES)
+    decoder = codecs.getincrementaldecoder(detect_encoding(block))(errors="replace")
+    while block:
+        if text := decoder.decode(block):
+            yield text
+        block = file.read(block_size)
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+def text_blocks(pieces: Iterable[str], size: int = BLOCK_CHARS) -> Iterator[str]:
+    """Regroup text pieces into blocks ending at paragraph (or line) boundaries."""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            cut = max(buffer.rfind("\n\n", 0, size), 0)
+            cut = cut or max(buffer.rfind("\n", 0, size), 0)
+            cut = cut or max(buffer.rfind(" ", 0, size), 0) or size
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer.strip():
+        yield buffer
+
+
+def chunk_stream(
+    source: str,
+    pieces: Iterable[str],
+    max_chunks: int = INGEST_MAX_CHUNKS,
+) -> Iterator[Chunk]:
+    """Chunk a streamed document, holding only one block of text at a time."""
+    title = None
+    count = 0
+    for block in text_blocks(pieces):
+        for chunk in chunk_document(source, block, title=title):
+            title = chunk.title
+            yield chunk
+            count += 1
+            if count >= max_chunks:
+                return
+
+
+def convert_to_markdown(path: str) -> str:
+    """Convert a document with markitdown (runs in a worker process).
+
+    The result is written next to the input, so it can be read back
+    incrementally instead of being sent through the pool in one piece.
+
+    Returns:
+        Path of the markdown file
+    """
+    from markitdown import MarkItDown
+
+    result = MarkItDown().convert(path)
+    output = Path(path).with_suffix(".md")
+    output.write_text(result.text_content, encoding="utf-8")
+    return str(output)
+
+
+@functools.cache
+def converter_pool() -> ProcessPoolExecutor:
+    """Get the process-wide pool for document conversions."""
+    # Spawned, since forking a process running many threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=context)
+
+
+@dataclass(frozen=True)
+class IngestedDocument:
+    """An uploaded document, split into retrieval chunks."""
+
+    name: str
+    chunks: tuple[Chunk, ...]
+    truncated: bool = False
+    """Whether chunks beyond INGEST_MAX_CHUNKS were dropped."""
+
+    @property
+    def chars(self) -> int:
+        return sum(len(chunk.text) for chunk in self.chunks)
+
+    def summary(self) -> str:
+        """Compact description of the document for the conversation."""
+        from components.context import CHARS_PER_TOKEN
+
+        titles = list(dict.fromkeys(chunk.title for chunk in self.chunks))
+        header = (
+            f"📎 Dokument hochgeladen: {self.name} ({len(self.chunks)} Abschnitte, "
+            f"ca. {self.chars // CHARS_PER_TOKEN:,} Tokens"
+            f"{', gekürzt' if self.truncated else ''}). Passende Auszüge werden "
+            "den folgenden Fragen automatisch beigefügt."
+        )
+        lines = [header]
+        if len(titles) > 1:
+            lines += ["", "Gliederung:"]
+            lines += [f"- {title}" for title in titles[:OUTLINE_ITEMS]]
+            if len(titles) > OUTLINE_ITEMS:
+                lines.append(f"- … ({len(titles) - OUTLINE_ITEMS} weitere)")
+        return "\n".join(lines)
+
+
+def _chunk_text_file(name: str, file: IO[bytes]) -> IngestedDocument:
+    chunks = tuple(chunk_stream(name, decode_stream(file), INGEST_MAX_CHUNKS + 1))
+    return IngestedDocument(
+        name=name,
+        chunks=chunks[:INGEST_MAX_CHUNKS],
+        truncated=len(chunks) > INGEST_MAX_CHUNKS,
+    )
+
+
+def _chunk_path(name: str, path: Path) -> IngestedDocument:
+    with path.open("rb") as file:
+        return _chunk_text_file(name, file)
+
+
+def _spool(file: IO[bytes], path: Path) -> None:
+    with path.open("wb") as output:
+        shutil.copyfileobj(file, output, READ_BLOCK)
+
+
+async def ingest_upload(file: IO[bytes], name: str) -> IngestedDocument:
+    """Turn an upload into retrieval chunks without blocking the event loop.
+
+    Text files are decoded and chunked in a worker thread; PDFs and Office
+    documents are spooled to disk and converted in the process pool first.
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    suffix = Path(name).suffix.lower()
+    if suffix in TEXT_SUFFIXES:
+        return await asyncio.to_thread(_chunk_text_file, name, file)
+    if suffix not in CONVERTED_SUFFIXES:
+        msg = f"Dateityp {suffix or '(ohne Endung)'} wird nicht unterstützt."
+        raise ValueError(msg)
+    with tempfile.TemporaryDirectory(prefix="upload-") as tmp_dir:
+        path = Path(tmp_dir) / f"document{suffix}"
+        await asyncio.to_thread(_spool, file, path)
+        loop = asyncio.get_running_loop()
+        markdown_path = await loop.run_in_executor(
+            converter_pool(), convert_to_markdown, str(path)
+        )
+        return await asyncio.to_thread(_chunk_path, name, Path(markdown_path))
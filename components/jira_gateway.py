@@ -0,0 +1,344 @@
+"""Pooled, cached and batched access to Jira."""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Literal
+
+from components.cache import TTLCache, hash_key
+from config import (
+    JIRA_PAGE_SIZE,
+    JIRA_SEARCH_CACHE_SIZE,
+    JIRA_SEARCH_CACHE_TTL,
+    JIRA_SEARCH_FIELDS,
+    JIRA_SEARCH_LIMIT,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    import jira
+
+
+logger = logging.getLogger(__name__)
+
+JQL_KEYWORDS = {
+    *("AND", "OR", "NOT", "IN", "IS", "WAS", "CHANGED"),
+    *("EMPTY", "NULL", "ORDER", "BY", "ASC", "DESC"),
+}
+JQL_OPERATORS = {"=", "!=", ">", ">=", "<", "<=", "~", "!~"}
+JQL_PUNCTUATION = {"(", ")", ","}
+
+_JQL_TOKEN_RE = re.compile(
+    r"""
+    "(?:[^"\\]|\\.)*"        # double quoted string
+    | '(?:[^'\\]|\\.)*'      # single quoted string
+    | !=|>=|<=|!~|[=<>~(),]  # operators and punctuation
+    | [^\s"'=!<>~(),]+       # bare words, numbers, relative dates, cf[123]
+    """,
+    re.VERBOSE,
+)
+
+
+def _quote(value: str) -> str:
+    if value[0] in "\"'":
+        value = value[1:-1]
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def normalize_jql(jql: str) -> str:
+    """Normalize a JQL query into a canonical form, used as cache key.
+
+    Keywords are upper-cased, field names lower-cased, values quoted
+    uniformly and whitespace collapsed, so near-identical queries
+    (`project = TEST and Status="Open"` / `project="TEST" AND status = 'Open'`)
+    share one key. Value case is kept, since text searches may depend on it.
+    """
+    tokens = _JQL_TOKEN_RE.findall(jql)
+    normalized: list[str] = []
+    for i, token in enumerate(tokens):
+        following = tokens[i + 1] if i + 1 < len(tokens) else ""
+        previous = normalized[-1] if normalized else ""
+        if token.upper() in JQL_KEYWORDS:
+            normalized.append(token.upper())
+        elif token in JQL_OPERATORS or token in JQL_PUNCTUATION:
+            normalized.append(token)
+        elif following in JQL_OPERATORS or following.upper() in {"IN", "IS", "NOT"}:
+            normalized.append(token.lower())  # field name
+        elif previous in {"BY", ","} and "ORDER" in normalized:
+            normalized.append(token.lower())  # ORDER BY field
+        elif following == "(":
+            normalized.append(token)  # function call
+        else:
+            normalized.append(_quote(token))
+    return " ".join(normalized)
+
+
+def format_issue(issue: dict[str, Any]) -> str:
+    """Format a raw (JSON) Jira issue as readable text."""
+    fields = issue.get("fields", {})
+    lines = [f"Issue: {issue.get('key', '')}"]
+    for name, label, attr in (
+        ("summary", "Summary", None),
+        ("issuetype", "Type", "name"),
+        ("status", "Status", "name"),
+        ("priority", "Priority", "name"),
+        ("assignee", "Assignee", "displayName"),
+        ("reporter", "Reporter", "displayName"),
+        ("created", "Created", None),
+        ("duedate", "Due Date", None),
+        ("description", "Description", None),
+    ):
+        value = fields.get(name)
+        if isinstance(value, dict):
+            value = value.get(attr or "name")
+        if value:
+            lines.append(f"{label}: {value}")
+    if labels := fields.get("labels"):
+        lines.append(f"Labels: {', '.join(labels)}")
+    if comments := (fields.get("comment") or {}).get("comments"):
+        lines.append("Comments:")
+        for comment in comments:
+            author = (comment.get("author") or {}).get("displayName", "Unknown")
+            lines.append(
+                f"  - {author} ({comment.get('created', '')}): {comment['body']}"
+            )
+    if links := fields.get("issuelinks"):
+        lines.append("Issue Links:")
+        for link in links:
+            direction = "outward" if "outwardIssue" in link else "inward"
+            linked = link.get(f"{direction}Issue", {})
+            link_type = link.get("type", {}).get(direction, "relates to")
+            lines.append(f"  - {link_type}: {linked.get('key', '')}")
+    return "\n".join(lines)
+
+
+class JiraGateway:
+    """Process-wide Jira access with one pooled client and a search cache.
+
+    Searches are paginated and only request the fields needed for
+    formatting. Results are cached by normalized JQL, and the cache is
+    dropped whenever issues get created through the gateway.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        email: str,
+        token: str | None,
+        project: str,
+        *,
+        cache_ttl: float = JIRA_SEARCH_CACHE_TTL,
+        cache_size: int = JIRA_SEARCH_CACHE_SIZE,
+        page_size: int = JIRA_PAGE_SIZE,
+    ) -> None:
+        self.server = server
+        self.email = email
+        self.project = project
+        self.page_size = page_size
+        self._token = token
+        self._client: jira.JIRA | None = None
+        self._token_pagination: bool | None = None
+        self._cache = TTLCache[list[dict[str, Any]]](maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> jira.JIRA:
+        """The authenticated client (its HTTP session pools connections)."""
+        with self._lock:
+            if self._client is None:
+                import jira
+
+                self._client = jira.JIRA(
+                    server=self.server,
+                    basic_auth=(self.email, self._token or ""),
+                )
+            return self._client
+
+    def _fetch_page(
+        self,
+        jql: str,
+        fields: Sequence[str],
+        size: int,
+        cursor: str | int | None,
+    ) -> tuple[list[dict[str, Any]], str | int | None]:
+        """Fetch one page of raw issues and the cursor of the next page."""
+        from jira import JIRAError
+
+        client = self.client
+        enhanced = getattr(client, "enhanced_search_issues", None)
+        if enhanced and self._token_pagination is not False:
+            # Token based pagination, only available on Jira Cloud
+            try:
+                page = enhanced(
+                    jql,
+                    nextPageToken=cursor,
+                    maxResults=size,
+                    fields=list(fields),
+                    json_result=True,
+                )
+            except JIRAError as e:
+                # Servers without /search/jql (Jira Data Center) answer 404/405
+                if self._token_pagination or e.status_code not in {404, 405}:
+                    raise
+                logger.info("Token pagination unavailable, using offset pagination")
+                self._token_pagination = False
+            else:
+                self._token_pagination = True
+                next_token = None if page.get("isLast", True) else page["nextPageToken"]
+                return page.get("issues", []), next_token
+        start = int(cursor or 0)
+        page = client.search_issues(
+            jql,
+            startAt=start,
+            maxResults=size,
+            fields=list(fields),
+            json_result=True,
+        )
+        issues = page.get("issues", [])
+        end = start + len(issues)
+        return issues, end if issues and end < page.get("total", 0) else None
+
+    def iter_issues(
+        self,
+        jql: str,
+        *,
+        fields: Sequence[str] = JIRA_SEARCH_FIELDS,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Stream raw issues page by page, bypassing the cache.
+
+        Args:
+            jql: JQL query
+            fields: Issue fields to request
+            limit: Maximum number of issues (None for all)
+        """
+        cursor: str | int | None = None
+        count = 0
+        while limit is None or count < limit:
+            size = self.page_size if limit is None else min(self.page_size, limit - count)
+            issues, cursor = self._fetch_page(jql, fields, size, cursor)
+            for issue in issues[: None if limit is None else limit - count]:
+                count += 1
+                yield issue
+            if cursor is None or not issues:
+                return
+
+    def search(
+        self,
+        jql: str,
+        *,
+        fields: Sequence[str] = JIRA_SEARCH_FIELDS,
+        limit: int = JIRA_SEARCH_LIMIT,
+    ) -> list[dict[str, Any]]:
+        """Search issues, answering repeated (normalized) queries from the cache."""
+        key = hash_key(normalize_jql(jql), sorted(fields), limit)
+        if (issues := self._cache.get(key)) is None:
+            issues = list(self.iter_issues(jql, fields=fields, limit=limit))
+            self._cache.set(key, issues)
+        return issues
+
+    def create_issues(self, issues: Sequence[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Create several issues with a single bulk request.
+
+        Args:
+            issues: Field dicts (summary, description, issuetype, ...); the
+                    gateway's project is used unless given
+
+        Returns:
+            One result per input with "status", "error" and "issue" (the key)
+        """
+        project = {"key": self.project}
+        field_list = [{"project": project, **fields} for fields in issues]
+        results = self.client.create_issues(field_list, prefetch=False)
+        self._cache.clear()
+        return [
+            {
+                "status": result["status"],
+                "error": result.get("error"),
+                "issue": result["issue"].key if result.get("issue") else None,
+            }
+            for result in results
+        ]
+
+    def create_issue(self, **fields: Any) -> str:
+        """Create a single issue and return its key."""
+        fields = {"project": {"key": self.project}, **fields}
+        issue = self.client.create_issue(fields=fields, prefetch=False)
+        self._cache.clear()
+        return issue.key
+
+
+@functools.cache
+def jira_gateway() -> JiraGateway:
+    """Get the process-wide Jira gateway.
+
+    Connection settings can be overridden with the JIRA_SERVER, JIRA_EMAIL
+    and JIRA_PROJECT environment variables (e.g. for a local fake server).
+    """
+    from llmling_agent_tools.jira_tool import jira_tools
+
+    return JiraGateway(
+        server=os.getenv("JIRA_SERVER", jira_tools.SERVER),
+        email=os.getenv("JIRA_EMAIL", jira_tools.JIRA_EMAIL),
+        token=os.getenv("JIRA_API_KEY"),
+        project=os.getenv("JIRA_PROJECT", jira_tools.PROJECT),
+    )
+
+
+def search_for_issues(jql_str: str) -> str:
+    """Search for issues in Jira Ticket system.
+
+    Args:
+        jql_str: The JQL query string.
+
+    Returns:
+        str: A result for given query
+    """
+    from jira import JIRAError
+    from pydantic_ai import ModelRetry
+    from requests import RequestException
+
+    try:
+        issues = jira_gateway().search(jql_str)
+    except JIRAError as e:
+        raise ModelRetry(str(e.text or e)) from None
+    except RequestException as e:  # Jira unreachable or timed out
+        raise ModelRetry(str(e)) from None
+    if not issues:
+        return "No issues found matching the query."
+    return "\n\n---\n\n".join(format_issue(issue) for issue in issues)
+
+
+def create_issue(
+    summary: str,
+    description: str,
+    issuetype: Literal["Bug"] = "Bug",
+    attachment: str | None = None,
+) -> str:
+    """Create a new issue in Jira.
+
+    Args:
+        summary: The issue summary.
+        description: The issue description.
+        issuetype: The issue type.
+        attachment: Optional attachment for the ticket
+
+    Returns:
+        str: A message indicating the success of the operation.
+    """
+    gateway = jira_gateway()
+    key = gateway.create_issue(
+        summary=summary,
+        description=description,
+        issuetype={"name": issuetype},
+    )
+    if attachment:
+        gateway.client.add_attachment(key, attachment, "attachment.txt")
+    return f"Issue {key} created successfully"
@@ -0,0 +1,276 @@
+"""In-process background jobs running on the sessions' event loops."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import functools
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Literal
+import uuid
+
+from components.cache import TTLCache
+from components.telemetry import metrics
+from config import (
+    JOB_HISTORY_SIZE,
+    JOB_RESULT_TTL,
+    JOB_SPECULATIVE_WORKERS,
+    JOB_WORKERS,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+    import concurrent.futures
+
+    from utils import LoopThread
+
+
+type JobStatus = Literal["pending", "running", "done", "failed", "cancelled"]
+type JobFactory = Callable[[], Coroutine[Any, Any, Any]]
+
+
+@dataclass(eq=False)
+class Job:
+    """A unit of background work and its outcome."""
+
+    id: str
+    key: str
+    """Identity of the work, pending / running jobs with the same key are shared."""
+
+    kind: str
+    """Job category, used as telemetry label."""
+
+    speculative: bool = False
+    """Whether nobody asked for the result yet, requested jobs are started first."""
+
+    status: JobStatus = "pending"
+    result: Any = None
+    error: BaseException | None = None
+    created: float = field(default_factory=time.monotonic)
+    not_before: float = 0.0
+    """Monotonic time before which the job is not started."""
+
+    started: float | None = None
+    finished: float | None = None
+    factory: JobFactory | None = field(default=None, repr=False)
+    loop_thread: LoopThread | None = field(default=None, repr=False)
+    future: concurrent.futures.Future[Any] | None = field(default=None, repr=False)
+    cancel_requested: bool = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.status in {"done", "failed", "cancelled"}
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job was submitted (until it finished)."""
+        return (self.finished or time.monotonic()) - self.created
+
+
+class JobScheduler:
+    """Runs coroutines in the background with bounded, process-wide concurrency.
+
+    Each job runs on the event loop it is submitted for (usually the loop of
+    the submitting session, which its agents are bound to), so jobs survive
+    script reruns and page switches. At most `max_workers` jobs run at once,
+    of which at most `speculative_workers` are speculative. Waiting jobs
+    start in submission order, requested ones before speculative ones.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        *,
+        speculative_workers: int = JOB_SPECULATIVE_WORKERS,
+        history_size: int = JOB_HISTORY_SIZE,
+        result_ttl: float = JOB_RESULT_TTL,
+    ) -> None:
+        self.max_workers = max_workers
+        self.speculative_workers = speculative_workers
+        self._jobs = TTLCache[Job](maxsize=history_size, ttl=result_ttl)
+        self._active: dict[str, Job] = {}
+        self._queue: list[Job] = []
+        self._running = 0
+        self._running_speculative = 0
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        key: str,
+        factory: JobFactory,
+        *,
+        loop_thread: LoopThread,
+        kind: str = "job",
+        delay: float = 0.0,
+        speculative: bool = False,
+    ) -> Job:
+        """Queue a job unless one with the same key is pending or running.
+
+        Resubmitting a job with a shorter delay moves its start forward, a
+        requested resubmission of a speculative job promotes it.
+
+        Args:
+            key: Identity of the work
+            factory: Creates the coroutine to run (only called once started)
+            loop_thread: Loop to run the coroutine on
+            kind: Job category
+            delay: Seconds to wait before the job may start
+            speculative: Whether nobody asked for the result yet
+
+        Returns:
+            The new job, or the already active one with the same key
+
+        Raises:
+            RuntimeError: If the loop was closed (the session ended)
+        """
+        if delay:
+            # Raises before the job gets registered if the loop is closed
+            loop = loop_thread.loop
+            loop.call_soon_threadsafe(loop.call_later, delay, self._dispatch)
+        with self._lock:
+            if (job := self._active.get(key)) is not None:
+                job.not_before = min(job.not_before, time.monotonic() + delay)
+                if job.speculative and not speculative and job.status == "pending":
+                    job.speculative = False
+            else:
+                job = Job(
+                    id=uuid.uuid4().hex[:12], key=key, kind=kind, speculative=speculative
+                )
+                job.factory = factory
+                job.loop_thread = loop_thread
+                job.not_before = job.created + delay
+                self._active[key] = job
+                self._jobs.set(job.id, job)
+                self._queue.append(job)
+        self._dispatch()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Get a job by id (finished jobs are kept for a while)."""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending or running job.
+
+        Returns:
+            Whether the job was still active
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            if job.status == "pending":
+                self._queue.remove(job)
+                self._finish(job, "cancelled")
+                return True
+            job.cancel_requested = True
+            future = job.future
+        if future is not None:
+            future.cancel()
+        return True
+
+    def cancel_loop(self, loop_thread: LoopThread) -> int:
+        """Cancel all active jobs running on a loop, before it gets closed.
+
+        Returns:
+            Number of cancelled jobs
+        """
+        with self._lock:
+            job_ids = [
+                job.id for job in self._active.values() if job.loop_thread is loop_thread
+            ]
+        return sum(self.cancel(job_id) for job_id in job_ids)
+
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        """Number of running jobs."""
+        return self._running
+
+    def _dispatch(self) -> None:
+        """Start queued jobs while workers are free, requested ones first."""
+        starting: list[Job] = []
+        with self._lock:
+            now = time.monotonic()
+            # Stable, so both classes keep their submission order
+            for job in sorted(self._queue, key=lambda job: job.speculative):
+                if self._running >= self.max_workers:
+                    break
+                if job.not_before > now or (
+                    job.speculative
+                    and self._running_speculative >= self.speculative_workers
+                ):
+                    continue
+                self._queue.remove(job)
+                self._running += 1
+                self._running_speculative += job.speculative
+                job.status = "running"
+                job.started = now
+                starting.append(job)
+        for job in starting:
+            metrics.observe("chatbot_job_wait_seconds", now - job.created, kind=job.kind)
+            self._start(job)
+
+    def _start(self, job: Job) -> None:
+        assert job.factory is not None
+        assert job.loop_thread is not None
+        factory, job.factory = job.factory, None
+        coro = factory()
+        try:
+            future = job.loop_thread.submit(coro)
+        except RuntimeError as e:  # loop of an evicted session
+            coro.close()
+            with self._lock:
+                self._release(job)
+                job.error = e
+                self._finish(job, "failed")
+            self._dispatch()
+            return
+        with self._lock:
+            job.future = future
+            cancel = job.cancel_requested
+        if cancel:
+            future.cancel()
+        future.add_done_callback(functools.partial(self._on_done, job))
+
+    def _on_done(self, job: Job, future: concurrent.futures.Future[Any]) -> None:
+        if future.cancelled():
+            status: JobStatus = "cancelled"
+        elif (error := future.exception()) is not None:
+            status = "failed"
+            job.error = error
+        else:
+            status = "done"
+            job.result = future.result()
+        with self._lock:
+            self._release(job)
+            self._finish(job, status)
+        assert job.started is not None
+        duration = (job.finished or time.monotonic()) - job.started
+        metrics.observe("chatbot_job_seconds", duration, kind=job.kind, status=status)
+        self._dispatch()
+
+    def _release(self, job: Job) -> None:
+        """Free the worker of a started job (lock must be held)."""
+        self._running -= 1
+        self._running_speculative -= job.speculative
+
+    def _finish(self, job: Job, status: JobStatus) -> None:
+        """Record the final status (lock must be held)."""
+        job.status = status
+        job.finished = time.monotonic()
+        job.loop_thread = job.future = None
+        if self._active.get(job.key) is job:
+            del self._active[job.key]
+
+
+@functools.cache
+def job_scheduler() -> JobScheduler:
+    """Get the process-wide job scheduler."""
+    return JobScheduler()
@@ -0,0 +1,451 @@
+"""Process-wide admission control for LLM requests of all sessions."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager, suppress
+import contextvars
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+import enum
+import functools
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from pydantic_ai.models.wrapper import WrapperModel
+
+from components.telemetry import metrics
+from config import (
+    LLM_DEFAULT_RATE_LIMIT,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RATE_LIMITS,
+    LLM_RETRY_BASE,
+    LLM_RETRY_MAX,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+
+    from pydantic_ai.messages import ModelMessage, ModelResponse
+    from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+    from pydantic_ai.settings import ModelSettings
+    from pydantic_ai.usage import Usage
+
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """Scheduling class of a request, lower values are served first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_priority = contextvars.ContextVar("llm_priority", default=Priority.INTERACTIVE)
+_session = contextvars.ContextVar("llm_session", default="")
+_on_admit: contextvars.ContextVar[Callable[[], None] | None] = contextvars.ContextVar(
+    "llm_on_admit", default=None
+)
+
+
+@contextmanager
+def llm_context(
+    *,
+    priority: Priority | None = None,
+    session: str | None = None,
+    on_admit: Callable[[], None] | None = None,
+) -> Iterator[None]:
+    """Set priority and session of the LLM requests made within the block.
+
+    `on_admit` is called (on the request's loop) whenever one of them gets
+    admitted, e.g. to start a timer after the queue wait.
+    """
+    tokens: list[tuple[contextvars.ContextVar[Any], contextvars.Token[Any]]] = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if session is not None:
+        tokens.append((_session, _session.set(session)))
+    if on_admit is not None:
+        tokens.append((_on_admit, _on_admit.set(on_admit)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    """Whether an error is a provider rate limit (HTTP 429)."""
+    return getattr(error, "status_code", None) == 429  # noqa: PLR2004
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds a provider asked to wait after a rate limit, if it said so.
+
+    pydantic-ai's `ModelHTTPError` only keeps the body, the headers are read
+    from the response of the SDK error it was raised from.
+    """
+    for cause in (error, error.__cause__):
+        headers = getattr(getattr(cause, "response", None), "headers", None)
+        if not headers:
+            continue
+        with suppress(TypeError, ValueError):
+            if (millis := headers.get("retry-after-ms")) is not None:
+                return max(0.0, float(millis) / 1000)
+        if (value := headers.get("retry-after")) is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            with suppress(TypeError, ValueError):
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    return None
+
+
+def without_sdk_retries(model: Model) -> Model:
+    """Turn off the retries of a model's provider client.
+
+    The SDKs retry rate limits on their own, which would multiply with the
+    scheduler's retries and happen while holding a slot.
+    """
+    client = getattr(model, "client", None)
+    if (with_options := getattr(client, "with_options", None)) is not None:
+        model.client = with_options(max_retries=0)  # type: ignore[attr-defined]
+    return model
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self) -> None:
+        """Consume a token (may go into debt)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+
+    def try_take(self) -> bool:
+        """Consume a token if one is available now."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next `seconds` (after a rate limit)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+@dataclass(eq=False)
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future[None]
+    buckets: tuple[TokenBucket, ...]
+    priority: Priority
+    session: str
+    enqueued: float = field(default_factory=time.monotonic)
+    granted: bool = False
+
+
+class LLMScheduler:
+    """Admits LLM requests of all sessions, whichever event loop they run on.
+
+    A request waits until a concurrency slot is free and the token buckets
+    of its model and provider have a token. Waiting requests are served by
+    priority class, and round-robin across sessions within a class, so one
+    busy session can't starve the others. Rate limit errors pause the
+    buckets and are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        *,
+        rate_limits: dict[str, tuple[float, int]] | None = None,
+        default_rate_limit: tuple[float, int] = LLM_DEFAULT_RATE_LIMIT,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE,
+        retry_max: float = LLM_RETRY_MAX,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.rate_limits = LLM_RATE_LIMITS if rate_limits is None else rate_limits
+        self.default_rate_limit = default_rate_limit
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._buckets: dict[str, TokenBucket] = {}
+        self._queues: dict[Priority, OrderedDict[str, deque[_Waiter]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._active = 0
+        self._wakeup: float | None = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str, *, default: bool) -> TokenBucket | None:
+        """Get the bucket of a model or provider (models get a default limit)."""
+        if (bucket := self._buckets.get(key)) is None:
+            limit = self.rate_limits.get(key) or (
+                self.default_rate_limit if default else None
+            )
+            if limit is None:
+                return None
+            per_minute, burst = limit
+            bucket = self._buckets[key] = TokenBucket(per_minute / 60, burst)
+        return bucket
+
+    def buckets(self, model: str) -> tuple[TokenBucket, ...]:
+        """Get the token buckets limiting a model (`provider:model`)."""
+        provider = model.split(":", 1)[0] if ":" in model else ""
+        with self._lock:
+            buckets = [self._bucket(model, default=True)]
+            if provider:
+                buckets.append(self._bucket(provider, default=False))
+        return tuple(bucket for bucket in buckets if bucket is not None)
+
+    @property
+    def queued(self) -> int:
+        """Number of waiting requests."""
+        return sum(len(w) for queue in self._queues.values() for w in queue.values())
+
+    @property
+    def active(self) -> int:
+        """Number of admitted, unfinished requests."""
+        return self._active
+
+    def _grant(self) -> None:
+        """Admit waiting requests while slots and tokens are available."""
+        retry_in: float | None = None
+        retry_loop: asyncio.AbstractEventLoop | None = None
+        with self._lock:
+            admitted = True
+            while admitted and self._active < self.max_concurrency:
+                admitted = False
+                for priority, session, waiter in self._candidates():
+                    delay = max((bucket.delay() for bucket in waiter.buckets), default=0)
+                    if delay > 0:
+                        if retry_in is None or delay < retry_in:
+                            retry_in, retry_loop = delay, waiter.loop
+                        continue
+                    # The queues changed, scan again from the top
+                    self._pop(priority, session)
+                    self._admit(waiter)
+                    admitted = True
+                    break
+            if retry_loop is None or retry_in is None or admitted:
+                return
+            now = time.monotonic()
+            # A pending wakeup may be lost with the loop of an evicted session
+            if self._wakeup is not None and now < self._wakeup <= now + retry_in:
+                return
+            self._wakeup = now + retry_in
+        # Grant again once the earliest bucket has refilled
+        with suppress(RuntimeError):
+            retry_loop.call_soon_threadsafe(retry_loop.call_later, retry_in, self._wake)
+
+    def _candidates(self) -> Iterator[tuple[Priority, str, _Waiter]]:
+        """Heads of the session queues, by priority and round-robin position."""
+        for priority in Priority:
+            for session, waiters in self._queues[priority].items():
+                yield priority, session, waiters[0]
+
+    def _pop(self, priority: Priority, session: str) -> None:
+        """Remove the head of a session queue, moving the session to the back."""
+        queue = self._queues[priority]
+        waiters = queue.pop(session)
+        waiters.popleft()
+        if waiters:
+            queue[session] = waiters
+
+    def _admit(self, waiter: _Waiter) -> None:
+        """Take the tokens and a slot for a waiter and wake it up."""
+        try:
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+        except RuntimeError:  # loop of an evicted session
+            return
+        for bucket in waiter.buckets:
+            bucket.take()
+        self._active += 1
+        waiter.granted = True
+        metrics.observe(
+            "chatbot_llm_queue_wait_seconds",
+            time.monotonic() - waiter.enqueued,
+            priority=waiter.priority.name.lower(),
+        )
+
+    def _wake(self) -> None:
+        with self._lock:
+            self._wakeup = None
+        self._grant()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[None]:
+        """Wait for admission of one request to `model`."""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            loop=loop,
+            future=loop.create_future(),
+            buckets=self.buckets(model),
+            priority=_priority.get(),
+            session=_session.get(),
+        )
+        with self._lock:
+            queue = self._queues[waiter.priority]
+            queue.setdefault(waiter.session, deque()).append(waiter)
+            depth = sum(len(w) for w in queue.values())
+        metrics.observe(
+            "chatbot_llm_queue_depth", depth, priority=waiter.priority.name.lower()
+        )
+        self._grant()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._drop(waiter)
+            if granted:
+                self._release()
+            raise
+        try:
+            if (on_admit := _on_admit.get()) is not None:
+                on_admit()
+            yield
+        finally:
+            self._release()
+
+    def _drop(self, waiter: _Waiter) -> None:
+        """Remove a waiter which gave up (lock must be held)."""
+        queue = self._queues[waiter.priority]
+        if (waiters := queue.get(waiter.session)) is not None:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[waiter.session]
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential backoff before retry number `attempt` (from 0)."""
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2**attempt))
+
+    def on_rate_limit(
+        self, model: str, attempt: int, error: BaseException | None = None
+    ) -> float:
+        """Pause the model's buckets after a rate limit.
+
+        A `Retry-After` of the provider's response is the lower bound of the
+        backoff.
+
+        Returns:
+            Seconds to wait before retrying
+        """
+        delay = self.backoff(attempt)
+        if error is not None and (hint := retry_after(error)) is not None:
+            delay = max(delay, hint)
+        for bucket in self.buckets(model):
+            bucket.pause(delay)
+        metrics.inc("chatbot_llm_rate_limited_total", model=model)
+        logger.warning("Rate limited by %s, retrying in %.1fs", model, delay)
+        return delay
+
+    async def run[T](self, model: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run a request once admitted, retrying on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            async with self.slot(model):
+                try:
+                    return await call()
+                except Exception as e:
+                    if not is_rate_limit(e) or attempt == self.max_retries:
+                        raise
+                    delay = self.on_rate_limit(model, attempt, e)
+            await asyncio.sleep(delay)
+        raise AssertionError  # unreachable
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@functools.cache
+def llm_scheduler() -> LLMScheduler:
+    """Get the process-wide LLM scheduler."""
+    return LLMScheduler()
+
+
+class ScheduledModel(WrapperModel):
+    """Model whose requests are admitted by the LLM scheduler.
+
+    Streamed requests are only retried while the stream is opened, once
+    the first event was received, errors are raised as usual. The provider
+    client's own retries are turned off, the scheduler retries instead.
+    """
+
+    def __init__(self, wrapped: Model, name: str) -> None:
+        super().__init__(without_sdk_retries(wrapped))
+        self.name = name
+
+    async def request(self, *args: Any, **kwargs: Any) -> tuple[ModelResponse, Usage]:
+        return await llm_scheduler().run(
+            self.name, lambda: self.wrapped.request(*args, **kwargs)
+        )
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        scheduler = llm_scheduler()
+        for attempt in range(scheduler.max_retries + 1):
+            async with scheduler.slot(self.name):
+                stream = self.wrapped.request_stream(
+                    messages, model_settings, model_request_parameters
+                )
+                try:
+                    response = await stream.__aenter__()
+                except Exception as e:
+                    if not is_rate_limit(e) or attempt == scheduler.max_retries:
+                        raise
+                    delay = scheduler.on_rate_limit(self.name, attempt, e)
+                else:
+                    try:
+                        yield response
+                    except BaseException as e:
+                        if not await stream.__aexit__(type(e), e, e.__traceback__):
+                            raise
+                    else:
+                        await stream.__aexit__(None, None, None)
+                    return
+            await asyncio.sleep(delay)
@@ -0,0 +1,168 @@
+"""Process-wide model catalog backed by an on-disk snapshot."""
+
+from __future__ import annotations
+
+import functools
+import logging
+from pathlib import Path
+import pickle
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from config import MODEL_CATALOG_TTL, MODEL_PROVIDERS
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from tokonomics.model_discovery import ModelInfo, ProviderType
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).parent.parent
+SNAPSHOT_PATH = ROOT / ".cache" / "model_catalog.pkl"
+SNAPSHOT_VERSION = 1
+# Delay before retrying after a failed refresh
+RETRY_DELAY = 60
+
+
+def discover_models(providers: Sequence[ProviderType]) -> list[ModelInfo]:
+    """Fetch the model list from the providers (a remote call per provider)."""
+    from tokonomics.model_discovery import get_all_models_sync
+
+    return get_all_models_sync(providers=providers)
+
+
+class ModelCatalog:
+    """Model list served from memory and refreshed in the background.
+
+    The list is loaded from a disk snapshot on first use. Once it is older
+    than `ttl`, readers still get the current list while a background thread
+    fetches a new one. Failed or empty fetches keep the last good list.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[ProviderType],
+        *,
+        ttl: float = MODEL_CATALOG_TTL,
+        path: Path = SNAPSHOT_PATH,
+        fetch: Callable[[Sequence[ProviderType]], list[ModelInfo]] = discover_models,
+    ) -> None:
+        self.providers = tuple(providers)
+        self.ttl = ttl
+        self.path = path
+        self._fetch = fetch
+        self._models: list[ModelInfo] = []
+        self._by_id: dict[str, ModelInfo] = {}
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        """Seconds since the current list was fetched."""
+        return time.time() - self._fetched_at
+
+    def models(self) -> list[ModelInfo]:
+        """Get the current model list without waiting for the providers.
+
+        Only blocks if neither a snapshot nor a previous fetch is available,
+        at most once per `RETRY_DELAY` while the providers are unreachable
+        (the list is empty meanwhile).
+        """
+        self._ensure_loaded()
+        if time.time() < self._retry_at:
+            return self._models
+        if not self._models:
+            self.refresh(wait=True)
+        elif self.age > self.ttl:
+            self.refresh_in_background()
+        return self._models
+
+    def get(self, model_id: str) -> ModelInfo | None:
+        """Get a model by its pydantic-ai id ("provider:model")."""
+        self.models()
+        return self._by_id.get(model_id)
+
+    def refresh(self, *, wait: bool = False) -> bool:
+        """Fetch the model list now, keeping the last good list on failure.
+
+        Args:
+            wait: Wait for a running refresh (and skip fetching again if it
+                  succeeded or just failed) instead of returning right away
+
+        Returns:
+            Whether a new list was stored
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        try:
+            if wait and (self._models or time.time() < self._retry_at):
+                return False
+            try:
+                models = self._fetch(self.providers)
+            except Exception:
+                logger.exception("Failed to fetch models from %s", self.providers)
+                models = []
+            if not models:
+                logger.warning("No models from %s, keeping last list", self.providers)
+                self._retry_at = time.time() + RETRY_DELAY
+                return False
+            self._store(models, time.time())
+            self._save()
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def seed(self, models: list[ModelInfo]) -> None:
+        """Serve a fixed model list (e.g. offline) without touching the snapshot."""
+        with self._lock:
+            self._loaded = True
+        self._store(models, time.time())
+
+    def refresh_in_background(self) -> None:
+        """Start a refresh in a daemon thread unless one is running."""
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, name="model-catalog", daemon=True).start()
+
+    def _store(self, models: list[ModelInfo], fetched_at: float) -> None:
+        with self._lock:
+            self._models = models
+            self._by_id = {model.pydantic_ai_id: model for model in models}
+            self._fetched_at = fetched_at
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        try:
+            with self.path.open("rb") as file:
+                version, providers, fetched_at, models = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            return
+        if version == SNAPSHOT_VERSION and providers == self.providers:
+            self._store(models, fetched_at)
+
+    def _save(self) -> None:
+        snapshot = (SNAPSHOT_VERSION, self.providers, self._fetched_at, self._models)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with tmp_path.open("wb") as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(self.path)
+        except OSError:
+            logger.exception("Failed to write model catalog snapshot")
+
+
+@functools.cache
+def model_catalog() -> ModelCatalog:
+    """Get the process-wide model catalog."""
+    return ModelCatalog(MODEL_PROVIDERS)
@@ -0,0 +1,399 @@
+"""Agent tools generated from OpenAPI specifications."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, replace
+import functools
+import hashlib
+import inspect
+import json
+import keyword
+import logging
+from pathlib import Path
+import pickle
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Annotated, Any, Literal
+from urllib.parse import quote
+
+from llmling_agent import Tool
+from pydantic import Field
+
+from components.cache import TTLCache, hash_key
+
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    import httpx
+
+    from utils import LoopThread
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).parent.parent
+CACHE_DIR = ROOT / ".cache"
+TABLE_VERSION = 1
+
+HTTP_TIMEOUT = 30.0
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+RESPONSE_CACHE_TTL = 60 * 10
+RESPONSE_CACHE_SIZE = 256
+# Longest tool description accepted by the llmling-agent tool manager
+MAX_DESCRIPTION_LENGTH = 1000
+
+_HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+_SCALAR_TYPES: dict[str, type] = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+}
+
+
+@dataclass(frozen=True)
+class Parameter:
+    """A compiled operation parameter."""
+
+    name: str
+    """Parameter name as sent to the API."""
+
+    python_name: str
+    """Parameter name as exposed to the agent (a valid identifier)."""
+
+    location: str
+    """One of "query", "path" or "header"."""
+
+    description: str = ""
+    type_name: str = "string"
+    format: str | None = None
+    enum: tuple[Any, ...] = ()
+    required: bool = False
+
+    @property
+    def annotation(self) -> Any:
+        """Python type annotation of the parameter, carrying its description."""
+        if self.type_name == "array":
+            annotation: Any = list[str]
+        elif self.enum:
+            annotation = Literal[self.enum]
+        else:
+            annotation = _SCALAR_TYPES.get(self.type_name, str)
+        if not self.required:
+            annotation |= None
+        fmt = f" ({self.format})" if self.format else ""
+        if description := f"{self.description}{fmt}".strip():
+            annotation = Annotated[annotation, Field(description=description)]
+        return annotation
+
+
+@dataclass(frozen=True)
+class Operation:
+    """A compiled API operation."""
+
+    operation_id: str
+    method: str
+    path: str
+    description: str
+    parameters: tuple[Parameter, ...]
+
+    @property
+    def summary(self) -> str:
+        """One-line tool description, the parameters are described in the schema."""
+        text = self.description or f"{self.method.upper()} {self.path}"
+        if len(text) > MAX_DESCRIPTION_LENGTH:
+            text = text[: MAX_DESCRIPTION_LENGTH - 1].rstrip() + "…"
+        return text
+
+
+@dataclass(frozen=True)
+class OperationTable:
+    """All operations of a spec, compiled for fast loading."""
+
+    title: str
+    base_url: str
+    operations: tuple[Operation, ...]
+    spec_hash: str
+
+
+def _python_name(name: str) -> str:
+    ident = re.sub(r"\W", "_", name)
+    if not ident or ident[0].isdigit() or keyword.iskeyword(ident):
+        ident = f"{ident}_"
+    return ident
+
+
+def _resolve(spec: dict[str, Any], item: dict[str, Any]) -> dict[str, Any]:
+    """Follow local `$ref` pointers (`#/components/...`)."""
+    seen: set[str] = set()
+    while (ref := item.get("$ref")) and ref not in seen:
+        seen.add(ref)
+        node: Any = spec
+        for part in ref.removeprefix("#/").split("/"):
+            node = node[part.replace("~1", "/").replace("~0", "~")]
+        item = node
+    return item
+
+
+def _compile_parameter(spec: dict[str, Any], raw: dict[str, Any]) -> Parameter:
+    param = _resolve(spec, raw)
+    schema = _resolve(spec, param.get("schema", {}))
+    return Parameter(
+        name=param["name"],
+        python_name=_python_name(param["name"]),
+        location=param.get("in", "query"),
+        description=" ".join(str(param.get("description", "")).split()),
+        type_name=schema.get("type", "string"),
+        format=schema.get("format"),
+        enum=tuple(schema.get("enum", ())),
+        required=bool(param.get("required")) or param.get("in") == "path",
+    )
+
+
+def compile_spec(text: str) -> OperationTable:
+    """Parse an OpenAPI document into an operation table.
+
+    Args:
+        text: YAML or JSON source of the spec
+    """
+    import yaml
+
+    spec = yaml.safe_load(text)
+    operations = []
+    for path, path_item in spec.get("paths", {}).items():
+        shared = path_item.get("parameters", [])
+        for method in _HTTP_METHODS:
+            if (op := path_item.get(method)) is None:
+                continue
+            params = {
+                p.name: p
+                for raw in (*shared, *op.get("parameters", []))
+                if (p := _compile_parameter(spec, raw)).location in {"query", "path"}
+            }
+            op_id = op.get("operationId") or _python_name(f"{method}_{path.strip('/')}")
+            description = op.get("description") or op.get("summary") or ""
+            operations.append(
+                Operation(
+                    operation_id=op_id,
+                    method=method,
+                    path=path,
+                    description=" ".join(description.split()),
+                    parameters=tuple(params.values()),
+                )
+            )
+    servers = spec.get("servers") or [{}]
+    return OperationTable(
+        title=spec.get("info", {}).get("title", ""),
+        base_url=servers[0].get("url", ""),
+        operations=tuple(operations),
+        spec_hash=hashlib.sha256(text.encode()).hexdigest(),
+    )
+
+
+def load_operation_table(spec_path: Path, cache_dir: Path = CACHE_DIR) -> OperationTable:
+    """Load the compiled operation table of a spec, compiling it on first use.
+
+    Compiled tables are pickled next to other caches, keyed by the hash of
+    the spec source, so the YAML is only parsed once per spec revision.
+    """
+    text = spec_path.read_text(encoding="utf-8")
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    cache_path = cache_dir / f"{spec_path.stem}-{digest[:16]}.pkl"
+    try:
+        with cache_path.open("rb") as file:
+            version, table = pickle.load(file)
+        if version == TABLE_VERSION and table.spec_hash == digest:
+            return table
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        pass
+    table = compile_spec(text)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with tmp_path.open("wb") as file:
+        pickle.dump((TABLE_VERSION, table), file, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(cache_path)
+    logger.info("Compiled %d operations from %s", len(table.operations), spec_path.name)
+    return table
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A cached response body with its validators."""
+
+    payload: Any
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class HttpGateway:
+    """Process-wide pooled HTTP client with a TTL / ETag response cache.
+
+    The client lives on its own event loop thread, since HTTP connections are
+    bound to the loop they were opened on and every browser session runs its
+    agents on a different loop. Requests from any loop are forwarded to it.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = RESPONSE_CACHE_TTL,
+        maxsize: int = RESPONSE_CACHE_SIZE,
+    ) -> None:
+        self.ttl = ttl
+        self._cache = TTLCache[CachedResponse](maxsize=maxsize)
+        self._loop_thread: LoopThread | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_client(self) -> tuple[LoopThread, httpx.AsyncClient]:
+        with self._lock:
+            if self._loop_thread is None or self._client is None:
+                import httpx
+
+                from utils import LoopThread
+
+                self._loop_thread = LoopThread(name="http-client")
+                self._client = httpx.AsyncClient(
+                    timeout=HTTP_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    ),
+                    follow_redirects=True,
+                )
+            return self._loop_thread, self._client
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: dict[str, Any],
+        headers: dict[str, str],
+    ) -> httpx.Response:
+        loop_thread, client = self._ensure_client()
+        request = client.request(method, url, params=params, headers=headers)
+        return await asyncio.wrap_future(loop_thread.submit(request))
+
+    async def request(self, method: str, url: str, params: dict[str, Any]) -> Any:
+        """Send a request, answering GETs from the cache where possible.
+
+        Fresh cache entries are returned without a request; stale ones are
+        revalidated with `If-None-Match` / `If-Modified-Since`.
+
+        Returns:
+            The decoded JSON body (or the text for non-JSON responses)
+
+        Raises:
+            httpx.HTTPStatusError: If the API answers with an error status
+        """
+        if method.lower() != "get":
+            response = await self._send(method, url, params, {})
+            response.raise_for_status()
+            return _decode(response)
+        key = hash_key(url, params)
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached.fetched_at < self.ttl:
+            return cached.payload
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        response = await self._send(method, url, params, headers)
+        if cached and response.status_code == 304:  # noqa: PLR2004
+            self._cache.set(key, replace(cached, fetched_at=time.monotonic()))
+            return cached.payload
+        response.raise_for_status()
+        payload = _decode(response)
+        entry = CachedResponse(
+            payload=payload,
+            fetched_at=time.monotonic(),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self._cache.set(key, entry)
+        return payload
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self._cache.clear()
+
+
+def _decode(response: httpx.Response) -> Any:
+    if "json" in response.headers.get("Content-Type", ""):
+        return response.json()
+    return response.text
+
+
+@functools.cache
+def http_gateway() -> HttpGateway:
+    """Get the HTTP gateway shared by all generated tools."""
+    return HttpGateway()
+
+
+def create_operation_callable(
+    operation: Operation,
+    base_url: str,
+    gateway: HttpGateway,
+) -> Callable[..., Awaitable[str]]:
+    """Create a typed coroutine function calling an API operation."""
+
+    async def call_operation(**kwargs: Any) -> str:
+        path = operation.path
+        params: dict[str, Any] = {}
+        for param in operation.parameters:
+            value = kwargs.get(param.python_name)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                value = ",".join(map(str, value))
+            if param.location == "path":
+                path = path.replace(f"{{{param.name}}}", quote(str(value), safe=""))
+            else:
+                params[param.name] = value
+        result = await gateway.request(operation.method, f"{base_url}{path}", params)
+        return (
+            result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+        )
+
+    signature_params = [
+        inspect.Parameter(
+            param.python_name,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=inspect.Parameter.empty if param.required else None,
+            annotation=param.annotation,
+        )
+        for param in sorted(operation.parameters, key=lambda p: not p.required)
+    ]
+    call_operation.__name__ = call_operation.__qualname__ = operation.operation_id
+    call_operation.__doc__ = operation.summary
+    call_operation.__signature__ = inspect.Signature(  # type: ignore[attr-defined]
+        signature_params, return_annotation=str
+    )
+    call_operation.__annotations__ = {
+        **{param.python_name: param.annotation for param in operation.parameters},
+        "return": str,
+    }
+    return call_operation
+
+
+@functools.cache
+def openapi_tools(spec_path: Path, base_url: str | None = None) -> list[Tool]:
+    """Get one tool per operation of an OpenAPI spec.
+
+    Args:
+        spec_path: Path to the YAML / JSON spec
+        base_url: API base URL (defaults to the first server of the spec)
+    """
+    table = load_operation_table(spec_path)
+    gateway = http_gateway()
+    url = (base_url or table.base_url).rstrip("/")
+    return [
+        Tool.from_callable(create_operation_callable(operation, url, gateway))
+        for operation in table.operations
+    ]
@@ -0,0 +1,36 @@
+"""Basic form widgets for pydantic models."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import streamlit as st
+
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+
+# Fields rendered as single line inputs, all others get a text area
+SINGLE_LINE_FIELDS = {"title"}
+
+
+def render_model_form[T: BaseModel](instance: T) -> T:
+    """Render one input per (string) field of a model.
+
+    Field descriptions are used as labels. The widgets are not keyed, so they
+    reset whenever a different instance gets rendered.
+
+    Args:
+        instance: The model instance providing the initial values
+
+    Returns:
+        A copy of the instance with the edited values
+    """
+    values = {}
+    for name, field in type(instance).model_fields.items():
+        label = field.description or name
+        value = str(getattr(instance, name) or "")
+        widget = st.text_input if name in SINGLE_LINE_FIELDS else st.text_area
+        values[name] = widget(label, value=value)
+    return instance.model_copy(update=values)
@@ -0,0 +1,274 @@
+"""Exact and semantic cache for chat responses, backed by SQLite."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import functools
+import itertools
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Literal
+import zlib
+
+from components.cache import TTLCache, hash_key
+from components.tool_registry import toolset_version
+from config import (
+    CHAT_CACHE_DISK_SIZE,
+    CHAT_CACHE_PATH,
+    CHAT_CACHE_SEMANTIC_THRESHOLD,
+    CHAT_CACHE_SIZE,
+    CHAT_CACHE_TTL,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from pathlib import Path
+
+    from llmling_agent import AnyAgent, ChatMessage
+
+# Buckets of the hashed bag-of-words vectors
+VECTOR_DIMENSIONS = 2**18
+# Most recently used entries of a scope compared by the semantic tier
+SEMANTIC_CANDIDATES = 500
+# Words flipping the meaning of a prompt (German and English)
+NEGATIONS = frozenset({
+    "nicht",
+    "kein",
+    "keine",
+    "keinen",
+    "keinem",
+    "keiner",
+    "keines",
+    "nichts",
+    "nie",
+    "niemals",
+    "ohne",
+    "weder",
+    "not",
+    "no",
+    "none",
+    "never",
+    "nothing",
+    "without",
+    "neither",
+    "nor",
+    "cannot",
+})
+SCHEMA_VERSION = 2
+
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_CONTRACTED_NOT_RE = re.compile(r"\wn't\b")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    vector TEXT NOT NULL,
+    guard TEXT NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_scope_used ON responses (scope, used);
+"""
+
+type Vector = dict[int, float]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold a prompt and drop whitespace / punctuation differences."""
+    return " ".join(_WORD_RE.findall(prompt.casefold()))
+
+
+def embed(text: str) -> Vector:
+    """Embed a text as L2-normalized hashed bag of words and word bigrams."""
+    words = normalize_prompt(text).split()
+    features = [*words, *(f"{a} {b}" for a, b in itertools.pairwise(words))]
+    vector: Vector = {}
+    for feature in features:
+        bucket = zlib.crc32(feature.encode()) % VECTOR_DIMENSIONS
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {bucket: value / norm for bucket, value in vector.items()} if norm else {}
+
+
+def prompt_guard(prompt: str) -> str:
+    """Numbers and number of negations of a prompt.
+
+    Prompts differing only in these score high as bag of words, yet ask for
+    something else ("... erlaubt?" / "... nicht erlaubt?", 2025 / 2026), so
+    semantic matches have to share them.
+    """
+    text = prompt.casefold().replace("\u2019", "'")
+    numbers = sorted(_NUMBER_RE.findall(text))
+    negations = sum(word in NEGATIONS for word in _WORD_RE.findall(text))
+    negations += len(_CONTRACTED_NOT_RE.findall(text))
+    return json.dumps([numbers, negations])
+
+
+def similarity(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two normalized vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+def cache_scope(agent: AnyAgent[Any, Any], history: Sequence[ChatMessage[Any]]) -> str:
+    """Hash everything besides the prompt a response depends on.
+
+    That is the system prompt, the model, the tool set and the user prompts
+    of the conversation so far (so follow-up questions only match within
+    the same conversation flow).
+
+    Args:
+        agent: The answering agent
+        history: The conversation so far
+    """
+    sys_prompts = [str(prompt) for prompt in agent.sys_prompts.prompts]
+    previous = [
+        normalize_prompt(str(msg.content)) for msg in history if msg.role == "user"
+    ]
+    tools = toolset_version(agent.tools.values())
+    return hash_key(sys_prompts, agent.model_name, tools, previous)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A cached answer and the tier it was found in."""
+
+    content: str
+    model: str | None
+    created: float
+    tier: Literal["exact", "semantic"] = "exact"
+    score: float = 1.0
+
+
+class ResponseCache:
+    """Two tier response cache: exact matches, then semantically similar prompts.
+
+    Exact matches are keyed by normalized prompt and scope and served from a
+    memory LRU in front of a SQLite store. The optional semantic tier compares
+    the prompt with recently used prompts of the same scope, numbers and
+    negations (see `prompt_guard`) and returns the best answer above
+    `threshold`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ttl: float = CHAT_CACHE_TTL,
+        maxsize: int = CHAT_CACHE_SIZE,
+        disk_maxsize: int = CHAT_CACHE_DISK_SIZE,
+        threshold: float | None = CHAT_CACHE_SEMANTIC_THRESHOLD,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.disk_maxsize = disk_maxsize
+        self.threshold = threshold
+        self._memory = TTLCache[CachedResponse](maxsize=maxsize, ttl=ttl)
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The SQLite connection, opened on first use."""
+        with self._lock:
+            if self._db is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                # Entries of an older layout are dropped, it's only a cache
+                if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    db.execute("DROP TABLE IF EXISTS responses")
+                    db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                db.executescript(_SCHEMA)
+                self._db = db
+            return self._db
+
+    def get(self, prompt: str, scope: str) -> CachedResponse | None:
+        """Look up the answer to a prompt, trying the exact tier first."""
+        key = hash_key(normalize_prompt(prompt), scope)
+        if hit := self._memory.get(key):
+            return hit
+        db = self.db
+        now = time.time()
+        with self._lock:
+            row = db.execute(
+                "SELECT content, model, created FROM responses"
+                " WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row:
+                db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+                db.commit()
+        if row:
+            hit = CachedResponse(*row)
+            self._memory.set(key, hit)
+            return hit
+        if self.threshold is None:
+            return None
+        return self._semantic_get(prompt, scope)
+
+    def _semantic_get(self, prompt: str, scope: str) -> CachedResponse | None:
+        vector = embed(prompt)
+        if not vector:
+            return None
+        guard = prompt_guard(prompt)
+        db = self.db
+        with self._lock:
+            rows = db.execute(
+                "SELECT content, model, created, vector FROM responses"
+                " WHERE scope = ? AND guard = ? AND created > ?"
+                " ORDER BY used DESC LIMIT ?",
+                (scope, guard, time.time() - self.ttl, SEMANTIC_CANDIDATES),
+            ).fetchall()
+        best: CachedResponse | None = None
+        for content, model, created, raw_vector in rows:
+            candidate = {int(k): v for k, v in json.loads(raw_vector).items()}
+            score = similarity(vector, candidate)
+            if score >= (self.threshold or 0) and (best is None or score > best.score):
+                best = CachedResponse(content, model, created, "semantic", score)
+        return best
+
+    def set(self, prompt: str, scope: str, content: str, model: str | None) -> None:
+        """Store the answer to a prompt in both tiers."""
+        key = hash_key(normalize_prompt(prompt), scope)
+        now = time.time()
+        self._memory.set(key, CachedResponse(content, model, now))
+        vector = json.dumps(embed(prompt))
+        guard = prompt_guard(prompt)
+        db = self.db
+        with self._lock:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, content, model, vector, guard, now, now),
+            )
+            db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses"
+                " ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_maxsize,),
+            )
+            db.commit()
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self._memory.clear()
+        db = self.db
+        with self._lock:
+            db.execute("DELETE FROM responses")
+            db.commit()
+
+
+@functools.cache
+def response_cache() -> ResponseCache:
+    """Get the process-wide chat response cache."""
+    return ResponseCache(CHAT_CACHE_PATH)
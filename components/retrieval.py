@@ -0,0 +1,232 @@
+"""Local BM25 retrieval over the reference documents in docs/."""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+import functools
+import hashlib
+import heapq
+import logging
+import math
+from pathlib import Path
+import pickle
+import re
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).parent.parent
+DOCS_DIR = ROOT / "docs"
+DOCS_GLOBS = ("*.md", "*.txt")
+INDEX_PATH = ROOT / ".cache" / "docs_index.pkl"
+INDEX_VERSION = 1
+
+CHUNK_CHARS = 1200
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A passage of a source document."""
+
+    source: str
+    """File name of the document."""
+
+    title: str
+    """Closest preceding heading."""
+
+    text: str
+    """Passage text."""
+
+
+def chunk_document(
+    source: str,
+    text: str,
+    max_chars: int = CHUNK_CHARS,
+    *,
+    title: str | None = None,
+) -> Iterator[Chunk]:
+    """Split a markdown / text document into heading-aware passages.
+
+    Paragraphs are packed into chunks of up to `max_chars` characters; a new
+    heading (outside of fenced code blocks) always starts a new chunk.
+
+    Args:
+        source: Name of the document
+        text: Document text
+        max_chars: Maximum chunk size (single paragraphs may exceed it)
+        title: Heading the text starts under (when chunking a document in parts)
+    """
+    current: str = title or source
+    buffer: list[str] = []
+    size = 0
+    in_fence = False
+
+    def flush() -> Iterator[Chunk]:
+        nonlocal buffer, size
+        if body := "\n\n".join(buffer).strip():
+            yield Chunk(source=source, title=current, text=body)
+        buffer, size = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        heading = None if in_fence else _HEADING_RE.match(paragraph.split("\n", 1)[0])
+        if heading:
+            yield from flush()
+            current = heading.group(1).strip() or current
+        elif size + len(paragraph) > max_chars:
+            yield from flush()
+        buffer.append(paragraph)
+        size += len(paragraph)
+        in_fence ^= paragraph.count("```") % 2 == 1
+    yield from flush()
+
+
+@dataclass
+class BM25Index:
+    """Okapi BM25 index with an inverted posting list per term."""
+
+    chunks: list[Chunk] = field(default_factory=list)
+    postings: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    """Term -> (chunk position, term frequency) pairs."""
+    idf: dict[str, float] = field(default_factory=dict)
+    lengths: list[int] = field(default_factory=list)
+    avg_length: float = 0.0
+    fingerprint: str = ""
+    """Hash of the indexed sources, used to detect stale indexes."""
+
+    @classmethod
+    def build(cls, chunks: Iterable[Chunk], fingerprint: str = "") -> BM25Index:
+        """Build an index over the given chunks."""
+        index = cls(chunks=list(chunks), fingerprint=fingerprint)
+        postings: defaultdict[str, list[tuple[int, int]]] = defaultdict(list)
+        for i, chunk in enumerate(index.chunks):
+            terms = Counter(tokenize(f"{chunk.title}\n{chunk.text}"))
+            index.lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                postings[term].append((i, freq))
+        n_docs = len(index.chunks)
+        index.postings = dict(postings)
+        index.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+        index.avg_length = sum(index.lengths) / n_docs if n_docs else 0.0
+        return index
+
+    def search(self, query: str, limit: int = 3) -> list[tuple[float, Chunk]]:
+        """Get the best matching chunks for a query.
+
+        Returns:
+            (score, chunk) pairs, best match first
+        """
+        scores: defaultdict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, freq in self.postings[term]:
+                norm = 1 - BM25_B + BM25_B * self.lengths[position] / self.avg_length
+                scores[position] += idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[position]) for position, score in best]
+
+    def save(self, path: Path) -> None:
+        """Persist the index (written atomically)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as file:
+            pickle.dump((INDEX_VERSION, self), file, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> BM25Index | None:
+        """Load a persisted index, returning None if missing or outdated."""
+        try:
+            with path.open("rb") as file:
+                version, index = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return index if version == INDEX_VERSION else None
+
+
+def doc_paths(docs_dir: Path = DOCS_DIR) -> list[Path]:
+    """Get the indexed documents, in stable order."""
+    return sorted(path for pattern in DOCS_GLOBS for path in docs_dir.glob(pattern))
+
+
+def fingerprint(paths: Iterable[Path]) -> str:
+    """Hash names, sizes and modification times of the given files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def build_index(docs_dir: Path = DOCS_DIR, index_path: Path = INDEX_PATH) -> BM25Index:
+    """Chunk all documents, build the BM25 index and persist it."""
+    paths = doc_paths(docs_dir)
+    chunks = [
+        chunk
+        for path in paths
+        for chunk in chunk_document(path.name, path.read_text(encoding="utf-8"))
+    ]
+    index = BM25Index.build(chunks, fingerprint=fingerprint(paths))
+    index.save(index_path)
+    logger.info("Indexed %d chunks from %d documents", len(chunks), len(paths))
+    return index
+
+
+@functools.cache
+def get_docs_index() -> BM25Index:
+    """Get the process-wide docs index, rebuilding it if the docs changed."""
+    index = BM25Index.load(INDEX_PATH)
+    if index is None or index.fingerprint != fingerprint(doc_paths()):
+        index = build_index()
+    return index
+
+
+def format_passages(chunks: Iterable[Chunk]) -> str:
+    """Format chunks with their source and section."""
+    return "\n\n---\n\n".join(
+        f"Source: {chunk.source} / {chunk.title}\n\n{chunk.text}" for chunk in chunks
+    )
+
+
+def search_docs(query: str, max_results: int = 3) -> str:
+    """Search the local reference documents (SAP S/4HANA custom code migration guide, Jira query language guide).
+
+    Args:
+        query: Search terms
+        max_results: Maximum number of passages to return
+
+    Returns:
+        str: The best matching passages with their source and section
+    """  # noqa: E501
+    results = get_docs_index().search(query, limit=max_results)
+    if not results:
+        return "No matching passages found."
+    return format_passages(chunk for _, chunk in results)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_index()
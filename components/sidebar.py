@@ -4,16 +4,58 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
-import streambricks as sb
 import streamlit as st
 
 
 if TYPE_CHECKING:
-    from llmling_agent import AnyAgent
+    from llmling_agent import AnyAgent, Tool
     from streamlit.delta_generator import DeltaGenerator
     from tokonomics.model_discovery import ModelInfo
 
 
+def render_model_selector(
+    value: str | None = None,
+    *,
+    expanded: bool = True,
+) -> ModelInfo | None:
+    """Render provider and model dropdowns fed by the cached model catalog.
+
+    Args:
+        value: Pydantic-ai id of the initially selected model
+        expanded: Whether to expand the model details by default
+
+    Returns:
+        Selected model info or None if no models are known
+    """
+    from components.model_catalog import model_catalog
+
+    catalog = model_catalog()
+    models = catalog.models()
+    if not models:
+        st.warning("Model list is currently unavailable.")
+        return None
+    current_model = catalog.get(value) if value else None
+    providers = sorted({model.provider for model in models})
+    if len(providers) > 1:
+        index = providers.index(current_model.provider) if current_model else 0
+        provider = st.selectbox("Provider", options=providers, index=index)
+    else:
+        provider = providers[0]
+
+    provider_models = [model for model in models if model.provider == provider]
+    names = [model.name for model in provider_models]
+    index = (
+        names.index(current_model.name)
+        if current_model and current_model.provider == provider
+        else 0
+    )
+    selected_name = st.selectbox("Model", options=names, index=index)
+    selected_model = provider_models[names.index(selected_name)]
+    with st.expander("Model Details", expanded=expanded):
+        st.markdown(selected_model.format())
+    return selected_model
+
+
 def render_agent_config(
     agent: AnyAgent[Any, Any],
     container: DeltaGenerator | None = None,
@@ -24,22 +66,19 @@ def render_agent_config(
         agent: The agent to configure
         container: Optional container to render in (defaults to st)
     """
+    from components.agent_pool import shared_model
+    from components.state import MODEL_NAME, state
+
     # Use provided container or default to st
     st_container = container or st
+    config = state.agent_config[agent.name]
 
-    # Get or initialize config from session state
-    def on_model_change(model: ModelInfo) -> None:
-        """Handle model selection changes."""
-        agent.set_model(model.pydantic_ai_id)
-
+    current_model = config.get("model", MODEL_NAME)
     if (
-        selected_model := sb.model_selector(
-            value=agent.model_name,
-            providers=["openrouter"],
-            expanded=False,
-        )
-    ) and selected_model.pydantic_ai_id != selected_model:
-        agent.set_model(selected_model.pydantic_ai_id)
+        selected_model := render_model_selector(value=current_model, expanded=False)
+    ) and selected_model.pydantic_ai_id != current_model:
+        config["model"] = selected_model.pydantic_ai_id
+        agent.set_model(shared_model(selected_model.pydantic_ai_id))
 
     # Add tool selector
     render_tool_selector(agent)
@@ -48,10 +87,11 @@ def render_agent_config(
     sys_prompt = agent.sys_prompts.prompts[0] if agent.sys_prompts.prompts else ""
     new_prompt = st_container.text_area("System Prompt", value=str(sys_prompt))
     if new_prompt != sys_prompt:
-        sys_prompt = new_prompt
+        config["system_prompt"] = new_prompt or ""
         # Update system prompt correctly
         agent.sys_prompts.prompts.clear()
         agent.sys_prompts.prompts.append(new_prompt or "")
+    state.save()
 
 
 def render_agent_sidebar(agent: AnyAgent[Any, Any]) -> None:
@@ -74,25 +114,13 @@ def render_tool_selector(agent: AnyAgent[Any, Any]) -> None:
     from streambricks import MultiSelectItem, multiselect
 
     from components.state import state
-    from config import create_issue_tool, search_jira_tool, search_tool
+    from components.tool_registry import load_tools, sync_tools
+    from config import AVAILABLE_TOOLS
 
-    # Define available tools as MultiSelectItems
+    # Tools are only described here; they get built once selected
     available_tools = [
-        MultiSelectItem(
-            label="Web Search",
-            value=search_tool,
-            description="Search the web for information",
-        ),
-        MultiSelectItem(
-            label="Jira Search",
-            value=search_jira_tool,
-            description="Search for issues in Jira",
-        ),
-        MultiSelectItem(
-            label="Jira Create Issue",
-            value=create_issue_tool,
-            description="Create a new issue in Jira",
-        ),
+        MultiSelectItem(label=spec.label, value=spec, description=spec.description)
+        for spec in AVAILABLE_TOOLS
     ]
     selected_items = multiselect(
         "Available Tools",
@@ -100,8 +128,12 @@ def render_tool_selector(agent: AnyAgent[Any, Any]) -> None:
         state_key=f"tools_{agent.name}",
         help_text="Select tools the agent can use",
     )
-    selected_tools = [item.value for item in selected_items]
+    selected_tools: list[Tool] = []
+    for item in selected_items:
+        try:
+            selected_tools.extend(load_tools(item.value))
+        except ValueError as e:
+            st.error(f"{item.label} is unavailable: {e}")
     state.agent_tools[agent.name] = selected_tools
-    agent.tools.clear()  # Remove all existing tools
-    for tool in selected_tools:
-        agent.tools.register_tool(tool)
+    state.agent_config[agent.name]["tools"] = [item.value.key for item in selected_items]
+    state.agent_config[agent.name]["toolset_version"] = sync_tools(agent, selected_tools)
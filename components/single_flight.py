@@ -0,0 +1,204 @@
+"""Coalescing of identical tool calls across sessions (single flight)."""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import threading
+from typing import TYPE_CHECKING, Any
+
+from components.cache import TTLCache, hash_key
+from components.telemetry import metrics
+from config import TOOL_FLIGHT_CACHE_SIZE, TOOL_FLIGHT_ERROR_TTL, TOOL_FLIGHT_TTL
+
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from llmling_agent import Tool
+
+
+_MISSING = object()
+
+
+class _LeaderGone(Exception):  # noqa: N818
+    """The call a follower waited for was cancelled, the follower takes over."""
+
+
+class SingleFlight:
+    """Shares one execution among identical concurrent calls.
+
+    The first caller of a key (the leader) runs the call, callers arriving
+    meanwhile wait for its outcome, whichever thread or event loop they run
+    on. Results stay cached for `ttl` seconds, errors for `error_ttl`
+    seconds (0 disables the negative cache).
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = TOOL_FLIGHT_TTL,
+        error_ttl: float = TOOL_FLIGHT_ERROR_TTL,
+        maxsize: int = TOOL_FLIGHT_CACHE_SIZE,
+    ) -> None:
+        self._results = TTLCache[Any](maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self._errors = (
+            TTLCache[Exception](maxsize=maxsize, ttl=error_ttl) if error_ttl > 0 else None
+        )
+        self._inflight: dict[str, concurrent.futures.Future[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> tuple[concurrent.futures.Future[Any], str]:
+        """Get a future holding the outcome of a key.
+
+        Returns:
+            The future and how it was obtained: "hit" / "error" (cached),
+            "shared" (in flight) or "miss" (the caller has to run the call
+            and settle the future with `_settle`)
+        """
+        with self._lock:
+            future: concurrent.futures.Future[Any] = concurrent.futures.Future()
+            if (
+                self._results is not None
+                and (result := self._results.get(key, _MISSING)) is not _MISSING
+            ):
+                future.set_result(result)
+                return future, "hit"
+            if self._errors is not None and (error := self._errors.get(key)):
+                future.set_exception(error)
+                return future, "error"
+            if (shared := self._inflight.get(key)) is not None:
+                return shared, "shared"
+            self._inflight[key] = future
+            return future, "miss"
+
+    def _settle(
+        self,
+        key: str,
+        future: concurrent.futures.Future[Any],
+        *,
+        result: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._lock:
+            del self._inflight[key]
+            if error is None:
+                if self._results is not None:
+                    self._results.set(key, result)
+            elif isinstance(error, Exception) and self._errors is not None:
+                self._errors.set(key, error)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:  # cancelled or interrupted, a waiting caller runs the call itself
+            future.set_exception(_LeaderGone())
+
+    def call[T](self, key: str, fn: Callable[[], T], *, tool: str = "") -> T:
+        """Run a blocking call, or wait for / reuse an identical one."""
+        while True:
+            future, outcome = self._lookup(key)
+            metrics.inc("chatbot_tool_flight_total", tool=tool, outcome=outcome)
+            if outcome != "miss":
+                try:
+                    return future.result()
+                except _LeaderGone:
+                    continue
+            try:
+                result = fn()
+            except BaseException as e:
+                self._settle(key, future, error=e)
+                raise
+            self._settle(key, future, result=result)
+            return result
+
+    async def acall[T](
+        self, key: str, fn: Callable[[], Awaitable[T]], *, tool: str = ""
+    ) -> T:
+        """Await a call, or wait for / reuse an identical one."""
+        while True:
+            future, outcome = self._lookup(key)
+            metrics.inc("chatbot_tool_flight_total", tool=tool, outcome=outcome)
+            if outcome != "miss":
+                try:
+                    # Shielded, a cancelled follower must not cancel the leader
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderGone:
+                    continue
+            try:
+                result = await fn()
+            except BaseException as e:
+                self._settle(key, future, error=e)
+                raise
+            self._settle(key, future, result=result)
+            return result
+
+    def clear(self) -> None:
+        """Forget all cached results and errors."""
+        for cache in (self._results, self._errors):
+            if cache is not None:
+                cache.clear()
+
+
+@functools.cache
+def tool_flight() -> SingleFlight:
+    """Get the process-wide single flight of tool calls."""
+    return SingleFlight()
+
+
+def _normalize(value: Any) -> Any:
+    """Make equivalent arguments equal (whitespace in strings, nested values)."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, list | tuple):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def call_key(fn: Callable[..., Any], name: str, *args: Any, **kwargs: Any) -> str:
+    """Key of a tool call, the same for equivalent arguments.
+
+    Arguments are bound to the signature with defaults applied, so that
+    positional, keyword and omitted default arguments all match.
+    """
+    try:
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return hash_key(name, _normalize(args), _normalize(kwargs))
+    bound.apply_defaults()
+    return hash_key(name, _normalize(bound.arguments))
+
+
+def coalesce_tool(tool: Tool, flight: SingleFlight | None = None) -> None:
+    """Route the calls of a tool through the single flight.
+
+    The wrapper keeps the signature of the tool function, so the schema
+    seen by the model stays the same. Only use this for tools without
+    side effects.
+    """
+    fn = tool.callable.callable
+    name = tool.name
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = call_key(fn, name, *args, **kwargs)
+            return await (flight or tool_flight()).acall(
+                key, lambda: fn(*args, **kwargs), tool=name
+            )
+
+    else:
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = call_key(fn, name, *args, **kwargs)
+            return (flight or tool_flight()).call(
+                key, lambda: fn(*args, **kwargs), tool=name
+            )
+
+    tool.callable.callable = wrapper
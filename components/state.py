@@ -3,12 +3,39 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Any
+from contextlib import suppress
+import functools
+import hashlib
+import hmac
+import os
+import re
+import secrets
+from typing import TYPE_CHECKING, Any
+import uuid
 
-from llmling_agent import Agent, AnyAgent, ChatMessage, StructuredAgent
+from llmling_agent import Agent, AnyAgent, StructuredAgent
 import streamlit as st
 
-from config import FormData
+from components.agent_pool import AgentPool, AgentRuntime, shared_model
+from components.cache import TTLCache
+from components.conversation_store import PersistentHistory
+from components.state_backend import state_backend
+from components.tool_registry import load_tools, sync_tools
+from config import (
+    AVAILABLE_TOOLS,
+    SESSION_COOKIE,
+    SESSION_COOKIE_MAX_AGE,
+    SESSION_SECRET,
+    SESSION_SECRET_PATH,
+    TICKET_CACHE_SESSION_SIZE,
+    FormData,
+)
+from utils import session_id, session_loops
+
+
+if TYPE_CHECKING:
+    from components.ingest import IngestedDocument
+    from components.retrieval import BM25Index
 
 
 CHAT_AGENT_SYS_PROMPT = """\
@@ -21,50 +48,203 @@ Du bist verantwortllich, Tickets im Jira-TicketSystem zu erstellen.
 Extrahiere Informationen aus dem dir gegebenen Chatverlauf.
 """
 
-MODEL_NAME = "openrouter:openai/gpt-4o-mini"
+MODEL_NAME = os.getenv("CHATBOT_MODEL", "openrouter:openai/gpt-4o-mini")
 CHAT_AGENT_NAME = "Dieter"
 FORM_AGENT_NAME = "Uschi"
 
 
+async def create_form_agent(model: str = MODEL_NAME) -> StructuredAgent[None, FormData]:
+    """Create and enter the agent extracting tickets (FormData) from chats."""
+    form_agent: StructuredAgent[None, FormData] = Agent(
+        name=FORM_AGENT_NAME,
+        model=shared_model(model),
+        system_prompt=CHAT_AGENT_SYS_PROMPT,
+        session=False,
+    ).to_structured(FormData)
+    await form_agent.__aenter__()
+    return form_agent
+
+
+async def create_runtime() -> AgentRuntime:
+    """Create and enter the agents for a new session."""
+    # Initialize form agent
+    form_agent = await create_form_agent()
+
+    # Initialize chat agent
+    chat_agent = Agent[None](
+        name=CHAT_AGENT_NAME,
+        model=shared_model(MODEL_NAME),
+        system_prompt=TICKET_CREATOR_SYS_PROMPT,
+        session=False,
+    )
+    await chat_agent.__aenter__()
+    return AgentRuntime(agents={form_agent.name: form_agent, chat_agent.name: chat_agent})
+
+
+@st.cache_resource
+def get_agent_pool() -> AgentPool:
+    """Get the process-wide agent pool."""
+    return AgentPool(create_runtime, on_evict=session_loops.close)
+
+
+_SESSION_KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+
+@functools.cache
+def _session_secret() -> bytes:
+    """Get the key signing session cookies (see SESSION_SECRET)."""
+    if SESSION_SECRET:
+        return SESSION_SECRET.encode()
+    if not SESSION_SECRET_PATH.exists():
+        SESSION_SECRET_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = SESSION_SECRET_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(secrets.token_bytes(32))
+        tmp_path.chmod(0o600)
+        # Linking fails if another worker created the secret meanwhile
+        with suppress(FileExistsError):
+            os.link(tmp_path, SESSION_SECRET_PATH)
+        tmp_path.unlink()
+    return SESSION_SECRET_PATH.read_bytes()
+
+
+def sign_session_key(key: str) -> str:
+    """Get the cookie value carrying a session key."""
+    signature = hmac.new(_session_secret(), key.encode(), hashlib.sha256).hexdigest()
+    return f"{key}.{signature}"
+
+
+def verify_session_token(token: str | None) -> str | None:
+    """Get the session key of a cookie value, None unless signed by this app."""
+    key, _, signature = (token or "").partition(".")
+    if not _SESSION_KEY_RE.fullmatch(key):
+        return None
+    expected = sign_session_key(key).partition(".")[2]
+    return key if hmac.compare_digest(signature, expected) else None
+
+
+def _set_session_cookie(token: str) -> None:
+    """Store the session cookie in the browser (Streamlit can't set cookies)."""
+    import streamlit.components.v1 as components
+
+    components.html(
+        f"""<script>
+        const secure = parent.location.protocol === "https:" ? "; Secure" : "";
+        parent.document.cookie = "{SESSION_COOKIE}={token}; path=/; "
+            + "max-age={SESSION_COOKIE_MAX_AGE}; SameSite=Strict" + secure;
+        </script>""",
+        height=0,
+    )
+
+
+def session_key() -> str:
+    """Get the stable key of the user's session.
+
+    Unlike Streamlit's session id, the key is kept in a signed cookie (see
+    SESSION_COOKIE), so a reconnect to any worker continues the session.
+    Keys are only generated here, cookies not signed with SESSION_SECRET
+    are ignored and the key never appears in URLs.
+    """
+    if (key := st.session_state.get("session_key")) is None:
+        key = verify_session_token(st.context.cookies.get(SESSION_COOKIE))
+        if key is None:
+            key = uuid.uuid4().hex
+            _set_session_cookie(sign_session_key(key))
+        st.session_state.session_key = key
+    return key
+
+
+class Conversations(dict[str, PersistentHistory]):
+    """The session's stored message histories by agent name, opened on access."""
+
+    def __init__(self, session: str) -> None:
+        super().__init__()
+        self.session = session
+
+    def __missing__(self, agent_name: str) -> PersistentHistory:
+        conversation = f"{self.session}/{agent_name}"
+        history = PersistentHistory(state_backend().conversations, conversation)
+        self[agent_name] = history
+        return history
+
+
 class State:
     """Session state management."""
 
     async def initialize(self) -> None:
-        """Initialize all agents."""
-        if "agents" not in st.session_state:
-            # Initialize form agent
-            form_agent: StructuredAgent[None, FormData] = Agent(
-                name=FORM_AGENT_NAME,
-                model=MODEL_NAME,
-                system_prompt=CHAT_AGENT_SYS_PROMPT,
-                session=False,
-            ).to_structured(FormData)
-            await form_agent.__aenter__()
-
-            # Initialize chat agent
-            chat_agent = Agent[None](
-                name=CHAT_AGENT_NAME,
-                model=MODEL_NAME,
-                system_prompt=TICKET_CREATOR_SYS_PROMPT,
-                session=False,
+        """Initialize the session state and acquire the session's agents."""
+        key = session_key()
+        if "messages" not in st.session_state:
+            self._rehydrate(key)
+        if "ticket_cache" not in st.session_state:
+            st.session_state.ticket_cache = TTLCache[FormData](
+                maxsize=TICKET_CACHE_SESSION_SIZE
             )
-            await chat_agent.__aenter__()
+        if "ticket_outbox" not in st.session_state:
+            st.session_state.ticket_outbox = []
+        if "ticket_job" not in st.session_state:
+            st.session_state.ticket_job = None
+        if "documents" not in st.session_state:
+            st.session_state.documents = {}
+            st.session_state.ingest_jobs = {}
+            st.session_state.document_index = None
 
-            st.session_state.agents = {
-                form_agent.name: form_agent,
-                chat_agent.name: chat_agent,
-            }
+        runtime, created = await get_agent_pool().acquire(session_id())
+        if created:
+            self._restore_overlays(runtime)
 
-        if "form_data" not in st.session_state:
-            st.session_state.form_data = {field: "" for field in FormData.model_fields}
+    def _rehydrate(self, key: str) -> None:
+        """Restore form data, agent configuration, tools and conversations.
 
-        if "messages" not in st.session_state:
-            st.session_state.messages = defaultdict(list)
-        if "agent_tools" not in st.session_state:
-            st.session_state.agent_tools = defaultdict(list)
+        They may have been stored by another worker serving the session before.
+        """
+        snapshot = state_backend().load_session(key) or {}
+        st.session_state.form_data = snapshot.get("form_data") or dict.fromkeys(
+            FormData.model_fields, ""
+        )
+        st.session_state.agent_config = defaultdict(
+            dict, snapshot.get("agent_config", {})
+        )
+        st.session_state.agent_tools = defaultdict(list)
+        for name, config in self.agent_config.items():
+            specs = [
+                spec for spec in AVAILABLE_TOOLS if spec.key in config.get("tools", ())
+            ]
+            for spec in specs:
+                try:
+                    self.agent_tools[name].extend(load_tools(spec))
+                except ValueError:
+                    continue
+            # Preselect them in the tool selector (streambricks multiselect state)
+            st.session_state[f"multiselect_tools_{name}"] = [spec.label for spec in specs]
+        st.session_state.messages = Conversations(key)
+        st.session_state.saved_snapshot = snapshot
+
+    def save(self) -> None:
+        """Store form data and agent configuration in the backend, if changed."""
+        snapshot = {
+            "form_data": dict(self.form_data),
+            "agent_config": {
+                name: dict(config) for name, config in self.agent_config.items()
+            },
+        }
+        if snapshot != st.session_state.get("saved_snapshot"):
+            state_backend().save_session(session_key(), snapshot)
+            st.session_state.saved_snapshot = snapshot
+
+    def _restore_overlays(self, runtime: AgentRuntime) -> None:
+        """Re-apply the session's model, prompt, tools and history to fresh agents."""
+        for name, agent in runtime.agents.items():
+            config = self.agent_config.get(name, {})
+            if model := config.get("model"):
+                agent.set_model(shared_model(model))
+            if (prompt := config.get("system_prompt")) is not None:
+                agent.sys_prompts.prompts.clear()
+                agent.sys_prompts.prompts.append(prompt)
+            if tools := self.agent_tools.get(name):
+                sync_tools(agent, tools)
 
     @property
-    def messages(self) -> defaultdict[str, list[ChatMessage[Any]]]:
+    def messages(self) -> Conversations:
         """Get all agent messages, indexed by agent name."""
         return st.session_state.messages
 
@@ -72,24 +252,33 @@ class State:
     def agent_tools(self):
         return st.session_state.agent_tools
 
+    @property
+    def agent_config(self) -> defaultdict[str, dict[str, Any]]:
+        """Get per-agent config overrides (model, prompt, tools) of this session."""
+        return st.session_state.agent_config
+
     def clear_agent_messages(self, agent_name: str) -> None:
         """Clear messages for a specific agent."""
-        self.messages[agent_name] = []
+        self.messages[agent_name].clear()
 
     @property
     def agents(self) -> dict[str, AnyAgent[Any, Any]]:
         """Get the agents dictionary, keyed by agent name."""
-        return st.session_state.agents
+        runtime = get_agent_pool().get(session_id())
+        if runtime is None:
+            msg = "State.initialize() must be awaited before accessing agents"
+            raise RuntimeError(msg)
+        return runtime.agents
 
     @property
     def form_agent(self) -> StructuredAgent[None, FormData]:
         """Get the session's form processing agent."""
-        return st.session_state.agents[FORM_AGENT_NAME]
+        return self.agents[FORM_AGENT_NAME]  # type: ignore[return-value]
 
     @property
     def chat_agent(self) -> Agent[None]:
         """Get the session's chat agent."""
-        return st.session_state.agents[CHAT_AGENT_NAME]
+        return self.agents[CHAT_AGENT_NAME]  # type: ignore[return-value]
 
     @property
     def form_data(self) -> dict[str, str]:
@@ -100,12 +289,58 @@ class State:
     def form_data(self, value: dict[str, str]) -> None:
         """Set the current form data."""
         st.session_state.form_data = value
+        self.save()
 
     @property
-    def chat_messages(self) -> list[ChatMessage[Any]]:
+    def chat_messages(self) -> PersistentHistory:
         """Get the chat message history for the default chat agent."""
         return self.messages[CHAT_AGENT_NAME]
 
+    @property
+    def ticket_cache(self) -> TTLCache[FormData]:
+        """Get the session's extracted tickets, keyed by conversation hash."""
+        return st.session_state.ticket_cache
+
+    @property
+    def ticket_job(self) -> str | None:
+        """Get the id of the session's latest ticket extraction job."""
+        return st.session_state.ticket_job
+
+    @ticket_job.setter
+    def ticket_job(self, job_id: str | None) -> None:
+        """Set the id of the session's latest ticket extraction job."""
+        st.session_state.ticket_job = job_id
+
+    @property
+    def ticket_outbox(self) -> list[FormData]:
+        """Get the tickets queued for filing in Jira."""
+        return st.session_state.ticket_outbox
+
+    @property
+    def documents(self) -> dict[str, IngestedDocument]:
+        """Get the documents uploaded in this session, keyed by upload file id."""
+        return st.session_state.documents
+
+    @property
+    def ingest_jobs(self) -> dict[str, tuple[str, str]]:
+        """Get the conversion jobs of uploads as file id -> (file name, job id)."""
+        return st.session_state.ingest_jobs
+
+    def add_document(self, file_id: str, document: IngestedDocument) -> None:
+        """Store an ingested upload, invalidating the document index."""
+        self.documents[file_id] = document
+        st.session_state.document_index = None
+
+    @property
+    def document_index(self) -> BM25Index | None:
+        """Get the search index over all uploaded documents (built on demand)."""
+        from components.retrieval import BM25Index
+
+        if st.session_state.document_index is None and self.documents:
+            chunks = [chunk for doc in self.documents.values() for chunk in doc.chunks]
+            st.session_state.document_index = BM25Index.build(chunks)
+        return st.session_state.document_index
+
     @property
     def completed_form(self) -> FormData:
         """Get the completed form data."""
@@ -0,0 +1,194 @@
+"""Storage of session state shared by all worker processes."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import functools
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+from components.conversation_store import (
+    ConversationStore,
+    MemoryConversationStore,
+    RedisConversationStore,
+    SQLiteConversationStore,
+)
+from config import CONVERSATION_RETENTION, STATE_BACKEND_URL
+
+
+_SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class StateBackend(ABC):
+    """Session snapshots and conversations, rehydrated by any worker.
+
+    A snapshot is the JSON-serializable part of a session (form data and
+    agent configuration), keyed by the stable session key.
+    """
+
+    conversations: ConversationStore
+
+    @abstractmethod
+    def load_session(self, key: str) -> dict[str, Any] | None:
+        """Get the stored snapshot of a session."""
+
+    @abstractmethod
+    def save_session(self, key: str, data: dict[str, Any]) -> None:
+        """Store the snapshot of a session."""
+
+    @abstractmethod
+    def delete_session(self, key: str) -> None:
+        """Forget the snapshot of a session."""
+
+
+class MemoryBackend(StateBackend):
+    """Keeps everything in this process, for a single worker and tests."""
+
+    def __init__(self) -> None:
+        self.conversations = MemoryConversationStore()
+        self._sessions: dict[str, str] = {}
+
+    def load_session(self, key: str) -> dict[str, Any] | None:
+        data = self._sessions.get(key)
+        return None if data is None else json.loads(data)
+
+    def save_session(self, key: str, data: dict[str, Any]) -> None:
+        self._sessions[key] = json.dumps(data)
+
+    def delete_session(self, key: str) -> None:
+        self._sessions.pop(key, None)
+
+
+class SQLiteBackend(StateBackend):
+    """Keeps everything in one SQLite file, shared by the workers of a machine."""
+
+    def __init__(self, path: Path, *, retention: float = CONVERSATION_RETENTION) -> None:
+        self.path = path
+        self.retention = retention
+        self.conversations = SQLiteConversationStore(path, retention=retention)
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The SQLite connection, opened on first use."""
+        with self._lock:
+            if self._db is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(_SESSIONS_SCHEMA)
+                db.execute(
+                    "DELETE FROM sessions WHERE updated < ?",
+                    (time.time() - self.retention,),
+                )
+                db.commit()
+                self._db = db
+            return self._db
+
+    def load_session(self, key: str) -> dict[str, Any] | None:
+        db = self.db
+        with self._lock:
+            row = db.execute("SELECT data FROM sessions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_session(self, key: str, data: dict[str, Any]) -> None:
+        db = self.db
+        with self._lock:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (key, json.dumps(data), time.time()),
+            )
+            db.commit()
+
+    def delete_session(self, key: str) -> None:
+        db = self.db
+        with self._lock:
+            db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            db.commit()
+
+
+class RedisBackend(StateBackend):
+    """Keeps everything in Redis (or a compatible server), shared by all workers.
+
+    Args:
+        client: A `redis.Redis` compatible client, e.g. `fakeredis.FakeRedis()`
+                for a local stand-in
+        prefix: Prefix of all keys
+        retention: Seconds a session is kept without changes
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "chatbot",
+        retention: float = CONVERSATION_RETENTION,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.retention = retention
+        self.conversations = RedisConversationStore(
+            client, prefix=prefix, retention=retention
+        )
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> RedisBackend:
+        """Connect to a server, e.g. `redis://localhost:6379/0`."""
+        try:
+            import redis
+        except ImportError as e:
+            msg = "The Redis state backend requires the 'redis' package"
+            raise ImportError(msg) from e
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:session:{key}"
+
+    def load_session(self, key: str) -> dict[str, Any] | None:
+        data = self.client.get(self._key(key))
+        return None if data is None else json.loads(data)
+
+    def save_session(self, key: str, data: dict[str, Any]) -> None:
+        self.client.set(self._key(key), json.dumps(data), ex=int(self.retention))
+
+    def delete_session(self, key: str) -> None:
+        self.client.delete(self._key(key))
+
+
+def create_backend(url: str) -> StateBackend:
+    """Create the backend for a URL.
+
+    Supported are `memory://`, `sqlite:///path/to/file.sqlite3` and
+    `redis://` / `rediss://` URLs.
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    scheme = urlparse(url).scheme
+    match scheme:
+        case "memory":
+            return MemoryBackend()
+        case "sqlite":
+            return SQLiteBackend(Path(url.removeprefix("sqlite://").removeprefix("/")))
+        case "redis" | "rediss":
+            return RedisBackend.from_url(url)
+    msg = f"Unsupported state backend: {scheme or url}"
+    raise ValueError(msg)
+
+
+@functools.cache
+def state_backend() -> StateBackend:
+    """Get the process-wide state backend (see config.STATE_BACKEND_URL)."""
+    return create_backend(STATE_BACKEND_URL)
@@ -0,0 +1,233 @@
+"""Process-wide latency, token and cost metrics."""
+
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import json
+import logging
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from config import TELEMETRY_DIR, TELEMETRY_FLUSH_INTERVAL, TELEMETRY_WINDOW
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from llmling_agent import ChatMessage
+
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Raw events kept for the JSONL export while waiting for the next flush
+MAX_PENDING_EVENTS = 50_000
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def quantile(values: list[float], q: float) -> float:
+    """Nearest-rank quantile of sorted values."""
+    if not values:
+        return math.nan
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+class Summary:
+    """Count and sum of all observations, quantiles over a recent window."""
+
+    def __init__(self, window: int = TELEMETRY_WINDOW) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self) -> dict[float, float]:
+        values = sorted(self.recent)
+        return {q: quantile(values, q) for q in QUANTILES}
+
+
+class Metrics:
+    """Registry of latency summaries and usage counters.
+
+    Observations can be exported as Prometheus text and are appended to a
+    JSONL file by a background flusher, next to a Prometheus textfile
+    snapshot (for node_exporter's textfile collector).
+    """
+
+    def __init__(
+        self,
+        directory: Path = TELEMETRY_DIR,
+        flush_interval: float = TELEMETRY_FLUSH_INTERVAL,
+    ) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._summaries: defaultdict[str, dict[Labels, Summary]] = defaultdict(dict)
+        self._counters: defaultdict[str, defaultdict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._pending: deque[dict[str, Any]] = deque(maxlen=MAX_PENDING_EVENTS)
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a latency (or other distribution) observation."""
+        key = _labels(labels)
+        with self._lock:
+            if (summary := self._summaries[name].get(key)) is None:
+                summary = self._summaries[name][key] = Summary()
+            summary.observe(value)
+            self._pending.append({
+                "ts": time.time(),
+                "metric": name,
+                "value": value,
+                "labels": dict(key),
+            })
+        self._ensure_flusher()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Increase a counter."""
+        key = _labels(labels)
+        with self._lock:
+            self._counters[name][key] += value
+            self._pending.append({
+                "ts": time.time(),
+                "metric": name,
+                "inc": value,
+                "labels": dict(key),
+            })
+        self._ensure_flusher()
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summaries(self) -> list[dict[str, Any]]:
+        """Get count, mean and quantiles of every summary series."""
+        with self._lock:
+            items = [
+                (name, labels, summary.count, summary.sum, summary.quantiles())
+                for name, series in self._summaries.items()
+                for labels, summary in series.items()
+            ]
+        return [
+            {
+                "metric": name,
+                **dict(labels),
+                "count": count,
+                "mean": total / count if count else math.nan,
+                **{f"p{round(q * 100)}": value for q, value in quantiles.items()},
+            }
+            for name, labels, count, total, quantiles in sorted(items)
+        ]
+
+    def counters(self) -> list[dict[str, Any]]:
+        """Get the value of every counter series."""
+        with self._lock:
+            return [
+                {"metric": name, **dict(labels), "value": value}
+                for name, series in sorted(self._counters.items())
+                for labels, value in sorted(series.items())
+            ]
+
+    def prometheus_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self._summaries.items()):
+                lines.append(f"# TYPE {name} summary")
+                for labels, summary in sorted(series.items()):
+                    for q, value in summary.quantiles().items():
+                        lines.append(
+                            f"{name}{_format_labels(labels, quantile=str(q))} {value}"
+                        )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {summary.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+            for name, counter in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(
+                    f"{name}{_format_labels(labels)} {value}"
+                    for labels, value in sorted(counter.items())
+                )
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """Append pending events to the JSONL file and rewrite the .prom snapshot."""
+        with self._lock:
+            events = list(self._pending)
+            self._pending.clear()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if events:
+            with (self.directory / "events.jsonl").open("a", encoding="utf-8") as file:
+                file.writelines(json.dumps(event) + "\n" for event in events)
+        prom_path = self.directory / "metrics.prom"
+        tmp_path = prom_path.with_suffix(".tmp")
+        tmp_path.write_text(self.prometheus_text(), encoding="utf-8")
+        tmp_path.replace(prom_path)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_forever, name="telemetry-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_forever(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Failed to flush telemetry")
+
+
+metrics = Metrics()
+
+
+def record_usage(agent_name: str, model: str | None, message: ChatMessage[Any]) -> None:
+    """Count the tokens and cost of a model response."""
+    if not message.cost_info:
+        return
+    labels: dict[str, str] = {"agent": agent_name, "model": model or "unknown"}
+    usage = message.cost_info.token_usage
+    for kind, tokens in (
+        ("prompt", usage["prompt"]),
+        ("completion", usage["completion"]),
+        ("total", usage["total"]),
+    ):
+        metrics.inc("chatbot_llm_tokens_total", float(tokens), kind=kind, **labels)
+    metrics.inc(
+        "chatbot_llm_cost_usd_total", float(message.cost_info.total_cost), **labels
+    )
+    metrics.inc("chatbot_llm_responses_total", 1.0, **labels)
@@ -0,0 +1,237 @@
+"""Ticket extraction from chat conversations, run as background jobs."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from pydantic_ai.exceptions import AgentRunError
+import streamlit as st
+
+from components.agent_pool import shared_model
+from components.cache import TTLCache, hash_key
+from components.context import ContextBuilder
+from components.jobs import job_scheduler
+from components.llm_scheduler import Priority, llm_context
+from components.state import state
+from components.telemetry import metrics, record_usage
+from config import (
+    TICKET_CACHE_SHARED,
+    TICKET_CACHE_SHARED_SIZE,
+    TICKET_CACHE_TTL,
+    TICKET_ESCALATION_MODELS,
+    TICKET_ESCALATION_TOKENS,
+    TICKET_REQUIRED_FIELDS,
+    TICKET_SPECULATIVE_DELAY,
+)
+from utils import session_id, session_loops
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from llmling_agent import ChatMessage, StructuredAgent
+
+    from components.jobs import Job
+    from config import FormData
+
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def shared_ticket_cache() -> TTLCache[FormData]:
+    """Process-wide ticket cache shared by all sessions."""
+    return TTLCache(maxsize=TICKET_CACHE_SHARED_SIZE, ttl=TICKET_CACHE_TTL)
+
+
+def ticket_cache_key(
+    agent: StructuredAgent[None, FormData],
+    chat_messages: Sequence[ChatMessage],
+) -> str:
+    """Hash everything the extracted ticket depends on."""
+    sys_prompts = [str(prompt) for prompt in agent.sys_prompts.prompts]
+    history = [(msg.role, str(msg.content)) for msg in chat_messages]
+    return hash_key(agent.model_name, sys_prompts, history)
+
+
+def ticket_tiers(agent: StructuredAgent[None, FormData]) -> list[str | None]:
+    """Models of the extraction cascade, cheapest first.
+
+    None stands for the agent's own model (see TICKET_ESCALATION_MODELS),
+    escalation models which it already is are skipped.
+    """
+    own = agent.model_name
+    escalation = [
+        name
+        for name in TICKET_ESCALATION_MODELS
+        if own not in {name, name.split(":", 1)[-1]}
+    ]
+    return [None, *escalation]
+
+
+def missing_fields(ticket: FormData) -> list[str]:
+    """Get the required ticket fields which were left empty."""
+    return [name for name in TICKET_REQUIRED_FIELDS if not getattr(ticket, name).strip()]
+
+
+async def _extract_with(
+    agent: StructuredAgent[None, FormData],
+    model: str | None,
+    chat_messages: Sequence[ChatMessage],
+) -> FormData:
+    """Extract a ticket with one model of the cascade."""
+    model_name = model or agent.model_name
+    # Format chat history into a single text which fits the model's budget
+    context = ContextBuilder.for_model(model_name)
+    chat_text = await context.build(chat_messages)
+
+    # Add instructions for ticket creation
+    prompt = (
+        "Based on the following chat conversation, create a ticket for our ticket system. "
+        "Extract relevant information like the issue, priority, and any important details. "
+        f"\n\nCHAT HISTORY:\n{chat_text}\n\n"
+        "Please create a structured ticket with appropriate fields."
+    )
+
+    # Process with the agent (earlier extractions must not end up in later prompts)
+    labels = {"agent": agent.name, "model": model_name or "unknown"}
+    override = shared_model(model) if model else None
+    with metrics.timer("chatbot_ticket_extraction_seconds", **labels):
+        result = await agent.run(prompt, store_history=False, model=override)
+    record_usage(agent.name, model_name, result)
+    return result.content  # This is a FormData instance
+
+
+def _count_tier(
+    agent: StructuredAgent[None, FormData], model: str | None, tier: int, reason: str
+) -> None:
+    model_name = model or agent.model_name or "unknown"
+    metrics.inc(
+        "chatbot_ticket_tier_total", tier=str(tier), model=model_name, reason=reason
+    )
+
+
+async def process_chat_history(
+    agent: StructuredAgent[None, FormData],
+    chat_messages: Sequence[ChatMessage],
+) -> FormData:
+    """Process the chat history and create a ticket summary.
+
+    The cheapest model answers first. A stronger one takes over if the
+    request fails or the ticket misses a required field, long chats go to
+    the strongest model right away. The answering tier is recorded in the
+    chatbot_ticket_tier_total metric.
+    """
+    tiers = ticket_tiers(agent)
+    strongest = len(tiers) - 1
+    context = ContextBuilder.for_model(agent.model_name)
+    input_tokens = sum(context.count(msg) for msg in chat_messages)
+    start, reason = 0, "default"
+    if input_tokens > TICKET_ESCALATION_TOKENS and strongest:
+        start, reason = strongest, "long_input"
+    for tier in range(start, strongest):
+        model_name = tiers[tier] or agent.model_name
+        try:
+            ticket = await _extract_with(agent, tiers[tier], chat_messages)
+        except AgentRunError as e:
+            logger.warning("Ticket extraction with %s failed: %s", model_name, e)
+            reason = "error"
+            continue
+        if missing := missing_fields(ticket):
+            logger.info("Ticket of %s misses %s, escalating", model_name, missing)
+            reason = "incomplete"
+            continue
+        _count_tier(agent, tiers[tier], tier, reason)
+        return ticket
+    # The strongest model's ticket is taken as it is, its errors are raised
+    ticket = await _extract_with(agent, tiers[strongest], chat_messages)
+    _count_tier(agent, tiers[strongest], strongest, reason)
+    return ticket
+
+
+def cached_ticket(key: str) -> FormData | None:
+    """Look up an extracted ticket in the session cache, then the shared one.
+
+    Copies are returned so that form edits never leak into cached entries.
+    """
+    ticket = state.ticket_cache.get(key)
+    if ticket is None and TICKET_CACHE_SHARED:
+        ticket = shared_ticket_cache().get(key)
+        if ticket is not None:
+            state.ticket_cache.set(key, ticket)
+    return None if ticket is None else ticket.model_copy()
+
+
+async def extract_ticket(
+    agent: StructuredAgent[None, FormData],
+    chat_messages: Sequence[ChatMessage],
+    key: str,
+    session_cache: TTLCache[FormData],
+    session: str,
+) -> FormData:
+    """Run the extraction and store the ticket in both caches (job body).
+
+    The model requests queue behind the chat requests of all sessions.
+    """
+    with llm_context(priority=Priority.BACKGROUND, session=session):
+        ticket = await process_chat_history(agent, chat_messages)
+    session_cache.set(key, ticket)
+    if TICKET_CACHE_SHARED:
+        shared_ticket_cache().set(key, ticket)
+    return ticket
+
+
+def _job_key(key: str) -> str:
+    return f"ticket:{session_id()}:{key}"
+
+
+def current_ticket_job(
+    agent: StructuredAgent[None, FormData],
+    chat_messages: Sequence[ChatMessage],
+) -> Job | None:
+    """Get the session's latest extraction job, if it is for this conversation."""
+    if state.ticket_job is None:
+        return None
+    job = job_scheduler().get(state.ticket_job)
+    if job is None or job.key != _job_key(ticket_cache_key(agent, chat_messages)):
+        return None
+    return job
+
+
+def submit_ticket_job(
+    agent: StructuredAgent[None, FormData],
+    chat_messages: Sequence[ChatMessage],
+    *,
+    speculative: bool = False,
+) -> Job:
+    """Start extracting the ticket of a conversation in the background.
+
+    Submissions for the same conversation share one job. A job for an older
+    state of the conversation is cancelled, its ticket would be outdated.
+
+    Args:
+        agent: The ticket creation agent
+        chat_messages: Conversation to extract the ticket from
+        speculative: Whether the ticket was not asked for yet; the job then
+                     only starts once the chat stayed idle for a moment, and
+                     after the requested jobs of all sessions
+    """
+    key = ticket_cache_key(agent, chat_messages)
+    # Snapshot, the history grows while the job waits
+    messages = list(chat_messages)
+    session_cache = state.ticket_cache
+    session = session_id()
+    scheduler = job_scheduler()
+    job = scheduler.submit(
+        _job_key(key),
+        lambda: extract_ticket(agent, messages, key, session_cache, session),
+        loop_thread=session_loops.get(session),
+        kind="ticket",
+        delay=TICKET_SPECULATIVE_DELAY if speculative else 0.0,
+        speculative=speculative,
+    )
+    if (previous := state.ticket_job) and previous != job.id:
+        scheduler.cancel(previous)
+    state.ticket_job = job.id
+    return job
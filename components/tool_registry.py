@@ -0,0 +1,121 @@
+"""Lazily constructed agent tools."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import functools
+import logging
+from typing import TYPE_CHECKING, Any
+
+from components.cache import hash_key
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Sequence
+
+    from llmling_agent import AnyAgent, Tool
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Cheap description of a tool group, built only once it is selected."""
+
+    key: str
+    """Stable identifier of the tool group."""
+
+    label: str
+    """Label shown in the tool selector."""
+
+    description: str
+    """Short description shown in the tool selector."""
+
+    factory: Callable[[], Iterable[Tool]]
+    """Function creating the tools (importing heavy modules locally)."""
+
+    side_effects: bool = False
+    """Whether the tools change external state (calls are never cached or shared)."""
+
+
+# Names of loaded tools with side effects
+_side_effect_tools: set[str] = set()
+
+
+@functools.cache
+def load_tools(spec: ToolSpec) -> tuple[Tool, ...]:
+    """Build the tools of a spec (once per process).
+
+    Identical concurrent calls of tools without side effects are coalesced
+    across sessions.
+
+    Raises:
+        ValueError: If the tools cannot be created (e.g. missing API keys)
+    """
+    from components.single_flight import coalesce_tool
+
+    tools = tuple(spec.factory())
+    for tool in tools:
+        cache_schema(tool)
+        if not spec.side_effects:
+            coalesce_tool(tool)
+    if spec.side_effects:
+        _side_effect_tools.update(tool.name for tool in tools)
+    logger.info("Created %d tools for %s", len(tools), spec.key)
+    return tools
+
+
+def cache_schema(tool: Tool) -> None:
+    """Compute the JSON schema of a tool once and serve it from memory afterwards.
+
+    `Tool.schema` otherwise re-inspects signature and docstring on every
+    access. Registering a tool on an agent keeps the underlying callable
+    tool, so all sessions share the cached schema.
+    """
+    llm_tool = tool.callable
+    schema = llm_tool.get_schema()
+    llm_tool.get_schema = lambda: schema  # type: ignore[method-assign]
+
+
+def has_side_effects(tools: Iterable[Tool]) -> bool:
+    """Check whether any of the tools belongs to a spec with side effects."""
+    return any(tool.name in _side_effect_tools for tool in tools)
+
+
+def toolset_version(tools: Iterable[Tool]) -> str:
+    """Get a stable id for a set of tools, derived from their schemas."""
+    schemas = sorted((tool.schema for tool in tools), key=lambda s: s["function"]["name"])
+    return hash_key(schemas)[:12]
+
+
+def sync_tools(agent: AnyAgent[Any, Any], tools: Sequence[Tool]) -> str:
+    """Register exactly the given tools on an agent, only touching changes.
+
+    Tools which are already registered (same name and underlying callable)
+    are kept as they are.
+
+    Returns:
+        Version id of the resulting tool set
+    """
+    wanted = {tool.name: tool for tool in tools}
+    removed = [
+        name
+        for name, tool in agent.tools.items()
+        if name not in wanted or tool.callable is not wanted[name].callable
+    ]
+    for name in removed:
+        del agent.tools[name]
+    added = [tool for name, tool in wanted.items() if name not in agent.tools]
+    for tool in added:
+        agent.tools.register_tool(tool)
+    version = toolset_version(agent.tools.values())
+    if removed or added:
+        logger.info(
+            "Tool set of %s is now %s (+%d / -%d tools)",
+            agent.name,
+            version,
+            len(added),
+            len(removed),
+        )
+    return version
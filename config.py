@@ -2,15 +2,101 @@
 
 from __future__ import annotations
 
-from llmling_agent import Tool
-from llmling_agent_tools import serper_search
-from llmling_agent_tools.jira_tool import jira_tools
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 from pydantic import BaseModel, ConfigDict
 
+from components.tool_registry import ToolSpec
+
+
+if TYPE_CHECKING:
+    from llmling_agent import Tool
+    from tokonomics.model_discovery import ProviderType
+
+
+BIRD_SPEC_PATH = Path(__file__).parent / "bird_openapi.yml"
+
+
+# Tool factories, called by the registry only once a tool gets selected
+
+
+def web_search_tools() -> list[Tool]:
+    """Create the web search tool."""
+    from llmling_agent import Tool
+    from llmling_agent_tools import serper_search
+
+    return [Tool.from_callable(serper_search.SerperTool().search)]
+
+
+def jira_search_tools() -> list[Tool]:
+    """Create the Jira search tool."""
+    from llmling_agent import Tool
+
+    from components.jira_gateway import search_for_issues
+
+    return [Tool.from_callable(search_for_issues)]
+
+
+def jira_create_tools() -> list[Tool]:
+    """Create the Jira issue creation tool."""
+    from llmling_agent import Tool
+
+    from components.jira_gateway import create_issue
+
+    return [Tool.from_callable(create_issue)]
+
+
+def docs_search_tools() -> list[Tool]:
+    """Create the local document search tool."""
+    from llmling_agent import Tool
+
+    from components.retrieval import search_docs
+
+    return [Tool.from_callable(search_docs)]
 
-search_tool = Tool.from_callable(serper_search.SerperTool().search)
-create_issue_tool = Tool.from_callable(jira_tools.create_issue)
-search_jira_tool = Tool.from_callable(jira_tools.search_for_issues)
+
+def bird_api_tools() -> list[Tool]:
+    """Create one tool per BIRD API operation."""
+    from components.openapi_tools import openapi_tools
+
+    return openapi_tools(BIRD_SPEC_PATH)
+
+
+AVAILABLE_TOOLS = (
+    ToolSpec(
+        key="web_search",
+        label="Web Search",
+        description="Search the web for information",
+        factory=web_search_tools,
+    ),
+    ToolSpec(
+        key="jira_search",
+        label="Jira Search",
+        description="Search for issues in Jira",
+        factory=jira_search_tools,
+    ),
+    ToolSpec(
+        key="jira_create_issue",
+        label="Jira Create Issue",
+        description="Create a new issue in Jira",
+        factory=jira_create_tools,
+        side_effects=True,
+    ),
+    ToolSpec(
+        key="docs_search",
+        label="Docs Search",
+        description="Search the local reference documents",
+        factory=docs_search_tools,
+    ),
+    ToolSpec(
+        key="bird_api",
+        label="BIRD API",
+        description="Query entities, attributes and mappings of the ECB BIRD",
+        factory=bird_api_tools,
+    ),
+)
 
 
 class FormData(BaseModel):
@@ -53,3 +139,148 @@ FORM_FIELDS = {
     "constraints": "Einschränkungen",
     "additional_info": "Weitere Informationen",
 }
+
+# Ticket extraction cache: per-session entries and the process-wide tier
+TICKET_CACHE_SESSION_SIZE = 16
+TICKET_CACHE_SHARED = True
+TICKET_CACHE_SHARED_SIZE = 512
+TICKET_CACHE_TTL = 60 * 60 * 6
+
+# Token budgets for chat history passed to agents, per model (without provider prefix)
+DEFAULT_CONTEXT_BUDGET = 8_000
+CONTEXT_BUDGETS = {
+    "openai/gpt-4o-mini": 16_000,
+    "openai/gpt-4o": 32_000,
+}
+
+# Model catalog for the model selector, refreshed in the background after the TTL
+MODEL_PROVIDERS: tuple[ProviderType, ...] = ("openrouter",)
+MODEL_CATALOG_TTL = 60 * 60 * 12
+
+# Jira gateway: cached searches (keyed by normalized JQL) and paginated field projection
+JIRA_SEARCH_CACHE_TTL = 60 * 5
+JIRA_SEARCH_CACHE_SIZE = 256
+JIRA_SEARCH_LIMIT = 50
+JIRA_PAGE_SIZE = 50
+JIRA_SEARCH_FIELDS = (
+    "summary",
+    "issuetype",
+    "status",
+    "priority",
+    "assignee",
+    "reporter",
+    "created",
+    "duedate",
+    "description",
+    "labels",
+    "comment",
+    "issuelinks",
+)
+
+# Telemetry: quantile window per series and export directory (JSONL events + .prom file)
+TELEMETRY_WINDOW = 2048
+TELEMETRY_FLUSH_INTERVAL = 30
+TELEMETRY_DIR = Path(
+    os.getenv("TELEMETRY_DIR", Path(__file__).parent / ".cache" / "telemetry")
+)
+# Token unlocking the telemetry page (pages/admin.py), alternatively set as
+# telemetry_admin_token in .streamlit/secrets.toml; without one the page stays locked
+TELEMETRY_ADMIN = os.getenv("TELEMETRY_ADMIN") or None
+
+# Chat response cache: memory (LRU) and SQLite tiers. The optional semantic tier
+# matches prompts above the similarity threshold which also share their numbers and
+# negations (None disables it)
+CHAT_CACHE_TTL = 60 * 60 * 24
+CHAT_CACHE_SIZE = 512
+CHAT_CACHE_DISK_SIZE = 20_000
+CHAT_CACHE_SEMANTIC_THRESHOLD: float | None = None
+CHAT_CACHE_PATH = Path(
+    os.getenv("CHAT_CACHE_PATH", Path(__file__).parent / ".cache" / "responses.sqlite3")
+)
+
+# Upload ingestion: conversion worker processes and chunk limit per document
+INGEST_WORKERS = 2
+INGEST_MAX_CHUNKS = 5000
+
+# Background jobs: concurrently running jobs (process-wide) and how many of them may be
+# speculative (the rest stay free for requested work), finished jobs kept for polling
+# and the poll interval of pages waiting for a job
+JOB_WORKERS = 4
+JOB_SPECULATIVE_WORKERS = 2
+JOB_HISTORY_SIZE = 1024
+JOB_RESULT_TTL = 60 * 60
+JOB_POLL_INTERVAL = 1.0
+
+# Speculative ticket extraction once the chat is idle for the given seconds
+TICKET_SPECULATIVE = True
+TICKET_SPECULATIVE_DELAY = 5.0
+
+# Ticket extraction cascade: the form agent's model answers first, the escalation models
+# (comma separated, strongest last) take over after errors or incomplete tickets, and
+# chats above the token threshold go to the strongest model directly
+TICKET_ESCALATION_MODELS = tuple(
+    name.strip()
+    for name in os.getenv("TICKET_ESCALATION_MODELS", "openrouter:openai/gpt-4o").split(
+        ","
+    )
+    if name.strip()
+)
+TICKET_ESCALATION_TOKENS = 6_000
+TICKET_REQUIRED_FIELDS = ("title", "description")
+
+# Conversation store: SQLite file, messages kept in memory per conversation (older ones
+# are paged in), tool results above the threshold (bytes) stored compressed out of line
+# and conversations deleted after the retention (seconds without new messages)
+CONVERSATION_DB_PATH = Path(
+    os.getenv(
+        "CONVERSATION_DB_PATH", Path(__file__).parent / ".cache" / "conversations.sqlite3"
+    )
+)
+CONVERSATION_HOT_WINDOW = 100
+CONVERSATION_PAGE_SIZE = 50
+CONVERSATION_PAYLOAD_THRESHOLD = 2048
+CONVERSATION_RETENTION = 60 * 60 * 24 * 30
+
+# Session state shared by all workers: memory://, sqlite:///<path> (one machine) or
+# redis://host:port/db
+STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", f"sqlite:///{CONVERSATION_DB_PATH}")
+
+# Cookie carrying the stable session key, signed with SESSION_SECRET. All workers need
+# the same secret; without one it is generated into SESSION_SECRET_PATH, which only the
+# workers of one machine share
+SESSION_COOKIE = "chatbot_session"
+SESSION_COOKIE_MAX_AGE = CONVERSATION_RETENTION
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_SECRET_PATH = Path(__file__).parent / ".cache" / "session_secret"
+
+# LLM admission control: concurrent requests (process-wide), request rates as
+# (requests per minute, burst) per provider or model (unlisted models get the default),
+# and retries of rate limited requests with jittered exponential backoff (seconds)
+LLM_MAX_CONCURRENCY = 16
+LLM_RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "openrouter": (600, 60),
+}
+LLM_DEFAULT_RATE_LIMIT = (120, 20)
+LLM_MAX_RETRIES = 4
+LLM_RETRY_BASE = 1.0
+LLM_RETRY_MAX = 30.0
+
+# Tool call coalescing: identical calls of tools without side effects share one
+# request, results are reused for the TTL and errors for the error TTL (0 disables)
+TOOL_FLIGHT_TTL = 60.0
+TOOL_FLIGHT_ERROR_TTL = 10.0
+TOOL_FLIGHT_CACHE_SIZE = 512
+
+# Hedged chat requests (opt-in by naming the hedge model, which may be the chat model
+# itself): without a first token after the recent p95 time to first token since
+# admission by the LLM scheduler (clamped, the default until enough samples exist) a
+# duplicate request is sent unless requests are queued, the first to stream wins; at
+# most the budget of hedges per minute
+CHAT_HEDGE_MODEL = os.getenv("CHAT_HEDGE_MODEL") or None
+CHAT_HEDGE_QUANTILE = 0.95
+CHAT_HEDGE_DELAY = 2.0
+CHAT_HEDGE_MIN_DELAY = 0.5
+CHAT_HEDGE_MAX_DELAY = 10.0
+CHAT_HEDGE_MIN_SAMPLES = 20
+CHAT_HEDGE_WINDOW = 200
+CHAT_HEDGE_BUDGET = 30
@@ -25,6 +25,26 @@ def test(ctx, *args: str):
     ctx.run(f"uv run pytest{args_str}")
 
 
+@duty(capture=False)
+def bench(ctx, *args: str):
+    """Run the headless benchmarks and compare them against the baselines."""
+    args_str = " " + " ".join(args) if args else ""
+    ctx.run(f"uv run python -m benchmarks{args_str}")
+
+
+@duty(capture=False)
+def batch_tickets(ctx, *args: str):
+    """Extract tickets from a JSONL file of chat transcripts (see scripts/)."""
+    args_str = " " + " ".join(args) if args else ""
+    ctx.run(f"uv run python -m scripts.batch_tickets{args_str}")
+
+
+@duty(capture=False)
+def docs_index(ctx):
+    """Rebuild the search index over the reference documents in docs/."""
+    ctx.run("uv run python -m components.retrieval")
+
+
 @duty(capture=False)
 def clean(ctx):
     """Clean all files from the Git directory except checked-in files."""
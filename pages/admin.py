@@ -0,0 +1,79 @@
+"""Latency and usage metrics of the running app."""
+
+from __future__ import annotations
+
+import hmac
+
+import streamlit as st
+
+from components.telemetry import metrics
+from config import TELEMETRY_ADMIN
+
+
+def admin_token() -> str | None:
+    """Get the token unlocking the page (environment first, then secrets)."""
+    if TELEMETRY_ADMIN:
+        return TELEMETRY_ADMIN
+    try:
+        return st.secrets.get("telemetry_admin_token") or None
+    except FileNotFoundError:  # no secrets.toml
+        return None
+
+
+def require_admin() -> None:
+    """Stop the script unless this session entered the admin token."""
+    if st.session_state.get("telemetry_admin"):
+        return
+    if (token := admin_token()) is None:
+        st.error("Die Telemetrie ist nicht freigeschaltet (TELEMETRY_ADMIN fehlt).")
+        st.stop()
+    entered = st.text_input("Admin-Token", type="password")
+    if not entered:
+        st.stop()
+    if not hmac.compare_digest(entered.encode(), token.encode()):
+        st.error("Ungültiges Token.")
+        st.stop()
+    st.session_state.telemetry_admin = True
+    st.rerun()
+
+
+def main() -> None:
+    """Render the telemetry overview."""
+    st.title("📊 Telemetrie")
+    require_admin()
+
+    if st.button("Aktualisieren", use_container_width=True):
+        st.rerun()
+
+    st.subheader("Latenzen (Sekunden)")
+    if summaries := metrics.summaries():
+        st.dataframe(summaries, use_container_width=True, hide_index=True)
+    else:
+        st.info("Noch keine Messwerte vorhanden.")
+
+    st.subheader("Tokens und Kosten")
+    if counters := metrics.counters():
+        st.dataframe(counters, use_container_width=True, hide_index=True)
+    else:
+        st.info("Noch keine Modellantworten gezählt.")
+
+    text = metrics.prometheus_text()
+    with st.expander("Prometheus-Export"):
+        st.code(text, language="text")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "metrics.prom herunterladen",
+            text,
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True,
+        )
+    with col2:
+        if st.button("Jetzt exportieren", use_container_width=True):
+            metrics.flush()
+            st.success(f"Exportiert nach {metrics.directory}")
+
+
+if __name__ == "__main__":
+    main()
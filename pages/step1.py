@@ -2,20 +2,104 @@
 
 from __future__ import annotations
 
-import asyncio
+import functools
 from typing import TYPE_CHECKING
 
 from llmling_agent import ChatMessage
 import streamlit as st
 
-from components.chat_view import render_tool_call
+from components.chat import record_messages, stream_response
+from components.chat_view import render_history, render_tool_call
+from components.context import ContextBuilder
+from components.ingest import UPLOAD_TYPES, ingest_upload
+from components.jobs import job_scheduler
+from components.response_cache import response_cache
+from components.retrieval import format_passages
 from components.sidebar import render_agent_sidebar
-from components.state import state
+from components.state import CHAT_AGENT_NAME, state
+from components.telemetry import metrics
+from components.tickets import submit_ticket_job
+from config import JOB_POLL_INTERVAL, TICKET_SPECULATIVE
+from utils import run_sync, session_id, session_loops
 
 
 if TYPE_CHECKING:
+    from llmling_agent import Agent
     from llmling_agent.tools.tool_call_info import ToolCallInfo
 
+    from components.ingest import IngestedDocument
+
+
+# Passages of uploaded documents added to each prompt
+DOCUMENT_PASSAGES = 3
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_ingest_progress(job_ids: tuple[str, ...]) -> None:
+    """Poll the conversion jobs of uploads, rerunning the page once one finished."""
+    jobs = [job_scheduler().get(job_id) for job_id in job_ids]
+    if any(job is None or job.done for job in jobs):
+        st.rerun(scope="app")
+    st.info(f"{len(jobs)} Dokument(e) werden verarbeitet...")
+
+
+def collect_documents(agent: Agent[None]) -> None:
+    """Add finished uploads to the session and summarize them in the conversation."""
+    for file_id, (name, job_id) in list(state.ingest_jobs.items()):
+        job = job_scheduler().get(job_id)
+        if job is None or job.status == "cancelled":
+            del state.ingest_jobs[file_id]
+        elif job.status == "done":
+            del state.ingest_jobs[file_id]
+            document: IngestedDocument = job.result
+            state.add_document(file_id, document)
+            summary = ChatMessage[str](
+                content=document.summary(), role="user", name="upload"
+            )
+            record_messages(agent, [summary])
+        elif job.status == "failed":
+            # Kept, so the upload isn't converted again on every rerun
+            st.error(f"{name} konnte nicht gelesen werden: {job.error!s}")
+
+
+def ingest_uploads(agent: Agent[None]) -> None:
+    """Convert new uploads in background jobs and add the finished ones."""
+    with st.expander("📎 Dokumente", expanded=not state.documents):
+        uploads = st.file_uploader(
+            "Dokumente hochladen",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+        )
+    session = session_id()
+    for upload in uploads or []:
+        if upload.file_id in state.documents or upload.file_id in state.ingest_jobs:
+            continue
+        job = job_scheduler().submit(
+            f"ingest:{session}:{upload.file_id}",
+            functools.partial(ingest_upload, upload, upload.name),
+            loop_thread=session_loops.get(session),
+            kind="ingest",
+        )
+        state.ingest_jobs[upload.file_id] = (upload.name, job.id)
+    collect_documents(agent)
+    if pending := [
+        job_id
+        for _, job_id in state.ingest_jobs.values()
+        if (ingest_job := job_scheduler().get(job_id)) and not ingest_job.done
+    ]:
+        render_ingest_progress(tuple(pending))
+
+
+def retrieve_passages(prompt: str) -> str | None:
+    """Get the passages of the uploaded documents best matching a prompt."""
+    if (index := state.document_index) is None:
+        return None
+    if results := index.search(prompt, limit=DOCUMENT_PASSAGES):
+        return "Auszüge aus hochgeladenen Dokumenten:\n\n" + format_passages(
+            chunk for _, chunk in results
+        )
+    return None
+
 
 async def main_async() -> None:
     """Async main function for the chat interface."""
@@ -28,7 +112,7 @@ async def main_async() -> None:
     with col2:
         if st.button("Neue Unterhaltung", use_container_width=True):
             # Clear chat history for now (NOOP otherwise)
-            state.clear_agent_messages(state.chat_agent.name)
+            state.clear_agent_messages(CHAT_AGENT_NAME)
             st.rerun()  # Refresh the page to show empty chat
 
     await state.initialize()
@@ -37,37 +121,42 @@ async def main_async() -> None:
     # Configure the chat agent
     chat_agent = state.chat_agent
     render_agent_sidebar(chat_agent)
+    ingest_uploads(chat_agent)
 
     # Display chat history
-    for message in state.chat_messages:
-        with st.chat_message(message.role):
-            st.markdown(message.content)
-            for tool_call in message.tool_calls:
-                render_tool_call(st, tool_call)
+    with metrics.timer("chatbot_render_seconds", view=CHAT_AGENT_NAME):
+        render_history(state.chat_messages, key=CHAT_AGENT_NAME)
 
     # Chat input
     if prompt := st.chat_input("Ihre Frage..."):
-        # Add user message to chat history
-        chat_message = ChatMessage(content=prompt, role="user")
-        state.chat_messages.append(chat_message)
-
-        # Display user message
+        # Display user message (user and assistant messages are recorded
+        # to the chat history while streaming)
         with st.chat_message("user"):
             st.markdown(prompt)
 
         try:
             with st.chat_message("assistant"):
-                # Stream the response
-                with st.spinner("Denke nach..."):
+                message_placeholder = st.empty()
 
-                    def render(call: ToolCallInfo):
-                        render_tool_call(st, call)
+                def render(call: ToolCallInfo):
+                    render_tool_call(st, call)
 
-                    chat_agent.tool_used.connect(render)
-                    full_response = await chat_agent.run(prompt)
-                    st.markdown(full_response.content)
-                    chat_agent.tool_used.disconnect(render)
-                state.chat_messages.append(full_response)
+                # Stream the response
+                with st.spinner("Denke nach..."):
+                    await stream_response(
+                        chat_agent,
+                        prompt,
+                        message_placeholder,
+                        on_tool_call=render,
+                        context=ContextBuilder.for_model(chat_agent.model_name),
+                        # Answers depend on the uploads, so don't share them
+                        cache=None if state.documents else response_cache(),
+                        retrieve=retrieve_passages,
+                    )
+
+            # Prepare the ticket while the user reads the answer
+            if TICKET_SPECULATIVE:
+                submit_ticket_job(state.form_agent, state.chat_messages, speculative=True)
 
         except Exception as e:  # noqa: BLE001
             error_msg = f"Ein Fehler ist aufgetreten: {e!s}"
@@ -76,7 +165,7 @@ async def main_async() -> None:
 
 def main() -> None:
     """Main entry point for the chat interface."""
-    asyncio.run(main_async())
+    run_sync(main_async())
 
 
 if __name__ == "__main__":
@@ -3,40 +3,105 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import streamlit as st
 
+from components.jobs import job_scheduler
 from components.primitives import render_model_form
 from components.sidebar import render_agent_sidebar
 from components.state import state
+from components.tickets import (
+    cached_ticket,
+    current_ticket_job,
+    submit_ticket_job,
+    ticket_cache_key,
+)
+from config import JOB_POLL_INTERVAL
+from utils import run_sync
 
 
 if TYPE_CHECKING:
-    from llmling_agent import ChatMessage, StructuredAgent
-
     from config import FormData
 
 
-async def process_chat_history(
-    agent: StructuredAgent[None, FormData],
-    chat_messages: list[ChatMessage],
-) -> FormData:
-    """Process the chat history and create a ticket summary."""
-    # Format chat history into a single text
-    chat_text = "\n\n".join(f"{msg.role.upper()}: {msg.content}" for msg in chat_messages)
-
-    # Add instructions for ticket creation
-    prompt = (
-        "Based on the following chat conversation, create a ticket for our ticket system. "
-        "Extract relevant information like the issue, priority, and any important details. "
-        f"\n\nCHAT HISTORY:\n{chat_text}\n\n"
-        "Please create a structured ticket with appropriate fields."
+# Labels of the job states shown while waiting for the ticket
+JOB_STATUS_LABELS = {
+    "pending": "in Warteschlange",
+    "running": "läuft",
+}
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_progress(job_id: str) -> None:
+    """Poll a ticket extraction job, rerunning the page once it finished."""
+    job = job_scheduler().get(job_id)
+    if job is None or job.status == "done":
+        st.rerun(scope="app")
+    elif job.status == "failed":
+        st.error(f"Ticket konnte nicht erstellt werden: {job.error!s}")
+        if st.button("Erneut versuchen", use_container_width=True):
+            state.ticket_job = None
+            st.rerun(scope="app")
+    elif job.status == "cancelled":
+        st.info("Ticketerstellung abgebrochen.")
+        if st.button("Neu starten", use_container_width=True):
+            state.ticket_job = None
+            st.rerun(scope="app")
+    else:
+        status = JOB_STATUS_LABELS[job.status]
+        st.info(f"Ticket wird erstellt... ({status}, {job.elapsed:.0f} s)")
+        if st.button("Abbrechen", use_container_width=True):
+            job_scheduler().cancel(job_id)
+            st.rerun(scope="fragment")
+
+
+def format_ticket(ticket: FormData) -> str:
+    """Format a ticket as plain text."""
+    return (
+        f"Title: {ticket.title}\n\n"
+        f"Description: {ticket.description}\n\n"
+        f"Requirements: {ticket.requirements}\n\n"
+        f"Constraints: {ticket.constraints}\n\n"
+        f"Additional Info: {ticket.additional_info}"
     )
 
-    # Process with the agent
-    result = await agent.run(prompt)
-    return result.content  # This is a FormData instance
+
+def jira_fields(ticket: FormData) -> dict[str, Any]:
+    """Map a ticket to Jira issue fields."""
+    return {
+        "summary": ticket.title or "Neues Ticket",
+        "description": format_ticket(ticket),
+        "issuetype": {"name": "Task"},
+    }
+
+
+async def file_tickets(tickets: list[FormData]) -> None:
+    """Create queued tickets in Jira with one bulk request.
+
+    Created tickets are removed from the list, failed ones stay queued.
+    """
+    from jira import JIRAError
+
+    from components.jira_gateway import jira_gateway
+
+    fields = [jira_fields(ticket) for ticket in tickets]
+    try:
+        results = await asyncio.to_thread(jira_gateway().create_issues, fields)
+    except JIRAError as e:
+        st.error(f"Tickets konnten nicht angelegt werden: {e.text or e}")
+        return
+    created = [result["issue"] for result in results if result["issue"]]
+    failed = [
+        (ticket, result["error"])
+        for ticket, result in zip(tickets, results, strict=True)
+        if not result["issue"]
+    ]
+    tickets[:] = [ticket for ticket, _ in failed]
+    if created:
+        st.success(f"Angelegt: {', '.join(created)}")
+    for ticket, error in failed:
+        st.error(f"{ticket.title or 'Ticket'}: {error}")
 
 
 async def main_async() -> None:
@@ -59,30 +124,41 @@ async def main_async() -> None:
             st.switch_page("pages/step1.py")
         return
 
-    # Create ticket based on chat history
-    with st.spinner("Ticket wird erstellt..."):
-        ticket_data = await process_chat_history(ticket_creator, chat_messages)
+    # Create ticket based on chat history, in the background unless cached
+    ticket_data = cached_ticket(ticket_cache_key(ticket_creator, chat_messages))
+    if ticket_data is None:
+        # Failed / cancelled jobs are only restarted on request
+        job = current_ticket_job(ticket_creator, chat_messages)
+        if job is None or job.status not in {"failed", "cancelled"}:
+            job = submit_ticket_job(ticket_creator, chat_messages)
+        render_job_progress(job.id)
+        if st.button("Zurück zum Chat", use_container_width=True):
+            st.switch_page("pages/step1.py")
+        return
 
     # Display and edit the form
     st.subheader("Generiertes Ticket")
     updated_ticket = render_model_form(ticket_data)
 
     # Download option (convert to text for download)
-    ticket_text = (
-        f"Title: {updated_ticket.title}\n\n"
-        f"Description: {updated_ticket.description}\n\n"
-        f"Requirements: {updated_ticket.requirements}\n\n"
-        f"Constraints: {updated_ticket.constraints}\n\n"
-        f"Additional Info: {updated_ticket.additional_info}"
-    )
-
     st.download_button(
         label="Ticket als Text herunterladen",
-        data=ticket_text,
+        data=format_ticket(updated_ticket),
         file_name="ticket.txt",
         mime="text/plain",
     )
 
+    # Queue tickets and file them in Jira together
+    outbox = state.ticket_outbox
+    queue_col, file_col = st.columns(2)
+    if queue_col.button("Ticket vormerken", use_container_width=True):
+        outbox.append(updated_ticket.model_copy())
+    if outbox and file_col.button(
+        f"Vorgemerkte Tickets in Jira anlegen ({len(outbox)})",
+        use_container_width=True,
+    ):
+        await file_tickets(outbox)
+
     # Back button
     if st.button("Zurück zum Chat", use_container_width=True):
         st.switch_page("pages/step1.py")
@@ -90,7 +166,7 @@ async def main_async() -> None:
 
 def main() -> None:
     """Main entry point for the ticket creation interface."""
-    asyncio.run(main_async())
+    run_sync(main_async())
 
 
 if __name__ == "__main__":
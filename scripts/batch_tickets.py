@@ -0,0 +1,358 @@
+"""Extract tickets from archived chat transcripts, without the Streamlit UI.
+
+Reads a JSONL file with one transcript per line, either as chat messages
+
+    {"id": "42", "messages": [{"role": "user", "content": "..."}, ...]}
+
+or as plain text fields (e.g. the "title" and "body" of an exported request),
+which become a single user message. Tickets are extracted with the same
+cascade as on step 2 and appended to a JSONL file, which doubles as the
+checkpoint: a rerun skips transcripts that already have a ticket and retries
+failed ones. A CSV mirror of the results can be written alongside.
+
+    python -m scripts.batch_tickets transcripts.jsonl tickets.jsonl --csv tickets.csv
+    python -m scripts.batch_tickets transcripts.jsonl tickets.jsonl --fake
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+from pathlib import Path
+import sys
+import time
+from typing import TYPE_CHECKING, Any, TextIO
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from llmling_agent import ChatMessage, StructuredAgent
+
+    from config import FormData
+
+
+logger = logging.getLogger(__name__)
+
+ID_FIELDS = ("id", "request_id", "conversation_id")
+TEXT_FIELDS = ("title", "body", "transcript", "text", "content")
+DEFAULT_CONCURRENCY = 8
+
+
+@dataclass
+class Transcript:
+    """One archived conversation."""
+
+    id: str
+    messages: list[ChatMessage[str]]
+
+
+def parse_transcript(record: dict[str, Any], line_number: int) -> Transcript:
+    """Convert an input record into chat messages.
+
+    Raises:
+        ValueError: If the record has neither messages nor text fields
+    """
+    from llmling_agent import ChatMessage
+
+    transcript_id = next(
+        (str(record[name]) for name in ID_FIELDS if record.get(name) is not None),
+        f"line-{line_number}",
+    )
+    if raw_messages := record.get("messages"):
+        messages = [
+            ChatMessage[str](
+                content=str(msg.get("content", "")),
+                role=msg.get("role", "user"),
+                name=msg.get("name"),
+            )
+            for msg in raw_messages
+        ]
+    elif texts := [str(record[name]) for name in TEXT_FIELDS if record.get(name)]:
+        messages = [ChatMessage[str](content="\n\n".join(texts), role="user")]
+    else:
+        msg = f"Line {line_number}: no messages or text fields"
+        raise ValueError(msg)
+    return Transcript(id=transcript_id, messages=messages)
+
+
+def read_transcripts(path: Path) -> Iterator[tuple[int, dict[str, Any] | None]]:
+    """Stream the input records with their line numbers (None if unparsable)."""
+    with path.open(encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Line %d of %s is not valid JSON", line_number, path)
+                yield line_number, None
+
+
+def load_results(path: Path) -> dict[str, dict[str, Any]]:
+    """Read the results of an earlier run (the latest one per transcript).
+
+    A line cut short by a crash is removed, so appending continues cleanly.
+    """
+    if not path.exists():
+        return {}
+    data = path.read_bytes()
+    if data and not data.endswith(b"\n"):
+        complete = data[: data.rfind(b"\n") + 1]
+        path.write_bytes(complete)
+        data = complete
+    results = {}
+    for line in data.decode("utf-8").splitlines():
+        if line.strip():
+            result = json.loads(line)
+            results[result["id"]] = result
+    return results
+
+
+class CsvMirror:
+    """CSV copy of the results, rebuilt from the finished JSONL results on resume."""
+
+    def __init__(self, path: Path, results: dict[str, dict[str, Any]]) -> None:
+        from config import FORM_FIELDS
+
+        self.columns = ["id", *FORM_FIELDS, "error"]
+        self._file: TextIO = path.open("w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, self.columns)
+        self._writer.writeheader()
+        for result in results.values():
+            self.write(result)
+
+    def write(self, result: dict[str, Any]) -> None:
+        row = {"id": result["id"], "error": result.get("error", "")}
+        row.update(result.get("ticket") or {})
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@dataclass
+class Stats:
+    """Progress of a batch run."""
+
+    started: float = field(default_factory=time.perf_counter)
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    durations: list[float] = field(default_factory=list)
+
+    def report(self) -> str:
+        """Summarize throughput, latencies, tokens and cost."""
+        from components.telemetry import metrics, quantile
+
+        elapsed = time.perf_counter() - self.started
+        tokens: dict[str, float] = {}
+        cost = 0.0
+        tiers: dict[str, float] = {}
+        for counter in metrics.counters():
+            match counter["metric"]:
+                case "chatbot_llm_tokens_total":
+                    kind = counter["kind"]
+                    tokens[kind] = tokens.get(kind, 0) + counter["value"]
+                case "chatbot_llm_cost_usd_total":
+                    cost += counter["value"]
+                case "chatbot_ticket_tier_total":
+                    tier = f"{counter['tier']} ({counter['model']})"
+                    tiers[tier] = tiers.get(tier, 0) + counter["value"]
+        durations = sorted(self.durations)
+        processed = self.done + self.failed
+        rate = processed / elapsed if elapsed else 0.0
+        lines = [
+            (
+                f"Tickets:     {self.done} extracted, {self.failed} failed, "
+                f"{self.skipped} skipped (done earlier)"
+            ),
+            f"Elapsed:     {elapsed:.1f}s, {rate:.2f} transcripts/s",
+        ]
+        if durations:
+            lines.append(
+                f"Latency:     p50 {quantile(durations, 0.5):.2f}s, "
+                f"p95 {quantile(durations, 0.95):.2f}s, max {durations[-1]:.2f}s"
+            )
+        lines.append(
+            "Tokens:      "
+            + (", ".join(f"{int(v)} {k}" for k, v in sorted(tokens.items())) or "n/a")
+        )
+        lines.append(f"Cost:        ${cost:.4f}")
+        if self.done:
+            lines.append(f"Cost/ticket: ${cost / self.done:.5f}")
+        lines.extend(
+            f"Tier {tier}: {int(count)}" for tier, count in sorted(tiers.items())
+        )
+        return "\n".join(lines)
+
+
+async def _extract(
+    agent: StructuredAgent[None, FormData],
+    transcript: Transcript,
+) -> FormData:
+    from components.llm_scheduler import Priority, llm_context
+    from components.tickets import process_chat_history
+
+    with llm_context(priority=Priority.BACKGROUND, session=transcript.id):
+        return await process_chat_history(agent, transcript.messages)
+
+
+async def run_batch(
+    input_path: Path,
+    output_path: Path,
+    *,
+    csv_path: Path | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    limit: int | None = None,
+) -> Stats:
+    """Extract the tickets of all transcripts not done in an earlier run.
+
+    Args:
+        input_path: JSONL file with one transcript per line
+        output_path: JSONL file the results are appended to
+        csv_path: Optional CSV file mirroring the results
+        concurrency: Number of extractions running at once
+        limit: Maximum number of transcripts to process in this run
+    """
+    from components.state import create_form_agent
+
+    # Failed transcripts are retried, so only finished ones are carried over
+    finished = {
+        key: result
+        for key, result in load_results(output_path).items()
+        if "ticket" in result
+    }
+    mirror = CsvMirror(csv_path, finished) if csv_path else None
+    stats = Stats()
+    queue: asyncio.Queue[Transcript | None] = asyncio.Queue(maxsize=concurrency * 2)
+
+    output = output_path.open("a", encoding="utf-8")
+
+    def write(result: dict[str, Any]) -> None:
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        if mirror:
+            mirror.write(result)
+
+    async def produce() -> None:
+        queued = 0
+        for line_number, record in read_transcripts(input_path):
+            if limit is not None and queued >= limit:
+                break
+            if record is None:
+                stats.failed += 1
+                continue
+            try:
+                transcript = parse_transcript(record, line_number)
+            except ValueError as e:
+                logger.warning("%s", e)
+                stats.failed += 1
+                continue
+            if transcript.id in finished:
+                stats.skipped += 1
+                continue
+            await queue.put(transcript)
+            queued += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work() -> None:
+        agent = await create_form_agent()
+        try:
+            while (transcript := await queue.get()) is not None:
+                start = time.perf_counter()
+                try:
+                    ticket = await _extract(agent, transcript)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("Transcript %s failed: %s", transcript.id, e)
+                    write({"id": transcript.id, "error": f"{type(e).__name__}: {e}"})
+                    stats.failed += 1
+                    continue
+                stats.durations.append(time.perf_counter() - start)
+                write({"id": transcript.id, "ticket": ticket.model_dump()})
+                stats.done += 1
+                if stats.done % 100 == 0:
+                    logger.info("%d tickets extracted", stats.done)
+        finally:
+            await agent.__aexit__(None, None, None)
+
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        output.close()
+        if mirror:
+            mirror.close()
+    return stats
+
+
+def _use_fake_model(latency: float) -> None:
+    """Answer all model requests with the scripted benchmark model."""
+    from benchmarks.fake_llm import MODEL_NAME
+
+    # Read by the components at import time
+    os.environ["CHATBOT_MODEL"] = MODEL_NAME
+    os.environ["TICKET_ESCALATION_MODELS"] = MODEL_NAME
+
+    from benchmarks.fake_llm import FakeLLM, FakeLLMConfig
+    from components.agent_pool import register_model
+
+    register_model(MODEL_NAME, FakeLLM(FakeLLMConfig(latency=latency)).model())
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the batch extraction."""
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.batch_tickets",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "input", type=Path, help="JSONL file with one transcript per line"
+    )
+    parser.add_argument("output", type=Path, help="JSONL file receiving the tickets")
+    parser.add_argument(
+        "--csv", type=Path, help="Also write the tickets to this CSV file"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Extractions running at once (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument("--limit", type=int, help="Process at most this many transcripts")
+    parser.add_argument(
+        "--fake", action="store_true", help="Use the scripted fake model (offline)"
+    )
+    parser.add_argument(
+        "--fake-latency", type=float, default=0.3, help="Fake model latency (seconds)"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    if args.fake:
+        _use_fake_model(args.fake_latency)
+    if not args.input.exists():
+        parser.error(f"Input file not found: {args.input}")
+
+    stats = asyncio.run(
+        run_batch(
+            args.input,
+            args.output,
+            csv_path=args.csv,
+            concurrency=args.concurrency,
+            limit=args.limit,
+        )
+    )
+    print(stats.report())
+    return 1 if stats.failed and not stats.done else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from streamlit.testing.v1 import AppTest
+
+import config
+
+
+if TYPE_CHECKING:
+    import pytest
+
+
+PAGE = "pages/admin.py"
+
+
+def test_page_is_locked_without_token(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "TELEMETRY_ADMIN", None)
+    app = AppTest.from_file(PAGE).run()
+    assert app.error[0].value.startswith("Die Telemetrie ist nicht freigeschaltet")
+    assert not app.text_input
+    assert not app.dataframe
+
+
+def test_page_requires_the_token(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "TELEMETRY_ADMIN", "s3cret")
+    app = AppTest.from_file(PAGE).run()
+    assert not app.subheader
+
+    app.text_input[0].input("wrong").run()
+    assert app.error[0].value == "Ungültiges Token."
+    assert not app.subheader
+
+    app.text_input[0].input("s3cret").run()
+    assert not app.exception
+    assert app.subheader[0].value == "Latenzen (Sekunden)"
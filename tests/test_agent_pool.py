@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from components.agent_pool import AgentPool, AgentRuntime
+from utils import LoopThread
+
+
+class FakeAgent:
+    """Agent recording the loop it was closed on."""
+
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.closed_on: asyncio.AbstractEventLoop | None = None
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.closed_on = asyncio.get_running_loop()
+
+
+class Pool:
+    """An agent pool with one fake agent per runtime, recording evictions."""
+
+    def __init__(self) -> None:
+        self.agents: list[FakeAgent] = []
+        self.evicted: list[str] = []
+        self.pool = AgentPool(self.create, on_evict=self.evicted.append)
+
+    async def create(self) -> AgentRuntime:
+        agent = FakeAgent()
+        self.agents.append(agent)
+        return AgentRuntime(agents={"fake": agent})  # type: ignore[dict-item]
+
+
+@pytest.fixture
+def pool() -> Pool:
+    return Pool()
+
+
+async def test_release_on_the_own_loop_evicts_the_session(pool: Pool):
+    await pool.pool.acquire("a")
+    await pool.pool.release("a")
+    assert pool.agents[0].closed_on is asyncio.get_running_loop()
+    assert pool.evicted == ["a"]
+    assert len(pool.pool) == 0
+
+
+async def test_runtimes_are_closed_on_their_loop(pool: Pool):
+    loop_thread = LoopThread(name="test-agent-pool")
+    try:
+        future = loop_thread.submit(pool.pool.acquire("a"))
+        await asyncio.wrap_future(future)
+        pool.pool.max_idle = 0
+        assert await pool.pool.evict_idle() == 1
+        assert pool.agents[0].closed_on is loop_thread.loop
+        assert pool.evicted == ["a"]
+    finally:
+        loop_thread.stop()
+        loop_thread.thread.join(timeout=5)
+
+
+async def test_runtimes_of_stopped_loops_are_dropped(pool: Pool):
+    loop_thread = LoopThread(name="test-agent-pool")
+    future = loop_thread.submit(pool.pool.acquire("a"))
+    await asyncio.wrap_future(future)
+    loop_thread.stop()
+    loop_thread.thread.join(timeout=5)
+    await pool.pool.release("a")
+    assert pool.agents[0].closed_on is None
+    assert pool.evicted == ["a"]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+ROOT = Path(__file__).parent.parent
+TIMEOUT = 120
+
+TRANSCRIPTS = [
+    {
+        "id": "1",
+        "title": "Dokumentationspflichten",
+        "body": "Was muss ich dokumentieren?",
+    },
+    {"request_id": "2", "text": "Welche Pflichten gelten für Anbieter?"},
+    {
+        "id": "3",
+        "messages": [
+            {"role": "user", "content": "Ist mein System ein Hochrisiko-System?"},
+            {"role": "assistant", "content": "Das hängt vom Einsatzbereich ab."},
+        ],
+    },
+]
+
+
+@pytest.fixture
+def paths(tmp_path: Path) -> dict[str, Path]:
+    transcripts = tmp_path / "transcripts.jsonl"
+    transcripts.write_text(
+        "".join(json.dumps(record) + "\n" for record in TRANSCRIPTS), encoding="utf-8"
+    )
+    return {
+        "input": transcripts,
+        "output": tmp_path / "tickets.jsonl",
+        "csv": tmp_path / "tickets.csv",
+    }
+
+
+def start_batch(paths: dict[str, Path], tmp_path: Path) -> subprocess.Popen[str]:
+    """Run the batch script with the fake model, one transcript at a time."""
+    env = {
+        **os.environ,
+        "TELEMETRY_DIR": str(tmp_path / "telemetry"),
+        "CHAT_CACHE_PATH": str(tmp_path / "responses.sqlite3"),
+        "CONVERSATION_DB_PATH": str(tmp_path / "conversations.sqlite3"),
+        "XDG_DATA_HOME": str(tmp_path / "data"),
+    }
+    command = [
+        sys.executable,
+        "-m",
+        "scripts.batch_tickets",
+        str(paths["input"]),
+        str(paths["output"]),
+        "--csv",
+        str(paths["csv"]),
+        "--concurrency",
+        "1",
+        "--fake",
+        "--fake-latency",
+        "0.5",
+    ]
+    return subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+
+
+def read_lines(path: Path) -> list[dict[str, object]]:
+    if not path.exists():
+        return []
+    text = path.read_text(encoding="utf-8")
+    return [
+        json.loads(line) for line in text.splitlines(keepends=True) if line.endswith("\n")
+    ]
+
+
+def test_killed_batch_resumes(paths: dict[str, Path], tmp_path: Path):
+    process = start_batch(paths, tmp_path)
+    deadline = time.monotonic() + TIMEOUT
+    while not read_lines(paths["output"]):
+        assert process.poll() is None, process.communicate()[0]
+        assert time.monotonic() < deadline, "no ticket extracted in time"
+        time.sleep(0.05)
+    process.kill()
+    process.wait()
+    (first,) = read_lines(paths["output"])
+    assert first["id"] == "1"
+    assert "ticket" in first
+    # A result cut short by the crash
+    with paths["output"].open("a", encoding="utf-8") as file:
+        file.write('{"id": "2", "tick')
+
+    process = start_batch(paths, tmp_path)
+    output, _ = process.communicate(timeout=TIMEOUT)
+    assert process.returncode == 0, output
+    assert "2 extracted, 0 failed, 1 skipped" in output
+
+    results = read_lines(paths["output"])
+    assert [result["id"] for result in results] == ["1", "2", "3"]
+    assert all("ticket" in result for result in results)
+    assert paths["output"].read_text(encoding="utf-8").endswith("\n")
+    with paths["csv"].open(encoding="utf-8", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert sorted(row["id"] for row in rows) == ["1", "2", "3"]
+    assert not any(row["error"] for row in rows)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from dataclasses import asdict, replace
+import json
+import sys
+from types import ModuleType
+
+import pytest
+
+from benchmarks.runner import BASELINE_DIR, SCENARIOS, compare, run_scenario
+
+
+def test_short_scenario_runs(monkeypatch: pytest.MonkeyPatch):
+    # AppTest leaves the last page as __main__, spawned workers would import it
+    # (and the configuration) before the session's environment is set
+    monkeypatch.setitem(sys.modules, "__main__", ModuleType("__main__"))
+    scenario = replace(SCENARIOS["smoke"], sessions=1, turns=1)
+    result = run_scenario("smoke", scenario)
+    metrics = result["metrics"]
+    assert metrics["throughput_turns_per_second"] > 0
+    assert metrics["throughput_tokens_per_second"] > 0
+    assert metrics["ttft_seconds_p50"] > 0
+    assert compare(result, result) == []
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_scenarios_have_baselines(name: str):
+    baseline = json.loads((BASELINE_DIR / f"{name}.json").read_text(encoding="utf-8"))
+    assert baseline["config"] == json.loads(json.dumps(asdict(SCENARIOS[name])))
+
+
+def test_compare_reports_regressions():
+    baseline = {
+        "metrics": {
+            "chat_turn_seconds_p95": 1.0,
+            "home_seconds_p95": 0.001,
+            "throughput_turns_per_second": 2.0,
+        }
+    }
+    result = {
+        "metrics": {
+            "chat_turn_seconds_p95": 1.5,
+            "home_seconds_p95": 0.004,
+            "throughput_turns_per_second": 1.0,
+        }
+    }
+    assert compare(result, baseline) == [
+        "chat_turn_seconds_p95: 1 -> 1.5 (+50%)",
+        "throughput_turns_per_second: 2 -> 1 (+50%)",
+    ]
+    assert compare(result, baseline, tolerance=0.6) == []
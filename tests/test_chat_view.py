@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from llmling_agent import ChatMessage
+from llmling_agent.messaging.messages import TokenCost
+
+from components.chat_view import format_message
+
+
+def test_format_message_reflects_updates():
+    msg = ChatMessage[str](content="Antwort", role="assistant", model="gpt-4o-mini")
+    assert format_message(msg) == ("Antwort", "Model: gpt-4o-mini")
+    # Cost info is attached after streaming, under the same message id
+    usage = {"total": 1200, "prompt": 1000, "completion": 200}
+    msg.cost_info = TokenCost(token_usage=usage, total_cost=0.0125)  # type: ignore[arg-type]
+    msg.content = "Antwort, ergänzt"
+    content, footer = format_message(msg)
+    assert content == "Antwort, ergänzt"
+    assert footer == "Model: gpt-4o-mini | Cost: $0.0125 | Tokens: 1,200"
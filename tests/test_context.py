@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from llmling_agent import ChatMessage
+import pytest
+
+from components.context import ContextBuilder, agent_summarizer
+from components.conversation_store import MemoryConversationStore, PersistentHistory
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from components.context import Summarizer
+
+
+class CountingStore(MemoryConversationStore):
+    """Records how many messages get loaded."""
+
+    loaded = 0
+
+    def load(self, conversation: str, start: int, stop: int) -> list[ChatMessage[Any]]:
+        messages = super().load(conversation, start, stop)
+        self.loaded += len(messages)
+        return messages
+
+
+def recording_summarizer(calls: list[list[str]], prefix: str = "") -> Summarizer:
+    async def summarize(previous: str, messages: Sequence[ChatMessage[Any]]) -> str:
+        contents = [str(msg.content) for msg in messages]
+        calls.append(contents)
+        return " ".join([previous or prefix, *contents]).strip()
+
+    return summarize
+
+
+class FakeAgent:
+    """Agent answering summary prompts with its name."""
+
+    def __init__(self, name: str, model_name: str) -> None:
+        self.name = name
+        self.model_name = model_name
+        self.runs = 0
+
+    async def run(self, prompt: str, **kwargs: Any) -> ChatMessage[str]:
+        self.runs += 1
+        return ChatMessage[str](content=self.name, role="assistant")
+
+
+@pytest.fixture
+def history() -> PersistentHistory:
+    history = PersistentHistory(CountingStore(), "s/Dieter", hot_window=10)
+    roles = ("user", "assistant")
+    history.extend(
+        ChatMessage[str](content=f"turn {i}", role=roles[i % 2]) for i in range(200)
+    )
+    return history
+
+
+async def test_compact_summarizes_turns_beyond_the_hot_window(
+    history: PersistentHistory,
+):
+    calls: list[list[str]] = []
+    summarizer = recording_summarizer(calls)
+    builder = ContextBuilder(max_tokens=60, keep_recent=2, summarizer=summarizer)
+    summary, *recent = await builder.compact(history)
+    assert summary.role == "system"
+    assert "turn 0 turn 1" in str(summary.content)
+    assert len(recent) < len(history.tail(history.hot_window))
+    assert recent[-1].content == "turn 199"
+    (first_call,) = calls
+    assert len(first_call) == len(history) - len(recent)
+
+
+async def test_compact_only_loads_what_aged_out(history: PersistentHistory):
+    calls: list[list[str]] = []
+    summarizer = recording_summarizer(calls)
+    builder = ContextBuilder(max_tokens=60, keep_recent=2, summarizer=summarizer)
+    await builder.compact(history)
+    history.store.loaded = 0
+    history.extend(
+        ChatMessage[str](content=f"turn {i}", role="user") for i in range(200, 202)
+    )
+    summary, *recent = await builder.compact(history)
+    first, second = calls
+    assert second == [f"turn {i}" for i in range(len(first), 202 - len(recent))]
+    assert "turn 0 turn 1" in str(summary.content)
+    # New turns are in memory, the cut moved inside the hot window
+    assert history.store.loaded == 0
+
+
+async def test_compact_keeps_histories_within_budget():
+    messages = [ChatMessage[str](content=f"turn {i}", role="user") for i in range(3)]
+    builder = ContextBuilder(max_tokens=1000, summarizer=recording_summarizer([]))
+    assert await builder.compact(messages) == messages
+
+
+async def test_summaries_are_cached_per_summarizer(history: PersistentHistory):
+    first = ContextBuilder(max_tokens=60, summarizer=recording_summarizer([], "A:"))
+    second = ContextBuilder(max_tokens=60, summarizer=recording_summarizer([], "B:"))
+    summary, *_ = await first.compact(history)
+    assert "\nA: turn 0" in str(summary.content)
+    summary, *_ = await second.compact(history)
+    assert "\nB: turn 0" in str(summary.content)
+
+
+async def test_agent_summaries_are_shared_across_turns(history: PersistentHistory):
+    agent = FakeAgent("Zusammenfasser", "openai:gpt-4o-mini")
+    other = FakeAgent("Anderer", "openai:gpt-4o-mini")
+    for summarizing in (agent, agent, other):
+        builder = ContextBuilder(
+            max_tokens=60,
+            summarizer=agent_summarizer(summarizing),  # type: ignore[arg-type]
+        )
+        summary, *_ = await builder.compact(history)
+        assert summarizing.name in str(summary.content)
+    assert agent.runs == 1
+    assert other.runs == 1
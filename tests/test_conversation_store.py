@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any
+
+from llmling_agent import ChatMessage, ToolCallInfo
+from llmling_agent.messaging.messages import TokenCost
+import pytest
+
+from components.conversation_store import (
+    ConversationStore,
+    MemoryConversationStore,
+    RedisConversationStore,
+    SQLiteConversationStore,
+    dump_message,
+    load_message,
+)
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+fakeredis = pytest.importorskip("fakeredis")
+
+THRESHOLD = 100
+LARGE = {"rows": [f"Zeile {i}" for i in range(50)]}
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request: pytest.FixtureRequest, tmp_path: Path) -> ConversationStore:
+    match request.param:
+        case "memory":
+            return MemoryConversationStore(payload_threshold=THRESHOLD)
+        case "sqlite":
+            return SQLiteConversationStore(
+                tmp_path / "conversations.sqlite3", payload_threshold=THRESHOLD
+            )
+    return RedisConversationStore(fakeredis.FakeRedis(), payload_threshold=THRESHOLD)
+
+
+def with_tool_result(content: str, result: Any) -> ChatMessage[str]:
+    call = ToolCallInfo(
+        tool_name="search",
+        args={"query": content},
+        result=result,
+        agent_name="Dieter",
+        tool_call_id=f"call-{content}",
+        message_id="",
+    )
+    return ChatMessage[str](content=content, role="assistant", tool_calls=[call])
+
+
+def digest(result: Any) -> str:
+    raw = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def referenced(store: ConversationStore, conversation: str, result: Any) -> bool:
+    """Whether the store still keeps (and renews) an out of line result."""
+    if isinstance(store, RedisConversationStore):
+        refs = store.client.smembers(store._key(conversation, "payloads"))
+        return digest(result).encode() in refs
+    return store._payload(digest(result)) is not None
+
+
+def test_dump_and_load_round_trip():
+    payloads: dict[str, bytes] = {}
+
+    def store_payload(raw: bytes) -> str:
+        payloads["ref"] = raw
+        return "ref"
+
+    usage = {"total": 30, "prompt": 20, "completion": 10}
+    msg = with_tool_result("Frage", LARGE)
+    msg.tool_calls.append(
+        ToolCallInfo(
+            tool_name="lookup",
+            args={},
+            result="klein",
+            agent_name="Dieter",
+            tool_call_id="call-small",
+            message_id="",
+        )
+    )
+    msg.cost_info = TokenCost(token_usage=usage, total_cost=0.25)  # type: ignore[arg-type]
+    msg.metadata = {"source": "test"}
+    msg.response_time = 1.5
+    data = dump_message(msg, store_payload, threshold=THRESHOLD)
+    assert "Zeile 0" not in data
+    restored = load_message(data, payloads.__getitem__)
+    assert restored.message_id == msg.message_id
+    assert restored.timestamp == msg.timestamp
+    assert restored.content == "Frage"
+    assert [call.result for call in restored.tool_calls] == [LARGE, "klein"]
+    assert restored.cost_info == msg.cost_info
+    assert restored.metadata == {"source": "test"}
+    assert restored.response_time == 1.5
+
+
+def test_structured_content_round_trip():
+    msg = ChatMessage[Any](content={"title": "Ticket"}, role="assistant")
+    restored = load_message(dump_message(msg, lambda raw: ""), lambda ref: b"")
+    assert restored.content == {"title": "Ticket"}
+
+
+def test_append_and_load(store: ConversationStore):
+    messages = [ChatMessage[str](content=f"turn {i}", role="user") for i in range(5)]
+    assert [store.append("c", msg) for msg in messages] == list(range(5))
+    assert store.count("c") == 5
+    assert [msg.content for msg in store.load("c", 1, 3)] == ["turn 1", "turn 2"]
+    assert store.position("c", messages[3].message_id) == 3
+    assert store.position("c", "unknown") is None
+    assert store.count("other") == 0
+
+
+def test_large_tool_results_are_stored_out_of_line(store: ConversationStore):
+    store.append("a", with_tool_result("a", LARGE))
+    store.append("b", with_tool_result("b", LARGE))
+    (loaded,) = store.load("a", 0, 1)
+    assert loaded.tool_calls[0].result == LARGE
+    assert referenced(store, "a", LARGE)
+
+    store.clear("a")
+    assert store.count("a") == 0
+    # Still referenced by the other conversation
+    assert store.load("b", 0, 1)[0].tool_calls[0].result == LARGE
+
+
+def test_update_releases_replaced_payloads(store: ConversationStore):
+    msg = with_tool_result("a", LARGE)
+    store.append("a", msg)
+    other = {"rows": [f"Andere Zeile {i}" for i in range(50)]}
+    msg.tool_calls[0].result = other
+    assert store.update("a", msg)
+    assert store.load("a", 0, 1)[0].tool_calls[0].result == other
+    assert referenced(store, "a", other)
+    assert not referenced(store, "a", LARGE)
+    assert not store.update("a", ChatMessage[str](content="neu", role="user"))
+
+
+def test_truncate_releases_payloads(store: ConversationStore):
+    first = ChatMessage[str](content="turn 0", role="user")
+    dropped = with_tool_result("dropped", LARGE)
+    for msg in (first, dropped):
+        store.append("a", msg)
+    store.truncate("a", 1)
+    assert [msg.content for msg in store.load("a", 0, 10)] == ["turn 0"]
+    assert store.position("a", dropped.message_id) is None
+    assert not referenced(store, "a", LARGE)
+    assert store.append("a", ChatMessage[str](content="turn 1", role="user")) == 1
+
+
+def test_sqlite_appends_of_workers_get_distinct_positions(tmp_path: Path):
+    path = tmp_path / "conversations.sqlite3"
+    workers = [SQLiteConversationStore(path) for _ in range(4)]
+
+    def append(i: int) -> int:
+        msg = ChatMessage[str](content=f"turn {i}", role="user")
+        return workers[i % len(workers)].append("c", msg)
+
+    with ThreadPoolExecutor(4) as executor:
+        positions = list(executor.map(append, range(40)))
+    assert sorted(positions) == list(range(40))
+
+
+def test_sqlite_prunes_stale_conversations(tmp_path: Path):
+    path = tmp_path / "conversations.sqlite3"
+    store = SQLiteConversationStore(path, payload_threshold=THRESHOLD)
+    store.append("a", with_tool_result("a", LARGE))
+    restarted = SQLiteConversationStore(path, retention=-1)
+    assert restarted.count("a") == 0
+    assert restarted._payload(digest(LARGE)) is None
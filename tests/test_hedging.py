@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from pydantic_ai.messages import ModelRequest, UserPromptPart
+from pydantic_ai.models import ModelRequestParameters
+from pydantic_ai.models.function import FunctionModel
+import pytest
+
+from components import hedging, llm_scheduler as scheduler_module
+from components.hedging import HedgedModel
+from components.llm_scheduler import LLMScheduler, ScheduledModel
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from pydantic_ai.messages import ModelMessage
+    from pydantic_ai.models.function import AgentInfo
+
+
+DELAY = 0.1
+
+
+@pytest.fixture
+def scheduler(monkeypatch: pytest.MonkeyPatch) -> LLMScheduler:
+    scheduler = LLMScheduler(1, rate_limits={}, default_rate_limit=(6000, 100))
+    monkeypatch.setattr(scheduler_module, "llm_scheduler", lambda: scheduler)
+    monkeypatch.setattr(hedging, "llm_scheduler", lambda: scheduler)
+    monkeypatch.setattr(hedging, "CHAT_HEDGE_DELAY", DELAY)
+    return scheduler
+
+
+def streaming(name: str, ttft: float) -> ScheduledModel:
+    """A scheduled model streaming its name after `ttft` seconds."""
+
+    async def stream(messages: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        await asyncio.sleep(ttft)
+        yield name
+
+    return ScheduledModel(FunctionModel(stream_function=stream, model_name=name), name)
+
+
+async def answering_model(model: HedgedModel) -> str:
+    messages: list[ModelMessage] = [ModelRequest(parts=[UserPromptPart("Hallo")])]
+    parameters = ModelRequestParameters([], allow_text_output=True, output_tools=[])
+    async with model.request_stream(messages, None, parameters) as response:
+        return response.model_name
+
+
+async def hold_slot(scheduler: LLMScheduler, seconds: float) -> None:
+    async with scheduler.slot("other"):
+        await asyncio.sleep(seconds)
+
+
+async def test_fast_primary_is_not_hedged(scheduler: LLMScheduler):
+    model = HedgedModel(streaming("primary", 0.01), streaming("hedge", 0), "primary")
+    assert await answering_model(model) == "primary"
+    assert model.budget._tokens == model.budget.capacity
+
+
+async def test_slow_primary_is_hedged(scheduler: LLMScheduler):
+    scheduler.max_concurrency = 2
+    model = HedgedModel(streaming("primary", 1), streaming("hedge", 0), "primary")
+    assert await answering_model(model) == "hedge"
+    # The losing primary's time to first token was at least the delay
+    (ttft,) = model._ttft
+    assert DELAY <= ttft < 1
+
+
+async def test_queue_wait_does_not_count_as_slow(scheduler: LLMScheduler):
+    model = HedgedModel(streaming("primary", 0.05), streaming("hedge", 0), "primary")
+    holder = asyncio.create_task(hold_slot(scheduler, 3 * DELAY))
+    await asyncio.sleep(0)
+    assert await answering_model(model) == "primary"
+    await holder
+    (ttft,) = model._ttft
+    assert ttft < DELAY
+    assert model.budget._tokens == model.budget.capacity
+
+
+async def test_no_hedging_while_requests_are_queued(scheduler: LLMScheduler):
+    model = HedgedModel(streaming("primary", 3 * DELAY), streaming("hedge", 0), "p")
+    request = asyncio.create_task(answering_model(model))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(hold_slot(scheduler, 0))
+    assert await request == "primary"
+    await waiting
+    assert model.budget._tokens == model.budget.capacity
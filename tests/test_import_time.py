@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+
+ROOT = Path(__file__).parent.parent
+# Modules which must only be imported once a tool using them gets selected
+LAZY_IMPORTS = (
+    "llmling_agent_tools",
+    "jira",
+    "yaml",
+    "httpx",
+    "components.openapi_tools",
+)
+
+
+def imported_modules(statement: str) -> set[str]:
+    """Run an import statement in a fresh interpreter and list `sys.modules`."""
+    code = f"{statement}; import json, sys; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_config_does_not_import_tools():
+    modules = imported_modules("import config")
+    eager = [
+        lazy
+        for lazy in LAZY_IMPORTS
+        if any(name == lazy or name.startswith(f"{lazy}.") for name in modules)
+    ]
+    assert not eager
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import codecs
+import io
+from typing import TYPE_CHECKING
+
+import pytest
+
+from components import ingest
+from components.ingest import (
+    chunk_stream,
+    decode_stream,
+    detect_encoding,
+    ingest_upload,
+    text_blocks,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+TEXT = "Grüße aus Köln, die Straße ist gesperrt."
+
+
+@pytest.mark.parametrize(
+    ("sample", "encoding"),
+    [
+        (codecs.BOM_UTF8 + TEXT.encode(), "utf-8-sig"),
+        (TEXT.encode("utf-16"), "utf-16"),
+        (TEXT.encode("utf-32"), "utf-32"),
+        (TEXT.encode(), "utf-8"),
+        (TEXT.encode("cp1252"), "cp1252"),
+    ],
+)
+def test_detect_encoding(sample: bytes, encoding: str):
+    assert detect_encoding(sample) == encoding
+
+
+def test_utf8_split_across_blocks():
+    data = TEXT.encode()
+    cut = data.index("ü".encode()) + 1  # within the two bytes of "ü"
+    assert detect_encoding(data[:cut]) == "utf-8"
+    pieces = list(decode_stream(io.BytesIO(data * 1000), block_size=cut))
+    assert "".join(pieces) == TEXT * 1000
+
+
+def test_text_blocks_end_at_paragraphs():
+    paragraphs = [f"Absatz {i} " + "wort " * 20 for i in range(50)]
+    text = "\n\n".join(paragraphs)
+    pieces = [text[i : i + 37] for i in range(0, len(text), 37)]
+    blocks = list(text_blocks(pieces, size=500))
+    assert "".join(blocks) == text
+    assert all(len(block) <= 500 for block in blocks)
+    assert all(block.rstrip().endswith("wort") for block in blocks)
+
+
+def test_text_blocks_cut_unbroken_text():
+    blocks = list(text_blocks(["x" * 250], size=100))
+    assert blocks == ["x" * 100, "x" * 100, "x" * 50]
+
+
+def sections(count: int) -> Iterator[str]:
+    for i in range(count):
+        yield f"# Kapitel {i}\n\nInhalt von Kapitel {i}.\n\n"
+
+
+def test_chunk_stream_stops_at_max_chunks():
+    chunks = list(chunk_stream("doc.md", sections(20), max_chunks=5))
+    assert [chunk.title for chunk in chunks] == [f"Kapitel {i}" for i in range(5)]
+
+
+async def test_uploads_are_truncated_at_the_chunk_limit(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(ingest, "INGEST_MAX_CHUNKS", 3)
+    upload = io.BytesIO("".join(sections(10)).encode("cp1252"))
+    document = await ingest_upload(upload, "doc.md")
+    assert len(document.chunks) == 3
+    assert document.truncated
+    upload = io.BytesIO("".join(sections(3)).encode())
+    assert not (await ingest_upload(upload, "doc.md")).truncated
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any
+
+from jira import JIRAError
+from pydantic_ai import ModelRetry
+import pytest
+import requests
+
+from components import jira_gateway as jira_gateway_module
+from components.jira_gateway import JiraGateway, normalize_jql, search_for_issues
+
+
+ISSUES = [{"key": f"TEST-{i}", "fields": {"summary": f"Issue {i}"}} for i in range(5)]
+
+
+class FakeClient:
+    """Serves ISSUES with offset pagination, token pagination is optional."""
+
+    def __init__(self, enhanced_status: int | None = None) -> None:
+        self.enhanced_status = enhanced_status
+        self.calls: list[str] = []
+
+    def enhanced_search_issues(self, jql: str, **params: Any) -> dict[str, Any]:
+        self.calls.append("enhanced")
+        if self.enhanced_status:
+            raise JIRAError(status_code=self.enhanced_status, url="search/jql")
+        start = int(params["nextPageToken"] or 0)
+        end = start + params["maxResults"]
+        is_last = end >= len(ISSUES)
+        page = {"issues": ISSUES[start:end], "isLast": is_last}
+        return page if is_last else {**page, "nextPageToken": str(end)}
+
+    def search_issues(self, jql: str, **params: Any) -> dict[str, Any]:
+        self.calls.append("search")
+        start = params["startAt"]
+        issues = ISSUES[start : start + params["maxResults"]]
+        return {"issues": issues, "total": len(ISSUES)}
+
+
+def gateway(client: FakeClient) -> JiraGateway:
+    gateway = JiraGateway("https://jira.invalid", "a@b.c", None, "TEST", page_size=2)
+    gateway._client = client  # type: ignore[assignment]
+    return gateway
+
+
+def test_search_uses_token_pagination():
+    client = FakeClient()
+    assert gateway(client).search("project = TEST", limit=10) == ISSUES
+    assert client.calls == ["enhanced"] * 3
+
+
+@pytest.mark.parametrize("status", [404, 405])
+def test_search_falls_back_without_search_jql(status: int):
+    client = FakeClient(enhanced_status=status)
+    jira = gateway(client)
+    assert jira.search("project = TEST", limit=10) == ISSUES
+    assert jira.search("project = TEST AND status = Open", limit=10) == ISSUES
+    assert client.calls == ["enhanced", *["search"] * 6]
+
+
+def test_search_errors_are_raised():
+    client = FakeClient(enhanced_status=400)
+    with pytest.raises(JIRAError):
+        gateway(client).search("project = ")
+    assert client.calls == ["enhanced"]
+
+
+class UnreachableClient(FakeClient):
+    """Jira which can't be reached."""
+
+    def enhanced_search_issues(self, jql: str, **params: Any) -> dict[str, Any]:
+        msg = "Connection refused"
+        raise requests.ConnectionError(msg)
+
+
+@pytest.mark.parametrize("client", [FakeClient(400), UnreachableClient()])
+def test_search_tool_asks_the_model_to_retry(
+    client: FakeClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(jira_gateway_module, "jira_gateway", lambda: gateway(client))
+    with pytest.raises(ModelRetry):
+        search_for_issues("project = TEST")
+
+
+def test_normalize_jql():
+    assert normalize_jql('project = TEST and Status="Open"') == normalize_jql(
+        "project=\"TEST\" AND status = 'Open'"
+    )
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from components.jobs import Job, JobScheduler
+from utils import LoopThread
+
+
+@pytest.fixture
+def loop_thread():
+    loop_thread = LoopThread(name="test-jobs")
+    yield loop_thread
+    loop_thread.stop()
+    loop_thread.thread.join(timeout=5)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Gate:
+    """Job bodies which block until released."""
+
+    def __init__(self, loop_thread: LoopThread) -> None:
+        self.loop_thread = loop_thread
+        self.event = asyncio.Event()
+        self.started: list[str] = []
+
+    def job(self, name: str):
+        async def body() -> str:
+            self.started.append(name)
+            await self.event.wait()
+            return name
+
+        return body
+
+    def open(self) -> None:
+        self.loop_thread.loop.call_soon_threadsafe(self.event.set)
+
+
+def submit(scheduler: JobScheduler, gate: Gate, name: str, **kwargs) -> Job:
+    return scheduler.submit(name, gate.job(name), loop_thread=gate.loop_thread, **kwargs)
+
+
+def test_requested_jobs_start_before_speculative_ones(loop_thread: LoopThread):
+    scheduler = JobScheduler(max_workers=1, speculative_workers=1)
+    gate = Gate(loop_thread)
+    first = submit(scheduler, gate, "first")
+    submit(scheduler, gate, "guess", speculative=True)
+    submit(scheduler, gate, "click")
+    wait_for(lambda: gate.started == ["first"])
+    gate.open()
+    wait_for(lambda: len(gate.started) == 3)
+    assert gate.started == ["first", "click", "guess"]
+    assert first.result == "first"
+
+
+def test_speculative_jobs_leave_workers_free(loop_thread: LoopThread):
+    scheduler = JobScheduler(max_workers=2, speculative_workers=1)
+    gate = Gate(loop_thread)
+    submit(scheduler, gate, "guess 1", speculative=True)
+    second = submit(scheduler, gate, "guess 2", speculative=True)
+    click = submit(scheduler, gate, "click")
+    wait_for(lambda: click.status == "running")
+    assert second.status == "pending"
+    assert scheduler.running == 2
+    gate.open()
+    wait_for(lambda: second.done)
+
+
+def test_requested_resubmission_promotes_a_speculative_job(loop_thread: LoopThread):
+    scheduler = JobScheduler(max_workers=1, speculative_workers=1)
+    gate = Gate(loop_thread)
+    submit(scheduler, gate, "first")
+    guess = submit(scheduler, gate, "ticket", speculative=True, delay=60)
+    submit(scheduler, gate, "other", speculative=True)
+    assert submit(scheduler, gate, "ticket") is guess
+    assert not guess.speculative
+    assert guess.not_before <= time.monotonic()
+    gate.open()
+    wait_for(lambda: len(gate.started) == 3)
+    assert gate.started == ["first", "ticket", "other"]
+
+
+def test_delayed_submit_on_a_closed_loop_registers_nothing():
+    scheduler = JobScheduler()
+    loop_thread = LoopThread(name="test-closed")
+    loop_thread.stop()
+    loop_thread.thread.join(timeout=5)
+    gate = Gate(loop_thread)
+    with pytest.raises(RuntimeError):
+        submit(scheduler, gate, "ticket", delay=5)
+    assert scheduler.queued == 0
+
+    # Without a delay the job fails once started, it is not shared afterwards
+    job = submit(scheduler, gate, "ticket")
+    assert job.status == "failed"
+    assert submit(scheduler, gate, "ticket") is not job
+    assert scheduler.running == 0
+
+
+def test_closing_a_session_loop_cancels_its_jobs():
+    scheduler = JobScheduler(max_workers=1)
+    loop_thread = LoopThread(name="test-session")
+    gate = Gate(loop_thread)
+    running = submit(scheduler, gate, "running")
+    pending = submit(scheduler, gate, "pending")
+    wait_for(lambda: gate.started == ["running"])
+
+    assert scheduler.cancel_loop(loop_thread) == 2
+    loop_thread.stop()
+    wait_for(lambda: running.done)
+    assert (running.status, pending.status) == ("cancelled", "cancelled")
+    assert (scheduler.running, scheduler.queued) == (0, 0)
+
+
+def test_stopped_loop_resolves_running_jobs():
+    scheduler = JobScheduler(max_workers=1)
+    loop_thread = LoopThread(name="test-stopped")
+    gate = Gate(loop_thread)
+    job = submit(scheduler, gate, "running")
+    wait_for(lambda: gate.started == ["running"])
+    loop_thread.stop()
+    wait_for(lambda: job.done)
+    assert job.status == "cancelled"
+    assert scheduler.running == 0
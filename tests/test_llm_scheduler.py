@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import openai
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.openai import OpenAIProvider
+import pytest
+
+from components.llm_scheduler import (
+    LLMScheduler,
+    Priority,
+    ScheduledModel,
+    llm_context,
+    retry_after,
+)
+
+
+@pytest.fixture
+def scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        1, rate_limits={}, default_rate_limit=(6000, 100), retry_base=0.01
+    )
+
+
+def rate_limit_error(headers: dict[str, str] | None = None) -> ModelHTTPError:
+    """A 429 the way pydantic-ai raises it from an OpenAI SDK error."""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    error = ModelHTTPError(429, "gpt-4o-mini")
+    error.__cause__ = openai.RateLimitError("rate limited", response=response, body=None)
+    return error
+
+
+async def request(
+    scheduler: LLMScheduler,
+    name: str,
+    order: list[str],
+    *,
+    model: str = "m",
+    priority: Priority | None = None,
+    session: str | None = None,
+) -> None:
+    with llm_context(priority=priority, session=session):
+        async with scheduler.slot(model):
+            order.append(name)
+            await asyncio.sleep(0)
+
+
+async def test_interactive_requests_are_served_first(scheduler: LLMScheduler):
+    order: list[str] = []
+    holder = asyncio.create_task(request(scheduler, "holder", order))
+    background = asyncio.create_task(
+        request(scheduler, "background", order, priority=Priority.BACKGROUND)
+    )
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(
+        request(scheduler, "interactive", order, priority=Priority.INTERACTIVE)
+    )
+    await asyncio.gather(holder, background, interactive)
+    assert order == ["holder", "interactive", "background"]
+
+
+async def test_sessions_are_served_round_robin(scheduler: LLMScheduler):
+    order: list[str] = []
+    tasks = [
+        asyncio.create_task(request(scheduler, f"a{i}", order, session="a"))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(request(scheduler, "b0", order, session="b")))
+    await asyncio.gather(*tasks)
+    assert order == ["a0", "a1", "b0", "a2"]
+
+
+async def test_requests_are_paced_by_the_bucket():
+    # 10 requests per second, no burst
+    scheduler = LLMScheduler(4, rate_limits={"m": (600, 1)})
+    order: list[str] = []
+    start = time.monotonic()
+    await asyncio.gather(*(request(scheduler, str(i), order) for i in range(3)))
+    assert time.monotonic() - start >= 0.18
+    assert sorted(order) == ["0", "1", "2"]
+
+
+async def test_rate_limits_are_retried(scheduler: LLMScheduler):
+    attempts = 0
+
+    async def call() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert await scheduler.run("m", call) == "ok"
+    assert attempts == 3
+    assert scheduler.active == 0
+
+
+async def test_retries_give_up(scheduler: LLMScheduler):
+    scheduler.max_retries = 1
+    attempts = 0
+
+    async def call() -> str:
+        nonlocal attempts
+        attempts += 1
+        raise rate_limit_error()
+
+    with pytest.raises(ModelHTTPError):
+        await scheduler.run("m", call)
+    assert attempts == 2
+
+
+def test_retry_after_is_the_minimum_backoff(scheduler: LLMScheduler):
+    assert retry_after(rate_limit_error()) is None
+    assert retry_after(rate_limit_error({"retry-after": "2"})) == 2
+    assert retry_after(rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    error = rate_limit_error({"retry-after": "2"})
+    assert scheduler.on_rate_limit("m", 0, error) >= 2
+    assert scheduler.buckets("m")[0].delay() > 1
+
+
+async def test_cancelled_waiters_leave_the_queue(scheduler: LLMScheduler):
+    order: list[str] = []
+    gate = asyncio.Event()
+
+    async def hold() -> None:
+        async with scheduler.slot("m"):
+            await gate.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(request(scheduler, "cancelled", order))
+    await asyncio.sleep(0)
+    assert scheduler.queued == 1
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert scheduler.queued == 0
+
+    holder.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await holder
+    assert scheduler.active == 0
+    await request(scheduler, "next", order)
+    assert order == ["next"]
+
+
+def test_sdk_retries_are_turned_off():
+    provider = OpenAIProvider(api_key="test")
+    model = ScheduledModel(OpenAIModel("gpt-4o-mini", provider=provider), "gpt")
+    assert model.wrapped.client.max_retries == 0  # type: ignore[attr-defined]
+    assert provider.client.max_retries > 0
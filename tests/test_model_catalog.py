@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from tokonomics.model_discovery import ModelInfo
+
+from components.model_catalog import ModelCatalog
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from pathlib import Path
+
+    from tokonomics.model_discovery import ProviderType
+
+
+MODEL = ModelInfo(id="gpt-4o-mini", name="GPT-4o mini", provider="openai")
+
+
+class FakeProviders:
+    """Model discovery which fails until the providers are reachable."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.reachable = False
+
+    def __call__(self, providers: Sequence[ProviderType]) -> list[ModelInfo]:
+        self.calls += 1
+        if not self.reachable:
+            msg = "provider unreachable"
+            raise ConnectionError(msg)
+        return [MODEL]
+
+
+@pytest.fixture
+def fetch() -> FakeProviders:
+    return FakeProviders()
+
+
+@pytest.fixture
+def catalog(tmp_path: Path, fetch: FakeProviders) -> ModelCatalog:
+    return ModelCatalog(["openai"], path=tmp_path / "catalog.pkl", fetch=fetch)
+
+
+def test_unreachable_providers_are_retried_after_a_delay(
+    catalog: ModelCatalog, fetch: FakeProviders
+):
+    assert catalog.models() == []
+    assert catalog.models() == []
+    assert catalog.get("openai:gpt-4o-mini") is None
+    assert fetch.calls == 1
+
+    fetch.reachable = True
+    catalog._retry_at = 0  # the retry delay passed
+    assert catalog.models() == [MODEL]
+    assert fetch.calls == 2
+
+
+def test_models_are_served_from_the_snapshot(
+    catalog: ModelCatalog, fetch: FakeProviders, tmp_path: Path
+):
+    fetch.reachable = True
+    assert catalog.models() == [MODEL]
+    restarted = ModelCatalog(["openai"], path=tmp_path / "catalog.pkl", fetch=fetch)
+    assert restarted.models() == [MODEL]
+    assert fetch.calls == 1
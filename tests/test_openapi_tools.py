@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from llmling_agent.tools.manager import ToolManager
+from pydantic_ai import Tool as PydanticTool
+import pytest
+
+from components import openapi_tools
+from components.openapi_tools import (
+    MAX_DESCRIPTION_LENGTH,
+    HttpGateway,
+    compile_spec,
+    create_operation_callable,
+    load_operation_table,
+    openapi_tools as create_tools,
+)
+from config import BIRD_SPEC_PATH
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+SPEC = """
+openapi: 3.0.0
+info:
+  title: Stub API
+servers:
+  - url: https://stub.invalid/api
+paths:
+  /items:
+    get:
+      operationId: listItems
+      description: List all items. Long description follows.
+      parameters:
+        - $ref: "#/components/parameters/codes"
+        - name: limit
+          in: query
+          schema:
+            type: integer
+  /items/{code}:
+    get:
+      operationId: getItem
+      summary: Get one item
+      parameters:
+        - name: code
+          in: path
+          description: Item code
+          schema:
+            type: string
+components:
+  parameters:
+    codes:
+      name: codes
+      in: query
+      description: Comma separated item codes
+      schema:
+        type: array
+        items:
+          type: string
+"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers with the request path and an ETag, or 304 if it matches."""
+
+    etag = '"v1"'
+    requests: ClassVar[list[tuple[str, dict[str, str]]]] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.requests.append((self.path, dict(self.headers)))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+
+@pytest.fixture
+def stub_server() -> Iterator[str]:
+    StubHandler.requests.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def spec_path(tmp_path: Path) -> Path:
+    path = tmp_path / "stub.yml"
+    path.write_text(SPEC, encoding="utf-8")
+    return path
+
+
+def test_compile_spec_resolves_parameters():
+    table = compile_spec(SPEC)
+    assert table.base_url == "https://stub.invalid/api"
+    operations = {op.operation_id: op for op in table.operations}
+    assert set(operations) == {"listItems", "getItem"}
+    codes, limit = operations["listItems"].parameters
+    assert (codes.name, codes.type_name, codes.required) == ("codes", "array", False)
+    assert codes.description == "Comma separated item codes"
+    assert (limit.type_name, limit.location) == ("integer", "query")
+    (code,) = operations["getItem"].parameters
+    assert code.required
+    assert code.location == "path"
+
+
+def test_bird_tools_fit_the_tool_manager():
+    table = compile_spec(BIRD_SPEC_PATH.read_text(encoding="utf-8"))
+    assert len(table.operations) == 14
+    for operation in table.operations:
+        assert "\n" not in operation.summary
+        assert len(operation.summary) <= MAX_DESCRIPTION_LENGTH
+    manager = ToolManager()
+    for tool in create_tools(BIRD_SPEC_PATH):
+        manager.register_tool(tool)
+
+
+def test_operation_table_is_loaded_from_pickle(
+    spec_path: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    cache_dir = tmp_path / "cache"
+    table = load_operation_table(spec_path, cache_dir)
+    assert len(list(cache_dir.glob("stub-*.pkl"))) == 1
+
+    def fail(text: str) -> None:
+        msg = "spec parsed again"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(openapi_tools, "compile_spec", fail)
+    assert load_operation_table(spec_path, cache_dir) == table
+
+    # A changed spec gets compiled into a new table
+    monkeypatch.undo()
+    spec_path.write_text(SPEC.replace("Stub API", "Stub API v2"), encoding="utf-8")
+    assert load_operation_table(spec_path, cache_dir).title == "Stub API v2"
+
+
+async def test_gateway_serves_fresh_responses_from_cache(stub_server: str):
+    gateway = HttpGateway(ttl=60)
+    first = await gateway.request("get", f"{stub_server}/items", {"limit": 1})
+    second = await gateway.request("get", f"{stub_server}/items", {"limit": 1})
+    assert first == second == {"path": "/api/items?limit=1"}
+    assert len(StubHandler.requests) == 1
+
+
+async def test_gateway_revalidates_stale_responses_with_etag(stub_server: str):
+    gateway = HttpGateway(ttl=0)
+    first = await gateway.request("get", f"{stub_server}/items", {})
+    second = await gateway.request("get", f"{stub_server}/items", {})
+    assert first == second == {"path": "/api/items"}
+    (_, initial), (_, revalidation) = StubHandler.requests
+    assert "If-None-Match" not in initial
+    assert revalidation["If-None-Match"] == StubHandler.etag
+
+
+async def test_operation_quotes_path_parameters(spec_path: Path, stub_server: str):
+    table = load_operation_table(spec_path, spec_path.parent / "cache")
+    operation = next(op for op in table.operations if op.operation_id == "getItem")
+    call = create_operation_callable(operation, stub_server, HttpGateway())
+    result = json.loads(await call(code="../a b/c?d"))
+    assert result == {"path": "/api/items/..%2Fa%20b%2Fc%3Fd"}
+
+
+async def test_tools_register_and_call_the_api(spec_path: Path, stub_server: str):
+    tools = create_tools(spec_path, stub_server)
+    manager = ToolManager()
+    for tool in tools:
+        manager.register_tool(tool)
+    assert await manager.get_tool_names() == {"listItems", "getItem"}
+
+    # The schema the model sees, as built by pydantic-ai
+    schema = PydanticTool(tools[0].callable.callable, takes_ctx=False)
+    assert schema.description == "List all items. Long description follows."
+    codes = schema._base_parameters_json_schema["properties"]["codes"]
+    assert codes["description"] == "Comma separated item codes"
+
+    result = json.loads(await tools[0].execute(codes=["A", "B"], limit=2))
+    assert result == {"path": "/api/items?codes=A%2CB&limit=2"}
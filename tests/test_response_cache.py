@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from components.response_cache import ResponseCache, embed, prompt_guard, similarity
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+ALLOWED = "Ist die Nutzung privater Geräte im Büro laut Richtlinie erlaubt?"
+NOT_ALLOWED = "Ist die Nutzung privater Geräte im Büro laut Richtlinie nicht erlaubt?"
+DEADLINE_2025 = (
+    "Welche Meldefristen gelten für Kreditinstitute bei der Einreichung der"
+    " FINREP- und COREP-Meldungen an die Aufsicht im Jahr 2025?"
+)
+DEADLINE_2026 = DEADLINE_2025.replace("2025", "2026")
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ResponseCache:
+    return ResponseCache(tmp_path / "responses.sqlite3", threshold=0.9)
+
+
+def test_semantic_tier_is_off_by_default(tmp_path: Path):
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    cache.set(DEADLINE_2025, "scope", "Answer", "model")
+    assert cache.get(DEADLINE_2025, "scope") is not None
+    assert cache.get(f"{DEADLINE_2025} Bitte kurz.", "scope") is None
+
+
+def test_exact_tier_ignores_case_and_punctuation(cache: ResponseCache):
+    cache.set(DEADLINE_2025, "scope", "Answer", "model")
+    hit = cache.get(DEADLINE_2025.upper().replace("?", " ?!"), "scope")
+    assert hit is not None
+    assert hit.tier == "exact"
+    assert cache.get(DEADLINE_2025, "other scope") is None
+
+
+def test_semantic_tier_matches_paraphrases(cache: ResponseCache):
+    cache.set(DEADLINE_2025, "scope", "Answer", "model")
+    paraphrase = (
+        "Welche Meldefristen gelten im Jahr 2025 bei der Einreichung der FINREP-"
+        " und COREP-Meldungen an die Aufsicht für Kreditinstitute?"
+    )
+    hit = cache.get(paraphrase, "scope")
+    assert hit is not None
+    assert hit.tier == "semantic"
+    assert hit.content == "Answer"
+
+
+@pytest.mark.parametrize(
+    ("cached", "asked"),
+    [(ALLOWED, NOT_ALLOWED), (NOT_ALLOWED, ALLOWED), (DEADLINE_2025, DEADLINE_2026)],
+)
+def test_semantic_tier_refuses_other_numbers_and_negations(
+    cache: ResponseCache, cached: str, asked: str
+):
+    # Similar enough as bag of words, only the guard tells them apart
+    assert similarity(embed(cached), embed(asked)) >= 0.9
+    cache.set(cached, "scope", "Answer", "model")
+    assert cache.get(asked, "scope") is None
+
+
+def test_prompt_guard():
+    assert prompt_guard(ALLOWED) != prompt_guard(NOT_ALLOWED)
+    assert prompt_guard("Is it allowed?") != prompt_guard("Isn't it allowed?")
+    assert prompt_guard("Keine Frist?") == prompt_guard("Nicht fristgerecht?")
+    assert prompt_guard("Fristen 2025 und 2026") == prompt_guard("2026 und 2025 Fristen")
+    assert prompt_guard("Version 1.5") != prompt_guard("Version 1.6")
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from llmling_agent import Tool
+import pytest
+
+from components.single_flight import SingleFlight, call_key, coalesce_tool
+
+
+class Counter:
+    """Call bodies counting how often they actually run."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def slow(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    def blocking(self) -> str:
+        self.calls += 1
+        time.sleep(0.05)
+        return "result"
+
+    async def failing(self) -> str:
+        self.calls += 1
+        msg = "boom"
+        raise RuntimeError(msg)
+
+
+@pytest.fixture
+def flight() -> SingleFlight:
+    return SingleFlight(ttl=0, error_ttl=0)
+
+
+async def test_concurrent_calls_run_once(flight: SingleFlight):
+    counter = Counter()
+    results = await asyncio.gather(*(flight.acall("k", counter.slow) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert counter.calls == 1
+
+
+def test_concurrent_calls_run_once_across_threads(flight: SingleFlight):
+    counter = Counter()
+    barrier = threading.Barrier(4)
+
+    def call() -> str:
+        barrier.wait()
+        return flight.call("k", counter.blocking)
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda _: call(), range(4)))
+    assert results == ["result"] * 4
+    assert counter.calls == 1
+
+
+async def test_follower_takes_over_from_a_cancelled_leader(flight: SingleFlight):
+    counter = Counter()
+    leader = asyncio.create_task(flight.acall("k", counter.slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.acall("k", counter.slow))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await follower == "result"
+    assert counter.calls == 2
+
+
+async def test_errors_are_cached_for_the_error_ttl():
+    flight = SingleFlight(ttl=0, error_ttl=0.05)
+    counter = Counter()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await flight.acall("k", counter.failing)
+    assert counter.calls == 1
+    await asyncio.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        await flight.acall("k", counter.failing)
+    assert counter.calls == 2
+
+
+async def test_errors_are_not_cached_without_error_ttl(flight: SingleFlight):
+    counter = Counter()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await flight.acall("k", counter.failing)
+    assert counter.calls == 2
+
+
+def search(query: str, limit: int = 10) -> str:
+    return f"{query}:{limit}"
+
+
+def test_call_key_matches_equivalent_arguments():
+    key = call_key(search, "search", "EU  AI Act")
+    assert call_key(search, "search", query="EU AI Act") == key
+    assert call_key(search, "search", "EU AI Act", 10) == key
+    assert call_key(search, "search", "EU AI Act", limit=10) == key
+    assert call_key(search, "search", "EU AI Act", limit=5) != key
+    assert call_key(search, "other", "EU AI Act") != key
+
+
+async def test_coalesced_tools_share_results():
+    calls: list[str] = []
+
+    async def lookup(term: str) -> str:
+        """Look up a term."""
+        calls.append(term)
+        await asyncio.sleep(0.01)
+        return term.upper()
+
+    tool = Tool.from_callable(lookup)
+    coalesce_tool(tool, SingleFlight(ttl=60))
+    run = tool.callable.callable
+    assert await asyncio.gather(run("ki"), run(term="ki")) == ["KI", "KI"]
+    assert await run("ki ") == "KI"
+    assert calls == ["ki"]
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from llmling_agent import ChatMessage
+import pytest
+
+from components import state as state_module
+from components.conversation_store import PersistentHistory
+from components.state import sign_session_key, verify_session_token
+from components.state_backend import (
+    MemoryBackend,
+    RedisBackend,
+    SQLiteBackend,
+    StateBackend,
+    create_backend,
+)
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def worker_backends(request: pytest.FixtureRequest, tmp_path: Path):
+    """Create backends of two workers sharing the same storage."""
+    if request.param == "sqlite":
+        path = tmp_path / "state.sqlite3"
+        return lambda: SQLiteBackend(path)
+    server = fakeredis.FakeServer()
+    return lambda: RedisBackend(fakeredis.FakeRedis(server=server))
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request: pytest.FixtureRequest, tmp_path: Path) -> StateBackend:
+    match request.param:
+        case "memory":
+            return MemoryBackend()
+        case "sqlite":
+            return SQLiteBackend(tmp_path / "state.sqlite3")
+    return RedisBackend(fakeredis.FakeRedis())
+
+
+def message(content: str) -> ChatMessage[str]:
+    return ChatMessage[str](content=content, role="user")
+
+
+def test_session_snapshot_round_trip(backend: StateBackend):
+    assert backend.load_session("a" * 32) is None
+    snapshot = {"form_data": {"title": "Ticket"}, "agent_config": {"Dieter": {}}}
+    backend.save_session("a" * 32, snapshot)
+    assert backend.load_session("a" * 32) == snapshot
+    backend.delete_session("a" * 32)
+    assert backend.load_session("a" * 32) is None
+
+
+def test_conversation_operations(backend: StateBackend):
+    store = backend.conversations
+    first, second = message("first"), message("second")
+    assert store.append("s/Dieter", first) == 0
+    assert store.append("s/Dieter", second) == 1
+    assert store.count("s/Dieter") == 2
+    assert store.position("s/Dieter", second.message_id) == 1
+
+    second.content = "edited"
+    assert store.update("s/Dieter", second)
+    assert [msg.content for msg in store.load("s/Dieter", 0, 2)] == ["first", "edited"]
+
+    store.truncate("s/Dieter", 1)
+    assert store.count("s/Dieter") == 1
+    store.clear("s/Dieter")
+    assert store.count("s/Dieter") == 0
+
+
+def test_large_payloads_are_stored_once(backend: StateBackend):
+    store = backend.conversations
+    content = "x" * (store.payload_threshold + 1)
+    store.append("s/Dieter", message(content))
+    store.append("s/Uschi", message(content))
+    assert store.load("s/Uschi", 0, 1)[0].content == content
+
+
+def test_session_is_rehydrated_by_another_worker(
+    worker_backends: Callable[[], StateBackend],
+):
+    first_worker, second_worker = worker_backends(), worker_backends()
+    first_worker.save_session("b" * 32, {"form_data": {"title": "Ticket"}})
+    history = PersistentHistory(first_worker.conversations, "s/Dieter", hot_window=2)
+    history.extend(message(str(i)) for i in range(5))
+
+    assert second_worker.load_session("b" * 32) == {"form_data": {"title": "Ticket"}}
+    restored = PersistentHistory(second_worker.conversations, "s/Dieter", hot_window=2)
+    assert [msg.content for msg in restored] == ["0", "1", "2", "3", "4"]
+
+
+def test_create_backend_from_url(tmp_path: Path):
+    assert isinstance(create_backend("memory://"), MemoryBackend)
+    sqlite = create_backend(f"sqlite:///{tmp_path / 'state.sqlite3'}")
+    assert isinstance(sqlite, SQLiteBackend)
+    assert sqlite.path == tmp_path / "state.sqlite3"
+    with pytest.raises(ValueError, match="Unsupported state backend"):
+        create_backend("postgres://localhost/db")
+
+
+def test_session_tokens_are_verified(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(state_module, "_session_secret", lambda: b"secret")
+    key = "c" * 32
+    token = sign_session_key(key)
+    assert verify_session_token(token) == key
+
+    # Keys chosen by a client, forged or foreign signatures are refused
+    assert verify_session_token(None) is None
+    assert verify_session_token(key) is None
+    assert verify_session_token(f"{'d' * 32}.{token.partition('.')[2]}") is None
+    assert verify_session_token(f"{key}.{'0' * 64}") is None
+    monkeypatch.setattr(state_module, "_session_secret", lambda: b"other secret")
+    assert verify_session_token(token) is None
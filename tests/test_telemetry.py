@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from llmling_agent import ChatMessage
+from llmling_agent.messaging.messages import TokenCost
+from tokonomics.toko_types import TokenUsage
+
+from components import telemetry
+from components.telemetry import Metrics, record_usage
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def test_record_usage_counts_tokens_and_cost(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    metrics = Metrics(tmp_path)
+    monkeypatch.setattr(telemetry, "metrics", metrics)
+    usage = TokenUsage(total=30, prompt=20, completion=10)
+    message = ChatMessage[str](
+        content="Hallo",
+        role="assistant",
+        cost_info=TokenCost(token_usage=usage, total_cost=0.5),
+    )
+    record_usage("chat", "openai:gpt-4o-mini", message)
+    counters = {
+        (counter["metric"], counter.get("kind")): counter["value"]
+        for counter in metrics.counters()
+    }
+    assert counters == {
+        ("chatbot_llm_tokens_total", "prompt"): 20,
+        ("chatbot_llm_tokens_total", "completion"): 10,
+        ("chatbot_llm_tokens_total", "total"): 30,
+        ("chatbot_llm_cost_usd_total", None): 0.5,
+        ("chatbot_llm_responses_total", None): 1,
+    }
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from llmling_agent import ChatMessage
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+import pytest
+
+from benchmarks.fake_llm import FakeLLM, FakeLLMConfig
+from components import telemetry, tickets
+from components.agent_pool import register_model
+from components.state import create_form_agent
+from components.telemetry import Metrics
+from components.tickets import process_chat_history, ticket_tiers
+
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+    from pathlib import Path
+
+    from llmling_agent import StructuredAgent
+    from pydantic_ai.messages import ModelMessage
+    from pydantic_ai.models.function import AgentInfo
+
+    from config import FormData
+
+
+CHAT = [
+    ChatMessage[str](
+        content="Mein Hochrisiko-System braucht eine Bewertung.", role="user"
+    ),
+    ChatMessage[str](
+        content="Dafür ist eine Konformitätsbewertung nötig.", role="assistant"
+    ),
+]
+
+
+class Tiers:
+    """Fake models of the cascade, recording which of them were asked."""
+
+    def __init__(self) -> None:
+        self.asked: list[str] = []
+        fake = FakeLLM(FakeLLMConfig(latency=0, response_tokens=5))
+
+        def failing(name: str) -> FunctionModel:
+            async def respond(
+                messages: list[ModelMessage], info: AgentInfo
+            ) -> ModelResponse:
+                self.asked.append(name)
+                raise ModelHTTPError(500, name)
+
+            return FunctionModel(respond, model_name=name)
+
+        async def incomplete(
+            messages: list[ModelMessage], info: AgentInfo
+        ) -> ModelResponse:
+            self.asked.append("incomplete")
+            response = await fake.respond(messages, info)
+            for part in response.parts:
+                if isinstance(part, ToolCallPart) and isinstance(part.args, dict):
+                    part.args["title"] = ""
+            return response
+
+        async def strong(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+            self.asked.append("strong")
+            return await fake.respond(messages, info)
+
+        register_model("fake:failing", failing("failing"))
+        register_model("fake:broken", failing("broken"))
+        register_model(
+            "fake:incomplete", FunctionModel(incomplete, model_name="incomplete")
+        )
+        register_model("fake:strong", FunctionModel(strong, model_name="strong"))
+
+
+@pytest.fixture
+def tiers(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Tiers:
+    monkeypatch.setattr(telemetry, "metrics", Metrics(tmp_path))
+    monkeypatch.setattr(tickets, "metrics", telemetry.metrics)
+    monkeypatch.setattr(
+        tickets, "TICKET_ESCALATION_MODELS", ("fake:incomplete", "fake:strong")
+    )
+    return Tiers()
+
+
+@pytest.fixture
+async def agent() -> AsyncIterator[StructuredAgent[None, FormData]]:
+    agent = await create_form_agent("fake:failing")
+    yield agent
+    await agent.__aexit__(None, None, None)
+
+
+def answering_tier() -> dict[str, Any]:
+    (counter,) = [
+        counter
+        for counter in telemetry.metrics.counters()
+        if counter["metric"] == "chatbot_ticket_tier_total"
+    ]
+    return counter
+
+
+async def test_errors_and_incomplete_tickets_escalate(
+    tiers: Tiers, agent: StructuredAgent[None, FormData]
+):
+    ticket = await process_chat_history(agent, CHAT)
+    assert ticket.title
+    assert ticket.description
+    assert tiers.asked == ["failing", "incomplete", "strong"]
+    counter = answering_tier()
+    assert (counter["tier"], counter["reason"]) == ("2", "incomplete")
+
+
+async def test_long_chats_go_to_the_strongest_model(
+    tiers: Tiers, agent: StructuredAgent[None, FormData], monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(tickets, "TICKET_ESCALATION_TOKENS", 1)
+    assert (await process_chat_history(agent, CHAT)).title
+    assert tiers.asked == ["strong"]
+    counter = answering_tier()
+    assert (counter["tier"], counter["reason"]) == ("2", "long_input")
+
+
+async def test_the_strongest_models_errors_are_raised(
+    tiers: Tiers, agent: StructuredAgent[None, FormData], monkeypatch: pytest.MonkeyPatch
+):
+    escalation = ("fake:incomplete", "fake:broken")
+    monkeypatch.setattr(tickets, "TICKET_ESCALATION_MODELS", escalation)
+    with pytest.raises(ModelHTTPError):
+        await process_chat_history(agent, CHAT)
+    assert tiers.asked == ["failing", "incomplete", "broken"]
+
+
+async def test_tiers_skip_the_agents_own_model(
+    tiers: Tiers, agent: StructuredAgent[None, FormData], monkeypatch: pytest.MonkeyPatch
+):
+    assert ticket_tiers(agent) == [None, "fake:incomplete", "fake:strong"]
+    # The agent's own model is fake:failing
+    escalation = ("fake:failing", "fake:strong")
+    monkeypatch.setattr(tickets, "TICKET_ESCALATION_MODELS", escalation)
+    assert ticket_tiers(agent) == [None, "fake:strong"]
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from streamlit.runtime.scriptrunner import RerunData, RerunException, StopException
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests
+
+import utils
+from utils import run_sync
+
+
+@pytest.fixture
+def script_requests(monkeypatch: pytest.MonkeyPatch) -> ScriptRequests:
+    requests = ScriptRequests()
+    ctx = SimpleNamespace(session_id="test-run-sync", script_requests=requests)
+    monkeypatch.setattr(utils, "get_script_run_ctx", lambda: ctx)
+    monkeypatch.setattr(utils, "add_script_run_ctx", lambda thread, ctx: thread)
+    yield requests
+    utils.session_loops.close(ctx.session_id)
+
+
+async def sleep_until_cancelled(cancelled: threading.Event) -> None:
+    try:
+        await asyncio.sleep(60)
+    finally:
+        cancelled.set()
+
+
+def test_run_sync_returns_the_result(script_requests: ScriptRequests):
+    assert run_sync(asyncio.sleep(0, result="done")) == "done"
+
+
+def test_run_sync_honors_rerun_requests(script_requests: ScriptRequests):
+    cancelled = threading.Event()
+    threading.Timer(0.2, script_requests.request_rerun, [RerunData()]).start()
+    with pytest.raises(RerunException):
+        run_sync(sleep_until_cancelled(cancelled))
+    assert cancelled.wait(timeout=5)
+
+
+def test_run_sync_honors_stop_requests(script_requests: ScriptRequests):
+    cancelled = threading.Event()
+    threading.Timer(0.2, script_requests.request_stop).start()
+    with pytest.raises(StopException):
+        run_sync(sleep_until_cancelled(cancelled))
+    assert cancelled.wait(timeout=5)
@@ -3,11 +3,20 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
 import inspect
 import sys
+import threading
 from typing import TYPE_CHECKING, Any, TypeVar
 
 from streamlit import runtime
+from streamlit.runtime.scriptrunner import (
+    RerunException,
+    StopException,
+    add_script_run_ctx,
+    get_script_run_ctx,
+)
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequestType
 from streamlit.web.cli import main
 
 
@@ -19,6 +28,109 @@ if TYPE_CHECKING:
 
 T = TypeVar("T")
 
+# How often a waiting script thread checks for rerun / stop requests
+POLL_INTERVAL = 0.1
+
+
+class LoopThread:
+    """An event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str = "event-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            # Cancel what is left, so the futures of `submit` callers resolve
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        """Stop the loop once its current iteration finishes."""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class SessionLoops:
+    """Process-wide registry of one persistent event loop per session.
+
+    Agents (and their HTTP connections) are bound to the loop they were
+    entered on, so each session keeps using the same loop across reruns.
+    """
+
+    def __init__(self) -> None:
+        self._loops: dict[str, LoopThread] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> LoopThread:
+        """Get the loop of a session, starting it on first use."""
+        with self._lock:
+            if (loop_thread := self._loops.get(session_id)) is None:
+                loop_thread = LoopThread(name=f"session-loop-{session_id[:8]}")
+                self._loops[session_id] = loop_thread
+            return loop_thread
+
+    def close(self, session_id: str) -> None:
+        """Stop and forget the loop of a session, cancelling its background jobs."""
+        from components.jobs import job_scheduler
+
+        with self._lock:
+            loop_thread = self._loops.pop(session_id, None)
+        if loop_thread:
+            job_scheduler().cancel_loop(loop_thread)
+            loop_thread.stop()
+
+
+session_loops = SessionLoops()
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the session's persistent loop and wait for the result.
+
+    The script run context is attached to the loop thread so Streamlit calls
+    inside the coroutine render into the current page. While waiting, the
+    script thread keeps honoring rerun / stop requests and cancels the
+    coroutine if it gets interrupted.
+
+    Args:
+        coro: The coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return asyncio.run(coro)
+    loop_thread = session_loops.get(ctx.session_id)
+    add_script_run_ctx(loop_thread.thread, ctx)
+    future = loop_thread.submit(coro)
+    while True:
+        try:
+            return future.result(timeout=POLL_INTERVAL)
+        except concurrent.futures.TimeoutError:
+            pass
+        # Do what Streamlit does when a script enqueues an element
+        if ctx.script_requests is None:
+            continue
+        request = ctx.script_requests.on_scriptrunner_yield()
+        if request is None:
+            continue
+        future.cancel()
+        if request.type == ScriptRequestType.RERUN:
+            raise RerunException(request.rerun_data)
+        raise StopException
+
 
 def run(
     fn: Callable[..., T | Coroutine[Any, Any, T]] | Coroutine[Any, Any, T],
@@ -37,11 +149,11 @@ def run(
     """
     if runtime.exists():
         if inspect.iscoroutine(fn):
-            asyncio.run(fn)
+            run_sync(fn)
         # Handle coroutine function
         elif inspect.iscoroutinefunction(fn):
             coro = fn(*args, **kwargs)
-            asyncio.run(coro)
+            run_sync(coro)
         # Handle regular function
         else:
             fn(*args, **kwargs)  # type: ignore
@@ -50,10 +162,17 @@ def run(
         sys.exit(main())
 
 
+def session_id() -> str:
+    """Get the id of the Streamlit session running the current script."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        error_msg = "Keine aktive Streamlit-Sitzung."
+        raise RuntimeError(error_msg)
+    return ctx.session_id
+
+
 def read_text_file(file: UploadedFile) -> str:
-    """Read text content from uploaded file."""
-    try:
-        return file.read().decode("utf-8")
-    except UnicodeDecodeError as e:
-        error_msg = "Datei konnte nicht als UTF-8 Text gelesen werden."
-        raise ValueError(error_msg) from e
+    """Read text content from uploaded file, detecting its encoding."""
+    from components.ingest import decode_stream
+
+    return "".join(decode_stream(file))